@@ -0,0 +1,39 @@
+import argparse
+
+from src.clients.bigquery_client import bq_client
+from src.clients.snapshots import export_snapshot, snapshot_dir
+from src.clients.tables import TABLES, read_table
+
+LAYOUTS = {layout.name: layout for layout in TABLES.values()}
+
+
+def main():
+    """
+    Export the app's tables to compressed, per-day Parquet snapshots,
+    rewriting only the days that have changed since the last export
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "tables", nargs="*", metavar="table",
+        help=f"The tables to export: {', '.join(sorted(LAYOUTS))} (defaults to all)",
+    )
+    args = parser.parse_args()
+    # Checked here, as argparse rejects an empty list against choices
+    unknown = [name for name in args.tables if name not in LAYOUTS]
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(unknown)}")
+
+    for name in args.tables or sorted(LAYOUTS):
+        layout = LAYOUTS[name]
+        # Read the modified time first, so a save during the export leaves the snapshot stale
+        table_modified = bq_client().get_table(layout.table_id).modified
+        summary = export_snapshot(layout, read_table(layout), table_modified)
+        print(
+            f"{name}: {summary.rows} rows, {summary.written} days written, "
+            f"{summary.unchanged} unchanged, {summary.deleted} deleted"
+        )
+    print(f"Snapshots are in {snapshot_dir()}")
+
+
+if __name__ == "__main__":
+    main()
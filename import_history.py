@@ -0,0 +1,41 @@
+import argparse
+import sys
+
+from src.clients.bulk_import import DEFAULT_CHUNK_SIZE, import_files
+from src.clients.tables import TABLES
+
+LAYOUTS = {layout.name: layout for layout in TABLES.values()}
+
+
+def main():
+    """
+    Import historical records from CSV or Parquet files into one of the
+    app's tables, in a single batched load
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("table", choices=sorted(LAYOUTS), help="The table to import into")
+    parser.add_argument("files", nargs="+", help="The CSV and Parquet files to import")
+    parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+        help="The number of rows parsed at a time",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Validate and count the new rows without loading them",
+    )
+    args = parser.parse_args()
+
+    summary = import_files(LAYOUTS[args.table], args.files, args.chunk_size, args.dry_run)
+    if summary.errors:
+        print(f"Nothing was imported, as {len(summary.errors)} problem(s) were found:")
+        print("\n".join(summary.errors))
+        sys.exit(1)
+
+    print(f"Read {summary.rows_read} rows")
+    print(f"Skipped {summary.duplicates_in_files} repeated within the files")
+    print(f"Skipped {summary.already_in_table} already in the table")
+    print(f"{'Would load' if args.dry_run else 'Loaded'} {summary.new_rows} new rows")
+
+
+if __name__ == "__main__":
+    main()
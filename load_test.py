@@ -0,0 +1,31 @@
+import argparse
+
+from src.load_testing.harness import run_load_test
+
+
+def main():
+    """
+    Load test the app with increasing numbers of simultaneous sessions, against
+    the fake BigQuery backend and synthetic data
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--sessions", type=int, nargs="+", default=[1, 2, 4, 8],
+        help="The numbers of simultaneous sessions to try",
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=1,
+        help="How many times each session walks through the pages",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05,
+        help="The fake BigQuery latency per call (seconds)",
+    )
+    args = parser.parse_args()
+
+    report = run_load_test(args.sessions, args.rounds, args.latency)
+    print(report.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
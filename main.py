@@ -1,3 +1,5 @@
 from src.app.run_app import run_app
 
-run_app()
+# Compute pool workers import this script too, as their main module
+if __name__ == "__main__":
+    run_app()
@@ -0,0 +1,31 @@
+import argparse
+
+from src.clients.migrations import migrate_table, pending_migrations, schema_versions
+from src.clients.tables import TABLES
+
+
+def main():
+    """
+    Bring the app's tables up to their latest schema versions, applying each
+    table's pending migrations once (the app also does this when it starts)
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="List the pending migrations without applying them",
+    )
+    args = parser.parse_args()
+
+    versions = schema_versions()
+    for layout in TABLES.values():
+        if args.dry_run:
+            migrations = pending_migrations(layout.table_id, versions)
+        else:
+            migrations = migrate_table(layout, versions)
+        print(f"{layout.name}: at version {versions.get(layout.table_id, 0)}")
+        for migration in migrations:
+            print(f"  {'Would apply' if args.dry_run else 'Applied'} {migration.version}: {migration.description}")
+
+
+if __name__ == "__main__":
+    main()
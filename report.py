@@ -0,0 +1,43 @@
+import argparse
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
+from src.app.report import write_report
+
+
+def main():
+    """
+    Render every page's charts for a period into a static HTML or PDF report
+    (e.g. a weekly summary for the health visitor), without running the app
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--start", type=date.fromisoformat,
+        help="The first day of the report, as YYYY-MM-DD (defaults to the week ending on --end)",
+    )
+    parser.add_argument(
+        "--end", type=date.fromisoformat, default=date.today(),
+        help="The last day of the report, as YYYY-MM-DD (defaults to today)",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=Path("report.html"),
+        help="Where to write the report; a .pdf path writes a PDF (defaults to report.html)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(),
+        help="The most processes rendering charts at once (defaults to one per CPU)",
+    )
+    args = parser.parse_args()
+    start = args.start or args.end - timedelta(days=6)
+    if start > args.end:
+        parser.error("--start must not be after --end")
+
+    charts = write_report(args.output, start, args.end, args.workers)
+    drawn = sum(png is not None for _, png in charts)
+    print(f"{drawn} of {len(charts)} charts had data from {start} to {args.end}")
+    print(f"The report is in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import argparse
+
+from src.clients.shared_cache import DEFAULT_MAX_MB, serve
+
+
+def main():
+    """
+    Run the cache shared between app replicas. Point each replica at it with
+    the shared_cache_address and shared_cache_authkey secrets.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--address", default="127.0.0.1:50000",
+        help="The host:port to listen on (only this machine by default)",
+    )
+    parser.add_argument(
+        "--authkey", required=True,
+        help="The secret key replicas must present to connect",
+    )
+    parser.add_argument(
+        "--max-mb", type=float, default=DEFAULT_MAX_MB,
+        help="The most the cache holds before evicting (MB)",
+    )
+    args = parser.parse_args()
+
+    print(f"Serving the shared cache on {args.address}")
+    serve(args.address, args.authkey, args.max_mb)
+
+
+if __name__ == "__main__":
+    main()
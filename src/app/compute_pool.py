@@ -0,0 +1,242 @@
+import multiprocessing
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from pandas.api.extensions import ExtensionArray
+from pandas.arrays import BooleanArray, FloatingArray, IntegerArray
+
+from src.cfg.chart_theme import apply_chart_theme
+
+# How many shared memory blocks each worker keeps attached between tasks
+MAX_ATTACHED_BLOCKS = 256
+
+
+def compute_workers() -> int:
+    """
+    Get the number of worker processes heavy work is sent to (the
+    compute_workers secret), or 0 to do it in the session's own thread
+    """
+    return int(st.secrets.get("compute_workers", 0))
+
+
+@st.cache_resource(show_spinner=False)
+def _compute_pool(workers: int) -> ProcessPoolExecutor:
+    # Workers are spawned, as forking the server's threads is unsafe. They
+    # import the app's main script, which only runs the app as __main__, so
+    # they are given the app's chart theme themselves.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=apply_chart_theme,
+    )
+
+
+def compute_pool() -> ProcessPoolExecutor | None:
+    """
+    Get the process-wide pool heavy work is sent to, or None if it is done
+    in the session's own thread. Every session shares the same bounded set
+    of workers, so however many are open, at most one chart is drawn per
+    worker at a time, each under its own GIL.
+
+    Returns:
+        ProcessPoolExecutor | None: The pool, or None if none is configured
+    """
+    workers = compute_workers()
+    return _compute_pool(workers) if workers > 0 else None
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """
+    A one-dimensional numpy array in a shared memory block, by the block's name
+    """
+
+    block: str
+    dtype: str
+    length: int
+
+
+@dataclass(frozen=True)
+class SharedColumn:
+    """
+    A column of a frame sent to a worker. Numpy columns (and the data and
+    mask of nullable integer, float and boolean columns) are shared; any
+    other column (e.g. strings or lists) is pickled with the task.
+    """
+
+    arrays: tuple[SharedArray, ...] = ()
+    masked_type: type | None = None
+    values: Any = None
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    """
+    A frame sent to a worker, as its index and its named columns
+    """
+
+    index: SharedColumn
+    index_name: Any
+    columns: tuple[tuple[Any, SharedColumn], ...]
+
+
+_MASKED_TYPES = (IntegerArray, FloatingArray, BooleanArray)
+_shared_frames: dict[int, SharedFrame] = {}
+# Reentrant, as a frame may be freed (and its blocks released) while a frame is being shared
+_shared_lock = threading.RLock()
+
+
+def _share_array(array: np.ndarray, blocks: list[SharedMemory]) -> SharedArray:
+    """
+    Copy an array into a new shared memory block
+    """
+    array = np.ascontiguousarray(array)
+    # Blocks cannot be empty
+    block = SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    blocks.append(block)
+    return SharedArray(block.name, array.dtype.str, len(array))
+
+
+def _share_column(values: pd.Index | pd.Series, blocks: list[SharedMemory]) -> SharedColumn:
+    """
+    Share a column's values, if they can be shared, or else hold them to pickle
+    """
+    array = values.array
+    if isinstance(array, _MASKED_TYPES):
+        return SharedColumn(
+            arrays=(_share_array(array._data, blocks), _share_array(array._mask, blocks)),
+            masked_type=type(array),
+        )
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind in "biufcmM":
+        return SharedColumn(arrays=(_share_array(values.to_numpy(), blocks),))
+    return SharedColumn(values=array if isinstance(array, ExtensionArray) else values.to_numpy())
+
+
+def _release(key: int, blocks: list[SharedMemory]):
+    """
+    Free a frame's shared memory once the frame itself has been freed
+    """
+    with _shared_lock:
+        _shared_frames.pop(key, None)
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+def share_frame(df: pd.DataFrame) -> SharedFrame:
+    """
+    Put a frame's columns in shared memory for the workers, once per frame.
+    Prepared frames are shared and read-only, so every chart and session
+    drawing from one sends the workers the same blocks, which are freed with
+    the frame (e.g. when the data cache evicts it).
+
+    Args:
+        df (pd.DataFrame): The frame, which must not be changed afterwards
+
+    Returns:
+        SharedFrame: The frame's shared columns
+    """
+    with _shared_lock:
+        shared = _shared_frames.get(id(df))
+        if shared is not None:
+            return shared
+        blocks: list[SharedMemory] = []
+        shared = SharedFrame(
+            index=_share_column(df.index, blocks),
+            index_name=df.index.name,
+            columns=tuple((name, _share_column(df[name], blocks)) for name in df.columns),
+        )
+        _shared_frames[id(df)] = shared
+    weakref.finalize(df, _release, id(df), blocks)
+    return shared
+
+
+# Each worker's attached blocks, most recently used last
+_attached: OrderedDict[str, SharedMemory] = OrderedDict()
+
+
+def _attach(shared: SharedArray) -> np.ndarray:
+    """
+    View a shared array in a worker, without copying it
+    """
+    block = _attached.get(shared.block)
+    if block is None:
+        block = SharedMemory(name=shared.block)
+        _attached[shared.block] = block
+        while len(_attached) > MAX_ATTACHED_BLOCKS:
+            name, oldest = _attached.popitem(last=False)
+            try:
+                oldest.close()
+            except BufferError:
+                # Still viewed (e.g. by a figure not yet collected), so try again later
+                _attached[name] = oldest
+                break
+    _attached.move_to_end(shared.block)
+    array = np.ndarray((shared.length,), dtype=shared.dtype, buffer=block.buf)
+    array.flags.writeable = False
+    return array
+
+
+def _open_column(column: SharedColumn):
+    if column.masked_type is not None:
+        data, mask = (_attach(array) for array in column.arrays)
+        return column.masked_type(data, mask)
+    if len(column.arrays) > 0:
+        return _attach(column.arrays[0])
+    return column.values
+
+
+def open_frame(shared: SharedFrame) -> pd.DataFrame:
+    """
+    Rebuild a shared frame in a worker. Its shared columns are read-only
+    views of the blocks, so it must not be changed in place.
+    """
+    return pd.DataFrame(
+        {name: _open_column(column) for name, column in shared.columns},
+        index=pd.Index(_open_column(shared.index), name=shared.index_name),
+        copy=False,
+    )
+
+
+def _run_task(func: Callable, args: tuple) -> Any:
+    """
+    Run a task in a worker, with its shared frames rebuilt
+    """
+    return func(*(open_frame(arg) if isinstance(arg, SharedFrame) else arg for arg in args))
+
+
+def compute(func: Callable, *args) -> Any:
+    """
+    Run heavy work (e.g. an aggregation or rasterising a chart) in the
+    compute pool, or in this thread if there is none. Frame arguments are
+    handed over in shared memory rather than pickled, and everything else
+    (including the function, which must be importable by the workers and
+    return something picklable) is pickled.
+
+    Args:
+        func (Callable): The work to run
+        *args: Passed to func
+
+    Returns:
+        Any: What func returned
+    """
+    pool = compute_pool()
+    if pool is None:
+        return func(*args)
+    shared = tuple(share_frame(arg) if isinstance(arg, pd.DataFrame) else arg for arg in args)
+    try:
+        return pool.submit(_run_task, func, shared).result()
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory), so the next task starts a fresh pool
+        _compute_pool.clear()
+        return func(*args)
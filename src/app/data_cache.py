@@ -0,0 +1,311 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Hashable
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from src.clients.query_costs import stale_reads
+from src.clients.shared_cache import table_generation
+
+# The memory budget used unless the data_cache_mb secret sets one
+DEFAULT_BUDGET_MB = 512
+
+# A page's cache index, led by its table's generation (when the shared cache
+# started and how many writes it has seen), which is (0, 0) without one
+Version = tuple[int, int, int]
+
+
+@dataclass
+class CacheEntry:
+    """
+    One cached frame and its size
+    """
+
+    df: pd.DataFrame
+    nbytes: int
+
+
+class DataCache:
+    """
+    A process-wide cache of loaded frames with a memory budget. Frames are
+    keyed by the loader, its arguments and the data version they were loaded
+    at. When a newer version of a frame is cached the older ones are marked
+    superseded and evicted first; after that the least recently used frames
+    go, until the cache is within budget.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[Hashable, Version], CacheEntry] = OrderedDict()
+        self._loading: dict[tuple[Hashable, Version], threading.Lock] = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.superseded_evictions = 0
+
+    @staticmethod
+    def budget_bytes() -> int:
+        """
+        Get the most memory the cached frames may take up
+        """
+        return int(float(st.secrets.get("data_cache_mb", DEFAULT_BUDGET_MB)) * 1e6)
+
+    def get(self, key: Hashable, version: Version) -> pd.DataFrame | None:
+        """
+        Get a cached frame
+
+        Args:
+            key (Hashable): The loader and its arguments
+            version (Version): The data version
+
+        Returns:
+            pd.DataFrame | None: The cached frame, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get((key, version))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((key, version))
+            self.hits += 1
+            return entry.df
+
+    def peek(self, key: Hashable, version: Version) -> pd.DataFrame | None:
+        """
+        Get a cached frame without counting a lookup
+        """
+        with self._lock:
+            entry = self._entries.get((key, version))
+            return entry.df if entry is not None else None
+
+    def put(self, key: Hashable, version: Version, df: pd.DataFrame):
+        """
+        Cache a frame, then evict superseded versions of it and the least
+        recently used frames until the cache is within budget
+
+        Args:
+            key (Hashable): The loader and its arguments
+            version (Version): The data version the frame was loaded at
+            df (pd.DataFrame): The frame
+        """
+        nbytes = int(df.memory_usage(deep=True).sum())
+        budget = self.budget_bytes()
+        with self._lock:
+            old = self._entries.pop((key, version), None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[(key, version)] = CacheEntry(df, nbytes)
+            self.nbytes += nbytes
+
+            # Other sessions may still be on an older version, so keep it
+            # while there is room, but make it the first to go
+            for cached_key, cached_version in list(self._entries):
+                if cached_key == key and cached_version < version:
+                    self._entries.move_to_end((cached_key, cached_version), last=False)
+
+            # Keep the newest frame even if it alone is over budget
+            while self.nbytes > budget and len(self._entries) > 1:
+                (evicted_key, evicted_version), evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+                if any(
+                    cached_key == evicted_key and cached_version > evicted_version
+                    for cached_key, cached_version in self._entries
+                ):
+                    self.superseded_evictions += 1
+
+    def loading_lock(self, key: Hashable, version: Version) -> threading.Lock:
+        """
+        Get the lock held while a frame is loaded, so concurrent misses load it once
+        """
+        with self._lock:
+            return self._loading.setdefault((key, version), threading.Lock())
+
+    def loading_done(self, key: Hashable, version: Version, lock: threading.Lock):
+        """
+        Forget the lock held while a frame was loaded, whether the load cached
+        it, failed or was not cached (e.g. as it was built from stale reads)
+        """
+        with self._lock:
+            if self._loading.get((key, version)) is lock:
+                del self._loading[(key, version)]
+
+    def clear(self):
+        """
+        Forget every cached frame
+        """
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        """
+        Get the cache's size and hit, miss and eviction counts
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self.nbytes / 1e6, 2),
+                "budget_mb": round(self.budget_bytes() / 1e6, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "superseded_evictions": self.superseded_evictions,
+            }
+
+    def entry_sizes(self) -> list[dict]:
+        """
+        Get the size of each cached frame, most recently used first
+        """
+        with self._lock:
+            return [
+                {
+                    "key": " ".join(str(part) for part in key),
+                    "version": str(version),
+                    "rows": len(entry.df),
+                    "size_mb": round(entry.nbytes / 1e6, 3),
+                }
+                for (key, version), entry in reversed(self._entries.items())
+            ]
+
+
+DATA_CACHE = DataCache()
+
+
+def data_version(cache_index: int, table: str | None) -> Version:
+    """
+    Get the data version for a page's cache index. With a cache shared
+    between replicas, the table's generation leads it, so a write through any
+    replica makes every session reload the table. Versions are always
+    tuples of the same length, so they stay comparable when the shared cache
+    comes and goes.
+
+    Args:
+        cache_index (int): The page's cache index
+        table (str | None): The name of the table the data comes from
+
+    Returns:
+        Version: The data version
+    """
+    generation = table_generation(table) if table is not None else None
+    started, writes = (0, 0) if generation is None else generation
+    return started, writes, cache_index
+
+
+def _get_or_load(key: tuple, version: Version, load: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Get a frame from the data cache, loading it (once, however many sessions
+    ask at the same time) on a miss. Frames built from stale reads (served
+    while BigQuery was slow) are not cached, so the next rerun tries again.
+    """
+    df = DATA_CACHE.get(key, version)
+    if df is None:
+        lock = DATA_CACHE.loading_lock(key, version)
+        try:
+            with lock:
+                # Another session may have loaded it while this one waited
+                df = DATA_CACHE.peek(key, version)
+                if df is None:
+                    reads = []
+                    token = stale_reads.set(reads)
+                    try:
+                        df = load()
+                    finally:
+                        stale_reads.reset(token)
+                    outer_reads = stale_reads.get()
+                    if len(reads) > 0 and outer_reads is not None:
+                        outer_reads.extend(reads)
+                    elif len(reads) == 0:
+                        DATA_CACHE.put(key, version, df)
+        finally:
+            DATA_CACHE.loading_done(key, version, lock)
+    return df
+
+
+def cached_data(show_spinner: str, table: str | None = None):
+    """
+    Cache a loader in the process-wide data cache, in place of
+    st.cache_data. The loader's first argument is the page's cache index,
+    which gives the data version, and the rest are the key. Callers get their
+    own copy of the frame, so they can change it freely.
+
+    Args:
+        show_spinner (str): The message shown while the loader runs
+        table (str | None): The name of the table the loader reads
+    """
+
+    def decorator(func: Callable[..., pd.DataFrame]):
+        @wraps(func)
+        def wrapper(cache_index: int, *args) -> pd.DataFrame:
+            def load() -> pd.DataFrame:
+                # Background loads (e.g. prefetches) have no page to show a spinner on
+                if get_script_run_ctx() is None:
+                    return func(cache_index, *args)
+                with st.spinner(show_spinner):
+                    return func(cache_index, *args)
+
+            version = data_version(cache_index, table)
+            return _get_or_load((func.__qualname__, *args), version, load).copy()
+
+        return wrapper
+
+    return decorator
+
+
+def prepared_view(table: str | None = None):
+    """
+    Cache a page's prepared frame (its data parsed, typed and with the
+    columns its charts share derived) once per data version. Unlike
+    cached_data, every caller is given the same frame rather than a copy, so
+    it is built once however many charts and reruns use it, and it must be
+    treated as read-only. The arguments work as for cached_data.
+
+    Args:
+        table (str | None): The name of the table the frame comes from
+    """
+
+    def decorator(func: Callable[..., pd.DataFrame]):
+        @wraps(func)
+        def wrapper(cache_index: int, *args) -> pd.DataFrame:
+            key = (func.__qualname__, *args)
+            version = data_version(cache_index, table)
+
+            def load() -> pd.DataFrame:
+                df = func(cache_index, *args)
+                # Frames built from stale reads are not the view at this version
+                if len(stale_reads.get() or []) == 0:
+                    df.attrs["view"] = (id(df), (table, version, *key))
+                return df
+
+            return _get_or_load(key, version, load)
+
+        return wrapper
+
+    return decorator
+
+
+def view_identity(df: pd.DataFrame) -> tuple | None:
+    """
+    Get what identifies a prepared view's frame: its table, data version,
+    view and arguments (e.g. the window). Frames derived from a view inherit
+    its attrs, so the tag is only trusted on the frame it was made for.
+
+    Args:
+        df (pd.DataFrame): The frame
+
+    Returns:
+        tuple | None: The frame's identity, or None if it is not a prepared
+            view's frame (or was built from stale reads)
+    """
+    view = df.attrs.get("view")
+    if view is None or view[0] != id(df):
+        return None
+    return view[1]
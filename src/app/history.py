@@ -0,0 +1,133 @@
+from datetime import date, timedelta
+from typing import Callable
+
+import pandas as pd
+import streamlit as st
+
+from src.app.metrics import timed
+
+# How many days of history each page loads unless asked for more
+DEFAULT_WINDOW_DAYS = 30
+
+Slice = tuple[date | None, date | None]
+
+
+def window_days() -> int:
+    """
+    Get the number of recent days each page loads by default
+    """
+    return int(st.secrets.get("history_window_days", DEFAULT_WINDOW_DAYS))
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def default_start() -> date:
+    """
+    Get the first day of the default window
+    """
+    return date.today() - timedelta(days=window_days() - 1)
+
+
+def history_start(page: str) -> date | None:
+    """
+    Get the first day of history loaded for a page in this session
+
+    Args:
+        page (str): The page name
+
+    Returns:
+        date | None: The first day loaded, or None if the full history is loaded
+    """
+    if st.session_state.get(f"{page}_full_history", False):
+        return None
+    return st.session_state.get(f"{page}_history_start", default_start())
+
+
+def extend_history(page: str, start: date):
+    """
+    Widen the history loaded for a page to start on the given day, rerunning
+    the page if more history is needed
+
+    Args:
+        page (str): The page name
+        start (date): The earliest day the page now needs
+    """
+    current = history_start(page)
+    if current is None or start >= current:
+        return
+    st.session_state[f"{page}_history_start"] = start
+    st.rerun()
+
+
+def full_history_toggle(page: str):
+    """
+    Show a toggle to load the page's full history rather than its recent window
+    """
+    st.toggle(
+        "Load full history",
+        key=f"{page}_full_history",
+        help=f"By default only the last {window_days()} days are loaded",
+    )
+
+
+def history_slices(start: date | None, today: date | None = None) -> list[Slice]:
+    """
+    Split the history from start onwards into calendar-month slices, so that
+    each slice is fetched once and reused as the window widens. The latest
+    slice is open-ended, and the full history adds one slice for everything
+    before the default window.
+
+    Args:
+        start (date | None): The first day needed, or None for all history
+        today (date | None): The current day
+
+    Returns:
+        list[Slice]: The (first day, last day) of each slice, where None is unbounded
+    """
+    today = today or date.today()
+    first_month = _month_start(start or default_start())
+    slices: list[Slice] = []
+    if start is None:
+        slices.append((None, first_month - timedelta(days=1)))
+
+    month = first_month
+    current_month = _month_start(today)
+    while month < current_month:
+        next_month = _month_start(month + timedelta(days=31))
+        slices.append((month, next_month - timedelta(days=1)))
+        month = next_month
+    slices.append((month, None))
+    return slices
+
+
+def load_history(
+    get_slice: Callable[[int, date | None, date | None], pd.DataFrame],
+    cache_index: int,
+    start: date | None,
+    date_column: str,
+) -> pd.DataFrame:
+    """
+    Stitch together the cached slices covering the history from start onwards
+
+    Args:
+        get_slice (Callable[[int, date | None, date | None], pd.DataFrame]): The
+            page's cached loader for one slice
+        cache_index (int): The page's cache index
+        start (date | None): The first day needed, or None for all history
+        date_column (str): The column holding each row's event date
+
+    Returns:
+        pd.DataFrame: The rows from start onwards
+    """
+    with timed("load", get_slice.__name__):
+        frames = []
+        for slice_start, slice_end in history_slices(start):
+            with timed("slice", get_slice.__name__):
+                frames.append(get_slice(cache_index, slice_start, slice_end))
+        non_empty = [frame for frame in frames if len(frame) > 0]
+        df = pd.concat(non_empty, ignore_index=True) if non_empty else frames[-1]
+        if start is not None:
+            df = df[pd.to_datetime(df[date_column]) >= pd.Timestamp(start)]
+        return df.reset_index(drop=True)
@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import numpy as np
+
+# How many recent timings are kept per operation for the percentiles
+MAX_SAMPLES = 1000
+
+# The page whose script run is timing, so data-layer timings can be tagged with it
+current_page: ContextVar[str] = ContextVar("current_page", default="")
+
+
+class OperationStats:
+    """
+    Running totals and a window of recent timings for one operation
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.samples: deque[float] = deque(maxlen=MAX_SAMPLES)
+
+    def add(self, seconds: float):
+        """
+        Add one timing
+        """
+        self.count += 1
+        self.total_seconds += seconds
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        """
+        Get a quantile of the recent timings
+        """
+        return float(np.quantile(self.samples, q)) if self.samples else 0.0
+
+
+class MetricsRegistry:
+    """
+    Process-wide timings, keyed by (operation, page, name)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str, str], OperationStats] = {}
+
+    def record(self, operation: str, name: str, seconds: float, page: str | None = None):
+        """
+        Record one timing
+
+        Args:
+            operation (str): The kind of work (e.g. fetch, save, aggregate, render)
+            name (str): What was worked on (e.g. a table or chart)
+            seconds (float): How long it took
+            page (str | None): The page it ran for (defaults to the current page)
+        """
+        key = (operation, current_page.get() if page is None else page, name)
+        with self._lock:
+            self._stats.setdefault(key, OperationStats()).add(seconds)
+
+    def summary(self) -> list[dict]:
+        """
+        Get the count, total, p50 and p95 of every operation
+        """
+        with self._lock:
+            items = sorted(self._stats.items())
+            return [
+                {
+                    "operation": operation,
+                    "page": page,
+                    "name": name,
+                    "count": stats.count,
+                    "total_seconds": stats.total_seconds,
+                    "p50_seconds": stats.quantile(0.5),
+                    "p95_seconds": stats.quantile(0.95),
+                }
+                for (operation, page, name), stats in items
+            ]
+
+    def to_json(self) -> str:
+        """
+        Export the summary as JSON
+        """
+        return json.dumps({"generated_at": time.time(), "operations": self.summary()})
+
+    def to_prometheus(self) -> str:
+        """
+        Export the summary in the Prometheus text exposition format
+        """
+        lines = [
+            "# HELP baby_app_operation_seconds Time spent in app operations",
+            "# TYPE baby_app_operation_seconds summary",
+        ]
+        for row in self.summary():
+            labels = f'operation="{row["operation"]}",page="{row["page"]}",name="{row["name"]}"'
+            lines += [
+                f'baby_app_operation_seconds{{{labels},quantile="0.5"}} {row["p50_seconds"]:.6f}',
+                f'baby_app_operation_seconds{{{labels},quantile="0.95"}} {row["p95_seconds"]:.6f}',
+                f"baby_app_operation_seconds_sum{{{labels}}} {row['total_seconds']:.6f}",
+                f"baby_app_operation_seconds_count{{{labels}}} {row['count']}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """
+        Forget all timings
+        """
+        with self._lock:
+            self._stats.clear()
+
+
+METRICS = MetricsRegistry()
+
+
+@contextmanager
+def timed(operation: str, name: str):
+    """
+    Time a block of work, tagged with the current page
+
+    Args:
+        operation (str): The kind of work (e.g. fetch, save, aggregate, render)
+        name (str): What is being worked on (e.g. a table or chart)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.record(operation, name, time.perf_counter() - start)
+
+
+def timed_function(operation: str):
+    """
+    Decorate a function so each call is timed under its own name
+
+    Args:
+        operation (str): The kind of work the function does
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(operation, func.__name__):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def page_context(page: str):
+    """
+    Tag all timings inside the block with the given page
+    """
+    token = current_page.set(page)
+    try:
+        yield
+    finally:
+        current_page.reset(token)
+
+
+def export_metrics(path: str):
+    """
+    Write the Prometheus text export to a file (e.g. for a node exporter's
+    textfile collector), replacing it atomically
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(METRICS.to_prometheus())
+    os.replace(temp_path, path)
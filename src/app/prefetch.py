@@ -0,0 +1,62 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import date
+from typing import Callable
+
+import pandas as pd
+import streamlit as st
+
+from src.app.history import history_start
+from src.app.metrics import page_context, timed
+from src.app.ui.pages.bowels import prepare_nappies_data
+from src.app.ui.pages.drinking import prepare_drinking_data
+from src.app.ui.pages.pumping import prepare_pumping_data
+from src.app.ui.pages.sleeping import prepare_sleeping_data
+
+# Each page's prepared data and the session state key of its cache index
+PAGE_DATA: dict[str, tuple[Callable[[int, date | None], pd.DataFrame], str]] = {
+    "sleeping": (prepare_sleeping_data, "sleeping_cache"),
+    "drinking": (prepare_drinking_data, "drinking_cache"),
+    "pumping": (prepare_pumping_data, "pumping_cache"),
+    "bowels": (prepare_nappies_data, "nappy_cache"),
+}
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=len(PAGE_DATA), thread_name_prefix="prefetch")
+
+
+def _prefetch(
+    page: str,
+    prepare: Callable[[int, date | None], pd.DataFrame],
+    cache_index: int,
+    start: date | None,
+) -> pd.DataFrame:
+    with page_context(page), timed("prefetch", page):
+        return prepare(cache_index, start)
+
+
+def prefetch_pages() -> list[Future]:
+    """
+    On a session's first run, start loading every page's data (its recent
+    window) at once in the background, so the first visit to each page finds
+    it cached. The page being shown waits on the same load rather than
+    starting another, and a page whose load fails just loads it again when
+    it is opened.
+
+    Returns:
+        list[Future]: The loads started, or none if the session has already
+            prefetched
+    """
+    if st.session_state.get("prefetched", False):
+        return []
+    st.session_state["prefetched"] = True
+    return [
+        _prefetch_pool.submit(
+            copy_context().run,
+            _prefetch,
+            page,
+            prepare,
+            st.session_state.get(cache_key, 0),
+            history_start(page),
+        )
+        for page, (prepare, cache_key) in PAGE_DATA.items()
+    ]
@@ -0,0 +1,176 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+# How often the sampler records the script thread's stack
+SAMPLE_INTERVAL_SECONDS = 0.005
+# How many profiles are kept before the oldest are deleted
+MAX_PROFILES = 20
+# How many functions the text report lists
+REPORT_LINES = 40
+
+
+def profile_dir() -> str:
+    """
+    Get the directory profiles are saved to
+    """
+    return st.secrets.get("profile_dir", "profiles")
+
+
+class StackSampler:
+    """
+    Samples one thread's call stack on a timer and counts each distinct stack,
+    which gives the collapsed-stack format flamegraph tools read
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """
+        Start sampling
+        """
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop sampling and wait for the sampler to finish
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+
+    def folded(self) -> str:
+        """
+        Get the samples as collapsed stacks (one "root;...;leaf count" per line)
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+def _fold(frame) -> str:
+    """
+    Collapse a stack into one line, from the outermost frame inwards
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        names.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+@contextmanager
+def profile_run(label: str):
+    """
+    Profile the block with both a deterministic profiler (for the call tree)
+    and a stack sampler (for flamegraphs), then save the profile.
+
+    Args:
+        label (str): A label for the profile (e.g. the page)
+
+    Yields:
+        dict: The profile's details, whose label can be updated in the block
+    """
+    details = {"label": label}
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    profiler.enable()
+    try:
+        yield details
+    finally:
+        profiler.disable()
+        sampler.stop()
+        save_profile(details["label"], profiler, sampler)
+
+
+def save_profile(label: str, profiler: cProfile.Profile, sampler: StackSampler):
+    """
+    Save a profile as pstats (for snakeviz and the like), a text report of the
+    slowest functions, and collapsed stacks (for flamegraph.pl or speedscope),
+    then delete the oldest profiles
+
+    Args:
+        label (str): A label for the profile (e.g. the page)
+        profiler (cProfile.Profile): The finished deterministic profile
+        sampler (StackSampler): The finished stack samples
+    """
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    name = f"{datetime.now():%Y%m%d_%H%M%S}_{label.lower()}"
+    path = os.path.join(directory, name)
+
+    profiler.dump_stats(f"{path}.prof")
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats("cumulative").print_stats(REPORT_LINES)
+    with open(f"{path}.txt", "w") as f:
+        f.write(report.getvalue())
+    with open(f"{path}.folded", "w") as f:
+        f.write(sampler.folded())
+
+    for old in list_profiles()[MAX_PROFILES:]:
+        for extension in [".prof", ".txt", ".folded"]:
+            old_path = os.path.join(directory, old["name"] + extension)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+
+def list_profiles() -> list[dict]:
+    """
+    List the saved profiles, newest first
+
+    Returns:
+        list[dict]: The name, creation time and total profiled time of each profile
+    """
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for filename in os.listdir(directory):
+        if not filename.endswith(".prof"):
+            continue
+        path = os.path.join(directory, filename)
+        profiles.append(
+            {
+                "name": filename.removesuffix(".prof"),
+                "created": datetime.fromtimestamp(os.path.getmtime(path)),
+                "total_seconds": pstats.Stats(path).total_tt,
+            }
+        )
+    return sorted(profiles, key=lambda profile: profile["created"], reverse=True)
+
+
+def read_profile_file(name: str, extension: str) -> bytes:
+    """
+    Read one of a profile's saved files
+
+    Args:
+        name (str): The profile name
+        extension (str): The file type (".prof", ".txt" or ".folded")
+
+    Returns:
+        bytes: The file contents
+    """
+    with open(os.path.join(profile_dir(), name + extension), "rb") as f:
+        return f.read()
+
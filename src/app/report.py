@@ -0,0 +1,236 @@
+import base64
+import html
+import io
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable
+
+import matplotlib.pyplot as plt
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from src.app.ui.interactive import figure_png
+from src.app.ui.pages.bowels import (
+    create_nappies_by_time_chart,
+    plot_nappies_changed_per_person,
+    plot_nappies_over_time,
+    prepare_nappies_data,
+)
+from src.app.ui.pages.drinking import (
+    plot_bottle_drink_volume_per_day,
+    plot_bottle_drink_volume_rolling_24h,
+    plot_drinks_per_day,
+    prepare_drinking_data,
+)
+from src.app.ui.pages.pumping import (
+    plot_rolling_24h_by_breast,
+    plot_volume_per_day,
+    prepare_pumping_data,
+)
+from src.app.ui.pages.sleeping import (
+    plot_evening_wakeups,
+    plot_nap_duration_by_day,
+    plot_settle_time_over_time,
+    plot_sleep_proportion_by_hour,
+    plot_sleep_timeline,
+    plot_total_sleep_by_day,
+    prepare_sleeping_data,
+)
+from src.cfg.chart_theme import apply_chart_theme
+
+# The resolution figure_png rasterises charts at
+PNG_DPI = 200
+# Each page's heading in the report
+PAGE_TITLES = {
+    "sleeping": "Sleeping 😴",
+    "drinking": "Drinking 🍼",
+    "pumping": "Pumping ⛽",
+    "bowels": "Bowels 💩",
+}
+
+
+@dataclass(frozen=True)
+class ReportChart:
+    """
+    One chart in the report: the page it is on, the function that plots it
+    (as the page does) and the frame of the period's data it is plotted from
+    """
+
+    page: str
+    plot: Callable[..., Figure]
+    data: str
+    with_period: bool = False  # Whether the plot also takes the period's first and last days
+
+
+# The charts each page shows, in the same order
+REPORT_CHARTS = [
+    ReportChart("sleeping", plot_settle_time_over_time, "night"),
+    ReportChart("sleeping", plot_total_sleep_by_day, "sleeping"),
+    ReportChart("sleeping", plot_nap_duration_by_day, "naps"),
+    ReportChart("sleeping", plot_evening_wakeups, "night"),
+    ReportChart("sleeping", plot_sleep_proportion_by_hour, "sleeping"),
+    ReportChart("sleeping", plot_sleep_timeline, "sleeping", with_period=True),
+    ReportChart("drinking", plot_drinks_per_day, "drinking"),
+    ReportChart("drinking", plot_bottle_drink_volume_per_day, "drinking"),
+    ReportChart("drinking", plot_bottle_drink_volume_rolling_24h, "drinking"),
+    ReportChart("pumping", plot_volume_per_day, "pumping"),
+    ReportChart("pumping", plot_rolling_24h_by_breast, "pumping"),
+    ReportChart("bowels", plot_nappies_over_time, "nappies"),
+    ReportChart("bowels", plot_nappies_changed_per_person, "nappies"),
+    ReportChart("bowels", create_nappies_by_time_chart, "nappies"),
+]
+
+
+def _in_period(df: pd.DataFrame, column: str, end: date) -> pd.DataFrame:
+    """
+    The rows of a page's prepared frame up to the end of the period (the
+    frame already starts at its first day)
+    """
+    return df[df[column] < pd.Timestamp(end + timedelta(days=1))]
+
+
+def load_report_data(start: date, end: date) -> dict[str, pd.DataFrame]:
+    """
+    Load the data every chart in the report is plotted from, once. This goes
+    through the same caches as the app, so it reuses any local snapshots and
+    on-disk or shared caches that are configured.
+
+    Args:
+        start (date): The first day of the period
+        end (date): The last day of the period
+
+    Returns:
+        dict[str, pd.DataFrame]: Each frame the charts use, by name
+    """
+    sleeping = _in_period(prepare_sleeping_data(0, start), "sleep_start_time", end)
+    return {
+        "sleeping": sleeping,
+        "night": sleeping[sleeping["sleep_type"] == "Night"],
+        "naps": sleeping[sleeping["sleep_type"] == "Nap"],
+        "drinking": _in_period(prepare_drinking_data(0, start), "feed_date", end),
+        "pumping": _in_period(prepare_pumping_data(0, start), "pump_date", end),
+        "nappies": _in_period(prepare_nappies_data(0, start), "day", end),
+    }
+
+
+def render_report_chart(chart: ReportChart, df: pd.DataFrame, start: date, end: date) -> bytes:
+    """
+    Plot one chart and rasterise it to PNG. This runs in a worker process, so
+    it is given just the frame the chart needs.
+    """
+    if chart.with_period:
+        return figure_png(chart.plot(df, start, end))
+    return figure_png(chart.plot(df))
+
+
+def render_report_charts(
+    data: dict[str, pd.DataFrame], start: date, end: date, workers: int | None = None
+) -> list[tuple[ReportChart, bytes | None]]:
+    """
+    Render every chart in the report, in parallel across worker processes
+    (matplotlib holds the GIL while it draws, so threads would take turns).
+    Each worker starts with the app's chart theme. Charts with no data in the
+    period are not drawn.
+
+    Args:
+        data (dict[str, pd.DataFrame]): The frames the charts use, as loaded by load_report_data
+        start (date): The first day of the period
+        end (date): The last day of the period
+        workers (int | None): The most worker processes (defaults to one per CPU)
+
+    Returns:
+        list[tuple[ReportChart, bytes | None]]: Each chart, in report order,
+            with its PNG, or None if it had no data
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=apply_chart_theme) as pool:
+        futures = [
+            pool.submit(render_report_chart, chart, data[chart.data], start, end)
+            if len(data[chart.data]) > 0
+            else None
+            for chart in REPORT_CHARTS
+        ]
+        return [
+            (chart, None if future is None else future.result())
+            for chart, future in zip(REPORT_CHARTS, futures)
+        ]
+
+
+def _report_html(charts: list[tuple[ReportChart, bytes | None]], start: date, end: date) -> str:
+    """
+    The report as one self-contained HTML page, with the charts inlined
+    """
+    title = f"Baby Report: {start:%d %b %Y} to {end:%d %b %Y}"
+    body = [f"<h1>{html.escape(title)}</h1>"]
+    for page, heading in PAGE_TITLES.items():
+        body.append(f"<h2>{html.escape(heading)}</h2>")
+        pngs = [png for chart, png in charts if chart.page == page and png is not None]
+        if len(pngs) == 0:
+            body.append("<p>Nothing was logged in this period.</p>")
+        for png in pngs:
+            body.append(
+                f'<img src="data:image/png;base64,{base64.b64encode(png).decode()}">'
+            )
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{html.escape(title)}</title>\n"
+        "<style>body { font-family: sans-serif; color: #4E342E; text-align: center; }"
+        " img { max-width: 100%; margin: 1em auto; display: block; }</style>\n"
+        "</head>\n<body>\n" + "\n".join(body) + "\n</body>\n</html>\n"
+    )
+
+
+def _write_pdf(
+    path: Path, charts: list[tuple[ReportChart, bytes | None]], start: date, end: date
+):
+    """
+    Write the report as a PDF, with a title page and a chart per page
+    """
+    with PdfPages(path) as pdf:
+        cover = plt.figure(figsize=(8.27, 11.69))
+        cover.text(
+            0.5, 0.5, f"Baby Report\n{start:%d %b %Y} to {end:%d %b %Y}",
+            ha="center", va="center", fontsize=24, color="#4E342E",
+        )
+        pdf.savefig(cover)
+        plt.close(cover)
+        for chart, png in charts:
+            if png is None:
+                continue
+            # Each page is the size of its chart, so the image is embedded as it is
+            image = plt.imread(io.BytesIO(png), format="png")
+            height, width = image.shape[:2]
+            page = plt.figure(figsize=(width / PNG_DPI, height / PNG_DPI), dpi=PNG_DPI)
+            page.figimage(image)
+            pdf.savefig(page, dpi=PNG_DPI)
+            plt.close(page)
+
+
+def write_report(
+    path: Path, start: date, end: date, workers: int | None = None
+) -> list[tuple[ReportChart, bytes | None]]:
+    """
+    Render every page's charts for a period into a static report, as HTML or
+    (if the path ends in .pdf) PDF
+
+    Args:
+        path (Path): Where to write the report
+        start (date): The first day of the period
+        end (date): The last day of the period
+        workers (int | None): The most worker processes rendering charts (defaults to one per CPU)
+
+    Returns:
+        list[tuple[ReportChart, bytes | None]]: Each chart with its PNG, or
+            None if it had no data
+    """
+    # The cover page is drawn here, in the app's font
+    apply_chart_theme()
+    data = load_report_data(start, end)
+    charts = render_report_charts(data, start, end, workers)
+    if path.suffix.lower() == ".pdf":
+        _write_pdf(path, charts, start, end)
+    else:
+        path.write_text(_report_html(charts, start, end), encoding="utf-8")
+    return charts
@@ -1,10 +1,16 @@
 import streamlit as st
 from src.app.ui import display_bowels, display_drinking, display_pumping, display_sleeping
-import matplotlib.pyplot as plt
-from src.cfg.colour_config import ColourConfig
-from matplotlib import font_manager
-
-COLOURS = ColourConfig()
+from src.app.ui.fragments import BIGQUERY_UNAVAILABLE, display_spend_warnings
+from src.app.ui.interactive import CHART_BACKENDS, chart_backend
+from src.app.ui.performance import display_performance_panel, display_profiles
+from src.app.data_cache import DATA_CACHE
+from src.app.metrics import export_metrics, page_context, timed
+from src.app.prefetch import prefetch_pages
+from src.app.profiling import profile_run
+from src.clients.migrations import migrate_tables
+from src.clients.query_costs import scan_budget
+from src.clients.resilience import BigQueryUnavailable
+from src.cfg.chart_theme import apply_chart_theme
 
 
 def run_app():
@@ -17,16 +23,41 @@ def run_app():
     # Add configs
     st.set_page_config(page_title="Archie App", layout="wide")
     get_font()
-    plt.rcParams.update(
-        {
-            "legend.facecolor": COLOURS.YELLOW_HEX,
-            "legend.edgecolor": COLOURS.BROWN_HEX,
-            "legend.labelcolor": COLOURS.BROWN_HEX,
-            "axes.facecolor": COLOURS.BLUE_HEX,
-            "figure.facecolor": COLOURS.YELLOW_HEX,
-        }
-    )
+    apply_chart_theme()
+
+    # Bring the tables up to date (once per process) before anything reads them
+    try:
+        migrate_tables()
+    except BigQueryUnavailable:
+        st.error(BIGQUERY_UNAVAILABLE)
+        st.stop()
+
+    # Start loading every page's data at once, so switching pages is quick
+    prefetch_pages()
+
+    # Profile this run if an admin asked for it, once
+    if is_admin() and "profile" in st.query_params:
+        del st.query_params["profile"]
+        with profile_run("app") as profile:
+            profile["label"] = display_app()
+    else:
+        display_app()
 
+    # Show the hot-path timings to admins, and export them for scraping
+    if is_admin():
+        display_performance_panel()
+        display_profiles()
+    if st.secrets.get("metrics_export_path", None) is not None:
+        export_metrics(st.secrets["metrics_export_path"])
+
+
+def display_app() -> str:
+    """
+    Display the selected page and the app's controls
+
+    Returns:
+        str: The selected page
+    """
     # Create title and subtitle
     st.markdown(
         "<h1 style='text-align: center;'>My First App</h1>",
@@ -40,15 +71,32 @@ def run_app():
     selected_page = st.sidebar.selectbox(
         "Choose Page", pages.keys(), format_func=lambda x: f"{pages.get(x)} {x}"
     )
+    # Choose whether charts are drawn on the server or in the browser
+    st.sidebar.radio(
+        "Charts",
+        list(CHART_BACKENDS.keys()),
+        index=list(CHART_BACKENDS.keys()).index(chart_backend()),
+        format_func=CHART_BACKENDS.get,
+        key="chart_backend",
+    )
 
-    if selected_page == "Sleeping":
-        display_sleeping()
-    elif selected_page == "Drinking":
-        display_drinking()
-    elif selected_page == "Pumping":
-        display_pumping()
-    else:
-        display_bowels()
+    with (
+        page_context(selected_page.lower()),
+        timed("rerun", selected_page.lower()),
+        scan_budget() as spend,
+    ):
+        try:
+            if selected_page == "Sleeping":
+                display_sleeping()
+            elif selected_page == "Drinking":
+                display_drinking()
+            elif selected_page == "Pumping":
+                display_pumping()
+            else:
+                display_bowels()
+        except BigQueryUnavailable:
+            st.error(BIGQUERY_UNAVAILABLE)
+    display_spend_warnings(spend)
 
     # Display a button to allow for resetting the cache
     st.markdown('___________________')
@@ -58,9 +106,13 @@ def run_app():
     st.write("Matt couldn't be bothered to make a proper caching system for multiple users.... If you can't see the latest data then press this button to refresh!") # noqa: E501
     if st.button('Reset Cache'):
         st.cache_data.clear()
+        DATA_CACHE.clear()
         st.session_state.clear()
         st.rerun()
 
+    return selected_page
+
+
 def verify_user():
     """
     Verify a user of the app using the query params
@@ -79,6 +131,20 @@ def verify_user():
     st.stop()
 
 
+def is_admin() -> bool:
+    """
+    Check whether the user has the admin password in the query params
+    """
+    # Allow for local running
+    if st.secrets.get("environment", None) == "dev":
+        return True
+
+    return (
+        "admin" in st.query_params
+        and st.query_params["admin"] == st.secrets.get("admin_password", None)
+    )
+
+
 def get_font():
     """
     Get the font
@@ -95,7 +161,3 @@ def get_font():
     """,
         unsafe_allow_html=True,
     )
-    # Add a TTF file to matplotlib’s font manager
-    font_path = "src/cfg/fonts/playpen_sans.ttf"
-    font_manager.fontManager.addfont(font_path)
-    plt.rcParams["font.family"] = "Playpen Sans"
@@ -0,0 +1,102 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+# The narrowest a bar can be drawn before the chart turns to mush
+MIN_BAR_PIXELS = 8
+# Calendar buckets tried in turn until the bars fit, with their title label
+BAR_BUCKETS = {"W-MON": "Weekly", "MS": "Monthly"}
+
+
+def pixel_width(figsize) -> int:
+    """
+    Get the rendered width of a figure in pixels
+    """
+    return int(figsize[0] * plt.rcParams["figure.dpi"])
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Pick the points to keep with Largest-Triangle-Three-Buckets, which keeps
+    the peaks and troughs that a plain stride would drop.
+
+    Args:
+        x (np.ndarray): The (sorted, numeric) x values
+        y (np.ndarray): The y values
+        n_out (int): The number of points to keep
+
+    Returns:
+        np.ndarray: The positions of the kept points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Always keep the first and last points, and bucket the rest
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = np.empty(n_out, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # The average of the next bucket is the triangle's third point
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        prev_x, prev_y = x[kept[i]], y[kept[i]]
+        areas = np.abs(
+            (prev_x - next_x) * (y[start:end] - prev_y)
+            - (prev_x - x[start:end]) * (next_y - prev_y)
+        )
+        kept[i + 1] = start + int(np.argmax(areas))
+    return kept
+
+
+def downsample_line(series: pd.Series, max_points: int) -> pd.Series:
+    """
+    Downsample a time series to at most max_points with LTTB
+
+    Args:
+        series (pd.Series): The series, indexed by time
+        max_points (int): The most points to keep (about one per pixel)
+
+    Returns:
+        pd.Series: The downsampled series
+    """
+    if len(series) <= max_points:
+        return series
+    series = series.dropna()
+    x = series.index.asi8.astype(float)
+    return series.iloc[lttb_indices(x, series.to_numpy(dtype=float), max_points)]
+
+
+def bucket_bars(data: pd.Series | pd.DataFrame, max_bars: int):
+    """
+    Re-bucket per-day bar data into weeks or months when the plotted range has
+    too many days to draw. Buckets show the average per day, so the y axis keeps its units.
+
+    Args:
+        data (pd.Series | pd.DataFrame): The per-day values, indexed by day
+        max_bars (int): The most bars that fit the chart
+
+    Returns:
+        tuple: The (possibly) re-bucketed data and the bucket label (None if daily)
+    """
+    days = pd.DatetimeIndex(data.index)
+    if len(days) == 0 or (days.max() - days.min()).days < max_bars:
+        return data, None
+    daily = data.set_axis(days).resample("D").sum()
+    for freq, label in BAR_BUCKETS.items():
+        bucketed = daily.resample(freq, label="left", closed="left").mean()
+        if len(bucketed) <= max_bars:
+            break
+    return bucketed, label
+
+
+def bar_width(x) -> float:
+    """
+    Get a bar width (in days) that leaves a gap between date bars
+    """
+    days = pd.DatetimeIndex(x).as_unit("ns")
+    if len(days) < 2:
+        return 0.8
+    return 0.8 * (np.diff(days.asi8).min() / pd.Timedelta(days=1).value)
@@ -0,0 +1,79 @@
+from functools import wraps
+from typing import Callable
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from src.app.metrics import current_page, page_context, timed
+from src.clients.query_costs import RunSpend, scan_budget
+from src.clients.resilience import BigQueryUnavailable
+from src.clients.schema import RecordError
+
+BIGQUERY_UNAVAILABLE = "BigQuery isn't responding right now, so this can't be shown or saved. Please try again in a minute!" # noqa: E501
+
+
+def display_spend_warnings(spend: RunSpend):
+    """
+    Warn about any tables a run went over its scan budget on, or read stale
+    """
+    if len(spend.over_budget) > 0:
+        tables = ", ".join(sorted(set(spend.over_budget)))
+        st.warning(f"This page went over its BigQuery scan budget reading {tables}")
+    if len(spend.stale) > 0:
+        tables = ", ".join(sorted(set(spend.stale)))
+        st.warning(f"BigQuery is slow to respond, so this page may be out of date for {tables}")
+
+
+def _is_fragment_rerun() -> bool:
+    ctx = get_script_run_ctx()
+    return ctx is not None and len(ctx.fragment_ids_this_run) > 0
+
+
+def _run(func: Callable[..., None], *args, **kwargs):
+    """
+    Draw a fragment, showing an error in its place if BigQuery is unavailable,
+    or if a form's new record does not match its table
+    """
+    try:
+        func(*args, **kwargs)
+    except BigQueryUnavailable:
+        st.error(BIGQUERY_UNAVAILABLE)
+    except RecordError as error:
+        st.error(f"That can't be saved: {error}")
+
+
+def page_fragment(func: Callable[..., None]) -> Callable[..., None]:
+    """
+    Make part of a page with widgets (a form, or the sleep timeline) a
+    fragment. Its widgets then rerun just that part, against the data it was
+    passed when the page last ran, rather than the whole app. A submit that
+    fails validation shows its error in that rerun. Saves bump their table's
+    cache index and rerun the whole app, so every part of the page reading
+    the table is passed the new data.
+
+    A fragment rerunning on its own is outside the page's run, so it is tagged
+    with the page again and shows its own scan budget warnings and BigQuery
+    errors.
+
+    Args:
+        func (Callable[..., None]): Draws the part of the page
+    """
+
+    @st.fragment
+    @wraps(func)
+    def fragment(page: str, *args, **kwargs):
+        if not _is_fragment_rerun():
+            # Part of the page's run, which times it and tracks its spend
+            with timed("fragment", func.__name__):
+                _run(func, *args, **kwargs)
+            return
+        with page_context(page), timed("fragment", func.__name__), scan_budget() as spend:
+            _run(func, *args, **kwargs)
+        display_spend_warnings(spend)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        fragment(current_page.get(), *args, **kwargs)
+
+    return wrapper
+
@@ -0,0 +1,275 @@
+import io
+from typing import Callable, Mapping, Sequence
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import streamlit as st
+from matplotlib.figure import Figure
+
+from src.app.compute_pool import compute, compute_pool
+from src.app.data_cache import view_identity
+from src.app.metrics import timed
+from src.app.ui.downsampling import downsample_line
+from src.clients.shared_cache import chart_key, read_shared_chart, shared_store, write_shared_chart
+from src.cfg.colour_config import ColourConfig
+
+COLOURS = ColourConfig()
+CHART_BACKENDS = {"server": "🖼️ Static", "browser": "🖱️ Interactive"}
+
+# Lines are sent to the browser with at most this many points per series
+BROWSER_MAX_POINTS = 2000
+# Drag to pan and scroll to zoom along the x axis
+_ZOOM = [{"name": "zoom", "select": {"type": "interval", "encodings": ["x"]}, "bind": "scales"}]
+
+
+def chart_backend() -> str:
+    """
+    Get the chart backend for this session, falling back to the configured default
+    """
+    return st.session_state.get(
+        "chart_backend", st.secrets.get("chart_backend", "server")
+    )
+
+
+def render_chart(
+    plot: Callable[..., Figure],
+    spec: Callable[..., tuple[pd.DataFrame, dict]] | None,
+    *args,
+):
+    """
+    Render a chart with the selected backend. Server-side charts are rasterised
+    with matplotlib (in the compute pool, if there is one, and shared between
+    replicas, if they share a cache), while browser-side charts send the aggregated data and a Vega-Lite spec
+    for the browser to draw.
+
+    Args:
+        plot (Callable[..., Figure]): Builds the matplotlib figure
+        spec (Callable[..., tuple[pd.DataFrame, dict]] | None): Builds the
+            (data, spec) pair, or None if the chart only has a server version
+        *args: Passed to whichever builder is used
+    """
+    if spec is not None and chart_backend() == "browser":
+        with timed("render", spec.__name__):
+            data, vega_spec = spec(*args)
+            st.vega_lite_chart(data, vega_spec, use_container_width=True)
+    elif shared_store() is not None:
+        with timed("render", plot.__name__):
+            key = chart_key(plot.__name__, tuple(_identity(arg) for arg in args))
+            png = read_shared_chart(key)
+            if png is None:
+                png = compute(plot_png, plot, *args)
+                write_shared_chart(key, png)
+            st.image(png, width="stretch")
+    elif compute_pool() is not None:
+        with timed("render", plot.__name__):
+            st.image(compute(plot_png, plot, *args), width="stretch")
+    else:
+        with timed("render", plot.__name__):
+            fig = plot(*args)
+            st.pyplot(fig)
+            plt.close(fig)
+
+
+def _identity(arg):
+    """
+    What identifies a chart's argument: a prepared view's frame by its view
+    and data version, which is far cheaper than hashing its rows, and
+    anything else by itself
+    """
+    if isinstance(arg, pd.DataFrame):
+        view = view_identity(arg)
+        if view is not None:
+            return view
+    return arg
+
+
+def figure_png(fig: Figure) -> bytes:
+    """
+    Rasterise and close a figure, as st.pyplot would draw it
+    """
+    image = io.BytesIO()
+    fig.savefig(image, format="png", bbox_inches="tight", dpi=200)
+    plt.close(fig)
+    return image.getvalue()
+
+
+def plot_png(plot: Callable[..., Figure], *args) -> bytes:
+    """
+    Plot a chart and rasterise it, e.g. in a compute pool worker
+    """
+    return figure_png(plot(*args))
+
+
+def _date_axis(field: str, title: str | None = "Date") -> dict:
+    """
+    A temporal x encoding showing whole days
+    """
+    return {"field": field, "type": "temporal", "title": title, "axis": {"format": "%d-%b"}}
+
+
+def line_spec(
+    data: pd.DataFrame,
+    x: str,
+    colours: Sequence[str],
+    title: str,
+    ylabel: str,
+    points: bool = False,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    A zoomable line per (wide) data column, with hover tooltips. Long series
+    are downsampled before they are sent.
+
+    Args:
+        data (pd.DataFrame): One x column and one column per line
+        x (str): The x column
+        colours (Sequence[str]): The colour of each line
+        title (str): The chart title
+        ylabel (str): The y axis label
+        points (bool): Whether to mark each point
+
+    Returns:
+        tuple[pd.DataFrame, dict]: The data and the Vega-Lite spec
+    """
+    series = [c for c in data.columns if c != x]
+    if len(data) > BROWSER_MAX_POINTS:
+        indexed = data.set_index(x)
+        data = pd.concat(
+            [downsample_line(indexed[c], BROWSER_MAX_POINTS) for c in series], axis=1
+        ).sort_index().reset_index()
+    spec = {
+        "title": title,
+        "transform": [
+            {"fold": series, "as": ["Series", "Value"]},
+            {"filter": "isValid(datum.Value)"},
+        ],
+        "mark": {"type": "line", "point": points, "strokeWidth": 2},
+        "encoding": {
+            "x": _date_axis(x),
+            "y": {"field": "Value", "type": "quantitative", "title": ylabel},
+            "color": {
+                "field": "Series",
+                "type": "nominal",
+                "scale": {"domain": series, "range": list(colours)},
+                "legend": {"title": None} if len(series) > 1 else None,
+            },
+            "tooltip": [
+                {"field": x, "type": "temporal", "title": "Date", "format": "%d %b %H:%M"},
+                {"field": "Series", "type": "nominal"},
+                {"field": "Value", "type": "quantitative", "format": ".1f"},
+            ],
+        },
+        "params": _ZOOM,
+    }
+    return data, spec
+
+
+def bar_spec(
+    data: pd.DataFrame,
+    x: str,
+    title: str,
+    ylabel: str,
+    colours: Sequence[str] | None = None,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Zoomable per-day bars with hover tooltips. A single value column is
+    gradient coloured like the static charts, and several value columns are
+    stacked with one colour each.
+
+    Args:
+        data (pd.DataFrame): One date column and one or more value columns
+        x (str): The date column
+        title (str): The chart title
+        ylabel (str): The y axis label
+        colours (Sequence[str] | None): The colour of each stacked column
+
+    Returns:
+        tuple[pd.DataFrame, dict]: The data and the Vega-Lite spec
+    """
+    series = [c for c in data.columns if c != x]
+    if colours is None:
+        colour = {
+            "field": "Value",
+            "type": "quantitative",
+            "scale": {"range": ["#ffffff", COLOURS.PINK_HEX]},
+            "legend": None,
+        }
+    else:
+        colour = {
+            "field": "Series",
+            "type": "nominal",
+            "scale": {"domain": series, "range": list(colours)},
+            "legend": {"title": None},
+        }
+    spec = {
+        "title": title,
+        "transform": [{"fold": series, "as": ["Series", "Value"]}],
+        "mark": {"type": "bar", "stroke": "black", "strokeWidth": 0.5},
+        "encoding": {
+            "x": {**_date_axis(x), "timeUnit": "yearmonthdate", "bandPosition": 0},
+            "y": {"field": "Value", "type": "quantitative", "title": ylabel, "stack": True},
+            "color": colour,
+            "tooltip": [
+                {"field": x, "type": "temporal", "title": "Date", "format": "%d %b %Y"},
+                {"field": "Series", "type": "nominal"},
+                {"field": "Value", "type": "quantitative", "format": ".1f"},
+            ],
+        },
+        "params": _ZOOM,
+    }
+    return data, spec
+
+
+def timeline_spec(
+    pieces: pd.DataFrame, colours: Mapping[str, str], title: str
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Per-day blocks running midnight (top) to midnight (bottom), with hover tooltips.
+
+    Args:
+        pieces (pd.DataFrame): The day pieces, as built by plotting.timeline_pieces
+        colours (Mapping[str, str]): The colour of each block label
+        title (str): The chart title
+
+    Returns:
+        tuple[pd.DataFrame, dict]: The data and the Vega-Lite spec
+    """
+    data = pieces[["day", "start_hours", "end_hours", "label"]]
+    spec = {
+        "title": title,
+        "transform": [
+            {"calculate": "timeFormat(datetime(2000, 0, 1, 0, datum.start_hours * 60), '%H:%M')", "as": "From"},
+            {"calculate": "timeFormat(datetime(2000, 0, 1, 0, datum.end_hours * 60), '%H:%M')", "as": "To"},
+        ],
+        "mark": {"type": "bar", "stroke": COLOURS.BROWN_HEX, "strokeWidth": 0.5},
+        "encoding": {
+            "x": {
+                "field": "day",
+                "timeUnit": "yearmonthdate",
+                "type": "ordinal",
+                "title": None,
+                "axis": {"format": "%d %b", "formatType": "time", "labelAngle": -45},
+            },
+            "y": {
+                "field": "start_hours",
+                "type": "quantitative",
+                "title": "Time of Day",
+                "scale": {"domain": [0, 24], "reverse": True, "nice": False},
+                "axis": {"values": list(range(0, 25, 2))},
+            },
+            "y2": {"field": "end_hours"},
+            "color": {
+                "field": "label",
+                "type": "nominal",
+                "scale": {"domain": list(colours), "range": list(colours.values())},
+                "legend": {"title": None},
+            },
+            "tooltip": [
+                {"field": "day", "type": "temporal", "title": "Date", "format": "%d %b %Y"},
+                {"field": "label", "type": "nominal", "title": "State"},
+                {"field": "From", "type": "nominal"},
+                {"field": "To", "type": "nominal"},
+            ],
+        },
+        "params": [{"name": "zoom", "select": {"type": "interval", "encodings": ["y"]}, "bind": "scales"}],
+    }
+    return data, spec
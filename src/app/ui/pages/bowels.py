@@ -1,14 +1,21 @@
 import streamlit as st
-from src.clients.bigquery_client import bq_client
-from google.cloud import bigquery
+from src.clients.tables import NAPPY_TABLE, read_full_table, read_table, table_length, write_table
+from src.app.history import full_history_toggle, history_start, load_history
+from src.app.data_cache import cached_data, prepared_view
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime
+import matplotlib.colors as mcolors
 import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import numpy as np
 from src.cfg.colour_config import ColourConfig
+from src.app.ui.plotting import empty_chart, format_date_axis, line_chart
+from src.app.metrics import timed_function
+from src.app.ui.fragments import page_fragment
+from src.app.ui.interactive import render_chart
+from src.app.ui.record_picker import pick_record, record_index, search_records
 from matplotlib.figure import Figure
+from matplotlib.patches import Patch
 COLOURS = ColourConfig()
-NAPPY_TABLE = "archie-baby-app.baby_app.nappies"
 
 
 def display_bowels():
@@ -22,148 +29,26 @@ def display_bowels():
     # Retrieve the nappies data
     if "nappy_cache" not in st.session_state:
         st.session_state["nappy_cache"] = 0
-    nappies_data = get_nappies_data(st.session_state["nappy_cache"]).sort_values(
-        by=["nappy_date", "nappy_time"], ascending=False
+    nappies_data = prepare_nappies_data(
+        st.session_state["nappy_cache"], history_start("bowels")
     )
     col1, col2 = st.columns(2)
+    # Each form reruns on its own; the charts and table have no widgets, so
+    # they are simply drawn with the page
     with col1:
-        with st.form("nappy_submit_form"):
-            st.markdown(
-                "<h4 style='text-align: center;'>Log New Nappy</h4>",
-                unsafe_allow_html=True,
-            )
-            nappy_date = st.date_input("Nappy Date", value=datetime.today())
-            nappy_time = st.time_input("Nappy Time")
-            nappy_changer = st.selectbox(
-                "Nappy Changer",
-                list(
-                    set(
-                        ["Matt", "Grace"]
-                        + nappies_data["nappy_changer"].unique().tolist()
-                    )
-                ),
-                accept_new_options=True,
-            )
-            contains_wee = st.checkbox("Contains Wee?")
-            contains_poo = st.checkbox("Contains Poo?")
-            poo_colour = st.color_picker("Poo Colour")
-            notes = st.text_input("Other Notes")
-
-            form_submission = st.form_submit_button("Upload Nappy")
-
-    if form_submission:
-        new_nappy = pd.DataFrame(
-            {
-                "nappy_date": [nappy_date],
-                "nappy_time": [nappy_time],
-                "nappy_changer": [nappy_changer],
-                "contains_wee": [contains_wee],
-                "contains_poo": [contains_poo],
-                "poo_colour": [poo_colour if contains_poo else None],
-                "notes": [notes],
-            }
-        )
-        overall_nappy_data = pd.concat([nappies_data, new_nappy])
-        save_nappies_data(overall_nappy_data,expected_length_difference=1)
-
-    with col1:
-        with st.form("nappy_deletion"):
-            st.markdown(
-                "<h4 style='text-align: center;'>Delete Nappy</h4>",
-                unsafe_allow_html=True,
-            )
-            nappy_date_time = (
-                nappies_data["nappy_date"].apply(lambda x: x.strftime("%d-%m-%Y"))
-                + " ("
-                + nappies_data["nappy_time"].apply(lambda x: x.strftime("%H:%M"))
-                + ")"
-            )
-            selected_nappy = st.selectbox("Select Nappy", nappy_date_time)
-            delete_form_submit = st.form_submit_button(
-                "Delete Nappy",
-                help="Note that pressing this button will not remove your memory of this nappy", # noqa: E501
-            )
-    if delete_form_submit:
-        nappies_data = nappies_data[nappy_date_time != selected_nappy]
-        save_nappies_data(nappies_data,expected_length_difference=-1)
-
-    # Plot the nappies over time
-    with col2:
-        nappies_per_day = (
-            nappies_data.groupby("nappy_date")
-            .agg(total=("nappy_date", "count"), poo=("contains_poo", "sum"))
-            .sort_index()
-            .reset_index()
-        )
-        fig, ax = plt.subplots(figsize=(12, 8))
-        plt.plot(
-            nappies_per_day["nappy_date"],
-            nappies_per_day["total"],
-            color=COLOURS.PINK_HEX,
-            linewidth=2,
-        )
-        plt.scatter(
-            nappies_per_day["nappy_date"],
-            nappies_per_day["total"],
-            color=COLOURS.PINK_HEX,
-            s=400,
-            ec="k",
-            label="Total",
+        log_nappy_form(nappies_data)
+        delete_nappy_form(
+            prepare_nappy_index(st.session_state["nappy_cache"], history_start("bowels"))
         )
 
-        plt.plot(
-            nappies_per_day["nappy_date"],
-            nappies_per_day["poo"],
-            color=COLOURS.BROWN_HEX,
-            linewidth=2,
-        )
-        plt.scatter(
-            nappies_per_day["nappy_date"],
-            nappies_per_day["poo"],
-            color=COLOURS.BROWN_HEX,
-            s=400,
-            ec="k",
-            label="Poo",
-        )
-        plt.ylim([0, nappies_per_day["total"].max() + 1])
-        plt.ylabel("Nappies", fontsize=18, color=COLOURS.BROWN_HEX)
-        plt.xlabel("Date", fontsize=18, color=COLOURS.BROWN_HEX)
-        # Ensure that there are whole days shown on the x axis
-        locator = mdates.AutoDateLocator(
-            minticks=3, maxticks=10, interval_multiples=True
-        )
-        ax.xaxis.set_major_locator(locator)
-        # Format to show only dates (no times)
-        ax.xaxis.set_major_formatter(mdates.DateFormatter("%d-%m-%y"))
-
-        plt.xticks(fontsize=14)
-        plt.title("Nappies Over Time", fontsize=24, color=COLOURS.BROWN_HEX)
-        plt.legend(fontsize=14)
-        st.pyplot(fig)
-
-    # Plot the nappy leaderboard
+    # Plot the nappies over time and the nappy leaderboard
     with col2:
-        nappies_changed = (
-            nappies_data.groupby("nappy_changer")
-            .agg(count=("nappy_changer", "count"))
-            .sort_values(by="count")
-            .reset_index()
-        )
-        fig, ax = plt.subplots(figsize=(12, 8))
-        plt.barh(
-            nappies_changed["nappy_changer"],
-            nappies_changed["count"],
-            color=COLOURS.PINK_HEX,
-            ec="k",
-        )
-        plt.title("Nappies Changed Per Person", fontsize=24, color=COLOURS.BROWN_HEX)
-        plt.xlabel("Nappies Changed", fontsize=14, color=COLOURS.BROWN_HEX)
-        plt.yticks(fontsize=14)
-        st.pyplot(fig)
+        render_chart(plot_nappies_over_time, None, nappies_data)
+        render_chart(plot_nappies_changed_per_person, None, nappies_data)
 
     # Plot nappies by time
     with col2:
-        st.pyplot(create_nappies_by_time_chart(nappies_data))
+        render_chart(create_nappies_by_time_chart, None, nappies_data)
 
     st.markdown("_____________________")
     st.markdown(
@@ -173,47 +58,204 @@ def display_bowels():
         "<p style='text-align: center;'>Oh, what great memories are stored here...</p>",
         unsafe_allow_html=True,
     )
+    full_history_toggle("bowels")
     display_nappies_data(nappies_data)
 
-def create_nappies_by_time_chart(nappy_data:pd.DataFrame) -> Figure:
+
+@page_fragment
+def log_nappy_form(nappies_data: pd.DataFrame):
     """
-    Display the nappies changed by hours of the day
+    The form to log a nappy, offering everyone who has changed one before
     """
-    # Extract the hour from each nappy
-    nappy_data['nappy_hour'] = nappy_data['nappy_time'].apply(lambda x:x.hour)
+    with st.form("nappy_submit_form"):
+        st.markdown(
+            "<h4 style='text-align: center;'>Log New Nappy</h4>",
+            unsafe_allow_html=True,
+        )
+        nappy_date = st.date_input("Nappy Date", value=datetime.today())
+        nappy_time = st.time_input("Nappy Time")
+        nappy_changer = st.selectbox(
+            "Nappy Changer",
+            list(
+                set(
+                    ["Matt", "Grace"]
+                    + nappies_data["nappy_changer"].unique().tolist()
+                )
+            ),
+            accept_new_options=True,
+        )
+        contains_wee = st.checkbox("Contains Wee?")
+        contains_poo = st.checkbox("Contains Poo?")
+        poo_colour = st.color_picker("Poo Colour")
+        notes = st.text_input("Other Notes")
 
-    # Group the data
-    grouped_data = nappy_data.groupby(['nappy_changer','nappy_hour']).agg(count = ('nappy_hour','count')).reset_index()
+        form_submission = st.form_submit_button("Upload Nappy")
 
-    # Create the figure
-    fig,ax = plt.subplots(figsize=(12,8))
+    if form_submission:
+        new_nappy = NAPPY_TABLE.record(
+            nappy_date=nappy_date,
+            nappy_time=nappy_time,
+            nappy_changer=nappy_changer,
+            contains_wee=contains_wee,
+            contains_poo=contains_poo,
+            poo_colour=poo_colour if contains_poo else None,
+            notes=notes,
+        )
+        overall_nappy_data = pd.concat([read_full_table(NAPPY_TABLE), new_nappy])
+        save_nappies_data(overall_nappy_data,expected_length_difference=1)
 
-    # Separate the data
-    matt_data = grouped_data[grouped_data['nappy_changer'] == 'Matt'].reset_index(drop=True)
-    grace_data = grouped_data[grouped_data['nappy_changer'] == 'Grace'].reset_index(drop=True)
 
-    # Add Grace data into Matt's
-    matt_data['grace_count'] = matt_data['nappy_hour'].map(grace_data.set_index('nappy_hour')['count'].to_dict()).fillna(0)
-    grace_data['matt_count'] = grace_data['nappy_hour'].map(matt_data.set_index('nappy_hour')['count'].to_dict()).fillna(0)
+@page_fragment
+def delete_nappy_form(nappy_index: pd.DataFrame):
+    """
+    The form to delete a nappy
+    """
+    st.markdown(
+        "<h4 style='text-align: center;'>Delete Nappy</h4>",
+        unsafe_allow_html=True,
+    )
+    nappies = search_records(nappy_index, "nappy_deletion_search")
+    with st.form("nappy_deletion"):
+        selected_nappy = pick_record("Select Nappy", nappies)
+        delete_form_submit = st.form_submit_button(
+            "Delete Nappy",
+            help="Note that pressing this button will not remove your memory of this nappy", # noqa: E501
+        )
+    if delete_form_submit and selected_nappy is not None:
+        overall_nappy_data = read_full_table(NAPPY_TABLE)
+        overall_nappy_data = overall_nappy_data[nappy_times(overall_nappy_data) != selected_nappy]
+        save_nappies_data(overall_nappy_data,expected_length_difference=-1)
 
-    # Plot Matt's data
-    plt.barh(matt_data['nappy_hour'],matt_data['count'],ec='k',color =[COLOURS.GREY_YELLOW_HEX if x['grace_count'] > x['count'] else COLOURS.YELLOW_HEX for _,x in matt_data.iterrows()], label='Matt',
-             )
 
-    # Plot Grace's data
-    plt.barh(grace_data['nappy_hour'],(-1)*grace_data['count'],ec='k',color =[COLOURS.GREY_PINK_HEX if x['matt_count'] > x['count'] else COLOURS.PINK_HEX for _,x in grace_data.iterrows()], label='Grace')
+def nappy_times(nappy_data: pd.DataFrame) -> pd.Series:
+    """
+    Get when each nappy was changed, from its date and time
+    """
+    return pd.to_datetime(nappy_data["nappy_date"]) + nappy_data["nappy_time"].astype(
+        "timedelta64[ns]"
+    )
 
-    # Format
-    plt.yticks(range(24), [f'{x}:00' for x in range(24)])
-    plt.ylabel('Time', fontsize=14)
-    plt.xlabel('Nappies Changed', fontsize=14)
-    plt.xticks(ax.get_xticks(), [str(abs(int(x))) for x in ax.get_xticks()])
-    plt.title('Nappies Changed By Time (Grace v Matt)', fontsize=24)
-    plt.legend(fontsize=14)
-    ax.grid(axis='y',alpha=0.5)
+
+def plot_nappies_over_time(nappy_data: pd.DataFrame) -> Figure:
+    """
+    Plot the total nappies and poo nappies per day
+    """
+    nappies_per_day = (
+        nappy_data.groupby("day")
+        .agg(total=("day", "count"), poo=("contains_poo", "sum"))
+        .sort_index()
+    )
+    if len(nappies_per_day) == 0:
+        return empty_chart("Nappies Over Time", "No nappies changed yet", figsize=(12, 8))
+
+    fig, ax = line_chart(
+        {"Total": nappies_per_day["total"], "Poo": nappies_per_day["poo"]},
+        colours=[COLOURS.PINK_HEX, COLOURS.BROWN_HEX],
+        title="Nappies Over Time",
+        ylabel="Nappies",
+        date_format=None,
+        figsize=(12, 8),
+        label_size=18,
+    )
+    for column, colour in [("total", COLOURS.PINK_HEX), ("poo", COLOURS.BROWN_HEX)]:
+        ax.scatter(
+            nappies_per_day.index, nappies_per_day[column], color=colour, s=400, ec="k"
+        )
+    ax.set_ylim([0, nappies_per_day["total"].max() + 1])
+    ax.yaxis.label.set_color(COLOURS.BROWN_HEX)
+    ax.xaxis.label.set_color(COLOURS.BROWN_HEX)
+    ax.set_title("Nappies Over Time", fontsize=24, color=COLOURS.BROWN_HEX)
+    # Ensure that there are whole days shown on the x axis
+    format_date_axis(ax, "%d-%m-%y", minticks=3)
+    ax.tick_params(axis="x", labelsize=14)
+    ax.legend(fontsize=14)
+    return fig
+
+
+def plot_nappies_changed_per_person(nappy_data: pd.DataFrame) -> Figure:
+    """
+    Plot the nappy leaderboard
+    """
+    nappies_changed = nappy_data["nappy_changer"].value_counts(ascending=True)
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    ax.barh(
+        nappies_changed.index,
+        nappies_changed.to_numpy(),
+        color=COLOURS.PINK_HEX,
+        ec="k",
+    )
+    ax.set_title("Nappies Changed Per Person", fontsize=24, color=COLOURS.BROWN_HEX)
+    ax.set_xlabel("Nappies Changed", fontsize=14, color=COLOURS.BROWN_HEX)
+    ax.tick_params(axis="y", labelsize=14)
     return fig
 
 
+@timed_function("aggregate")
+def nappies_by_hour(nappy_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Nappies changed in each hour of the day by each caregiver, with a row for
+    every hour and a column for each caregiver (alphabetically)
+    """
+    counts = pd.crosstab(nappy_data["nappy_hour"], nappy_data["nappy_changer"])
+    return counts.reindex(range(24), fill_value=0).sort_index(axis=1)
+
+
+def caregiver_colours(n: int) -> np.ndarray:
+    """
+    A colour for each of n caregivers: the theme's pink and yellow, then a
+    qualitative palette that stands out from the chart's blue background
+    """
+    palette = [COLOURS.PINK_HEX, COLOURS.YELLOW_HEX]
+    # Leaving out Set2's grey, which would look like a greyed-out bar
+    extra = plt.get_cmap("Set2")(np.arange(max(n - len(palette), 0)) % 7)
+    return np.vstack([mcolors.to_rgba_array(palette), extra])[:n]
+
+
+def create_nappies_by_time_chart(nappy_data: pd.DataFrame) -> Figure:
+    """
+    Display the nappies changed by hours of the day, with a bar for each
+    caregiver. In each hour, whoever changed the most nappies is in full
+    colour and everyone else is greyed out.
+    """
+    counts = nappies_by_hour(nappy_data)
+    title = "Nappies Changed By Time"
+    if counts.shape[1] == 0:
+        return empty_chart(title, "No nappies changed yet", figsize=(12, 8))
+
+    values = counts.to_numpy()
+    leads = values >= values.max(axis=1, keepdims=True)
+    colours = caregiver_colours(len(counts.columns))
+    greyed = (colours + mcolors.to_rgba("#BDBDBD")) / 2
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    hours = np.arange(24)
+    height = 0.8 / len(counts.columns)
+    for i, caregiver in enumerate(counts.columns):
+        offset = (i - (len(counts.columns) - 1) / 2) * height
+        ax.barh(
+            hours + offset,
+            values[:, i],
+            height=height,
+            ec="k",
+            color=np.where(leads[:, [i]], colours[i], greyed[i]),
+        )
+
+    # Format
+    ax.set_yticks(hours, [f"{x}:00" for x in hours])
+    ax.set_ylabel("Time", fontsize=14)
+    ax.set_xlabel("Nappies Changed", fontsize=14)
+    ax.set_title(title, fontsize=24)
+    ax.legend(
+        handles=[
+            Patch(facecolor=colour, edgecolor="k", label=caregiver)
+            for caregiver, colour in zip(counts.columns, colours)
+        ],
+        fontsize=14,
+    )
+    ax.grid(axis="y", alpha=0.5)
+    return fig
+
 
 def display_nappies_data(df: pd.DataFrame):
     """
@@ -227,7 +269,8 @@ def display_nappies_data(df: pd.DataFrame):
         return ""
 
     # Tidy columns
-    df = df[
+    df = NAPPY_TABLE.labelled(
+        df,
         [
             "nappy_date",
             "nappy_time",
@@ -236,22 +279,42 @@ def display_nappies_data(df: pd.DataFrame):
             "contains_poo",
             "poo_colour",
             "notes",
-        ]
-    ].reset_index(drop=True)
-    df.index += 1
-    df.columns = [x.replace("_", " ").title() for x in df.columns]
+        ],
+    )
     # Apply styler
     styled_df = df.style.map(highlight_hex, subset=["Poo Colour"]).hide(axis="index")
     st.dataframe(styled_df)
 
 
-@st.cache_data(show_spinner="Reminding ourselves of all the nappies...")
-def get_nappies_data(cache_index: int) -> pd.DataFrame:
+@cached_data("Reminding ourselves of all the nappies...", NAPPY_TABLE.name)
+def get_nappies_data(cache_index: int, start: date | None, end: date | None) -> pd.DataFrame:
     """
-    Get the nappies data from GBQ
+    Get one slice of the nappies data from GBQ
     """
-    client = bq_client()
-    return client.query(f"SELECT * FROM {NAPPY_TABLE}").to_dataframe()
+    return read_table(NAPPY_TABLE, start, end)
+
+
+@prepared_view(NAPPY_TABLE.name)
+def prepare_nappies_data(cache_index: int, start: date | None) -> pd.DataFrame:
+    """
+    The nappies data from start onwards, newest first, with each nappy's day
+    and hour derived once per data version. The frame is shared, so read-only.
+    """
+    df = load_history(get_nappies_data, cache_index, start, "nappy_date")
+    df["day"] = pd.to_datetime(df["nappy_date"])
+    df["nappy_hour"] = (
+        df["nappy_time"].astype("timedelta64[ns]") // pd.Timedelta(hours=1)
+    ).astype("Int64")
+    return df.sort_values(by=["nappy_date", "nappy_time"], ascending=False)
+
+
+@prepared_view(NAPPY_TABLE.name)
+def prepare_nappy_index(cache_index: int, start: date | None) -> pd.DataFrame:
+    """
+    The nappies' change times for the record picker
+    """
+    return record_index(nappy_times(prepare_nappies_data(cache_index, start)))
+
 
 def save_nappies_data(nappy_data: pd.DataFrame, expected_length_difference:int):
     """
@@ -263,23 +326,14 @@ def save_nappies_data(nappy_data: pd.DataFrame, expected_length_difference:int):
             and the true dataset
     """
     # Get the (uncached) length of the true dataset
-    client = bq_client()
-    table_length = client.query(f"SELECT COUNT(*) AS length FROM {NAPPY_TABLE}").to_dataframe()['length'].to_numpy()[0]
+    true_length = table_length(NAPPY_TABLE)
 
     # Assert that the length is as expected
-    if len(nappy_data) != table_length + expected_length_difference:
+    if len(nappy_data) != true_length + expected_length_difference:
         st.toast('Unable to save data - please ensure that you have reset the cache to get the most recent table! This can be done using the button at the bottom of the page.') # noqa: E501
         return
-    # Job config to overwrite table
-    job_config = bigquery.LoadJobConfig(
-        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE
-    )
-
-    # Upload dataframe
-    job = bq_client().load_table_from_dataframe(
-        nappy_data, NAPPY_TABLE, job_config=job_config
-    )
-    job.result()  # Wait for the job to complete
+    # Overwrite the table
+    write_table(NAPPY_TABLE, nappy_data)
 
     # Update cache and rerun
     st.success("Nappy Data Updated!")
@@ -1,15 +1,17 @@
 import streamlit as st
-from src.clients.bigquery_client import bq_client
-from google.cloud import bigquery
+from src.clients.tables import DRINKING_TABLE, read_full_table, read_table, table_length, write_table
+from src.app.history import full_history_toggle, history_start, load_history
 import pandas as pd
-from datetime import datetime
-import matplotlib.pyplot as plt
+from datetime import date, datetime
 from src.cfg.colour_config import ColourConfig
-import matplotlib.colors as mcolors
-import matplotlib.dates as mdates
+from src.app.ui.plotting import bar_chart, gradient_colours, line_chart
+from src.app.metrics import timed_function
+from src.app.data_cache import cached_data, prepared_view
+from src.app.ui.fragments import page_fragment
+from src.app.ui.interactive import bar_spec, line_spec, render_chart
+from src.app.ui.record_picker import pick_record, record_index, search_records
 
 COLOURS = ColourConfig()
-DRINKING_TABLE = "archie-baby-app.baby_app.drinking_refactored"
 
 
 def display_drinking():
@@ -23,60 +25,30 @@ def display_drinking():
     # Retrieve the drinking data
     if "drinking_cache" not in st.session_state:
         st.session_state["drinking_cache"] = 0
-    drinking_data = get_drinking_data(st.session_state["drinking_cache"]).sort_values(
-        by=["feed_date"], ascending=False
+    drinking_data = prepare_drinking_data(
+        st.session_state["drinking_cache"], history_start("drinking")
     )
     col1,col2 = st.columns(2)
+    # Each form reruns on its own; the charts and table have no widgets, so
+    # they are simply drawn with the page
     with col1:
-        with st.form('add_drinking_data'):
-
-            start_date = st.date_input('Start Date')
-            start_time = st.time_input('Start Time')
-            bottle_fed = st.checkbox('Bottle Fed?')
-            st.markdown('________')
-            st.write('Breastfeed Information (leave blank if bottle fed)')
-            side = st.selectbox('Select Start Side',['None','Left','Right'],help = 'This is the side from your point of view')
-            start_side_time = st.number_input('Time on Start Side (Minutes)', step=1)
-            total_time = st.number_input('Total Time (Minutes)',step=1)
-            st.markdown('________')
-            st.write('Bottle Information (leave blank if breastfed)')
-            total_volume = st.number_input('Feed Volume (ml)', step=1)
-
-            add_drink = st.form_submit_button('Add Drink!')
-    if add_drink:
-        if total_time < start_side_time:
-            st.error('Total time should not be less than the time on the start side!')
-        new_drink_date = pd.DataFrame({
-            'feed_date':[
-                    datetime.combine(start_date, start_time)
-                ],
-            'breastfeed_duration':[total_time],
-            'start_side':[side],
-            'start_side_time':[start_side_time],
-            'bottle_fed':[bottle_fed],
-            'bottle_quantity':[total_volume]
-
-        })
-        drinking_data = pd.concat([drinking_data, new_drink_date])
-        save_drinking_data(drinking_data, expected_length_difference=1)
-
-    with col1:
-        with st.form('delete_drink'):
-            st.markdown(
-                    "<h4 style='text-align: center;'>Delete Drink</h4>",
-                    unsafe_allow_html=True,
-            )
-            st.write('The baby does this by vomiting, but this form is less messy')
-            delete_drink_time = st.selectbox('Select Drink',options = drinking_data['feed_date'].unique())
-            delete_drink = st.form_submit_button('Delete Drink')
-    if delete_drink:
-        drinking_data = drinking_data[drinking_data['feed_date']!=delete_drink_time].reset_index(drop=True)
-        save_drinking_data(drinking_data, expected_length_difference=-1)
+        add_drink_form()
+        delete_drink_form(
+            prepare_drink_index(st.session_state["drinking_cache"], history_start("drinking"))
+        )
 
     with col2:
-        st.pyplot(plot_drinks_per_day(drinking_data))
-        st.pyplot(plot_bottle_drink_volume_per_day(drinking_data))
-        st.pyplot(plot_bottle_drink_volume_rolling_24h(drinking_data))
+        render_chart(plot_drinks_per_day, spec_drinks_per_day, drinking_data)
+        render_chart(
+            plot_bottle_drink_volume_per_day,
+            spec_bottle_drink_volume_per_day,
+            drinking_data,
+        )
+        render_chart(
+            plot_bottle_drink_volume_rolling_24h,
+            spec_bottle_drink_volume_rolling_24h,
+            drinking_data,
+        )
 
     st.markdown("_____________________")
     st.markdown(
@@ -86,55 +58,160 @@ def display_drinking():
         "<p style='text-align: center;'>I promise we'll feed him real food one day...</p>",
         unsafe_allow_html=True,
     )
+    full_history_toggle("drinking")
     display_drinking_data(drinking_data)
 
 
-@st.cache_data(show_spinner="Not that kind of drinking...")
-def get_drinking_data(cache_index: int) -> pd.DataFrame:
+@page_fragment
+def add_drink_form():
+    """
+    The form to add a drink
+    """
+    with st.form('add_drinking_data'):
+
+        start_date = st.date_input('Start Date')
+        start_time = st.time_input('Start Time')
+        bottle_fed = st.checkbox('Bottle Fed?')
+        st.markdown('________')
+        st.write('Breastfeed Information (leave blank if bottle fed)')
+        side = st.selectbox('Select Start Side',['None','Left','Right'],help = 'This is the side from your point of view')
+        start_side_time = st.number_input('Time on Start Side (Minutes)', step=1)
+        total_time = st.number_input('Total Time (Minutes)',step=1)
+        st.markdown('________')
+        st.write('Bottle Information (leave blank if breastfed)')
+        total_volume = st.number_input('Feed Volume (ml)', step=1)
+
+        add_drink = st.form_submit_button('Add Drink!')
+    if add_drink:
+        if total_time < start_side_time:
+            st.error('Total time should not be less than the time on the start side!')
+        new_drink_date = DRINKING_TABLE.record(
+            feed_date=datetime.combine(start_date, start_time),
+            breastfeed_duration=total_time,
+            start_side=side,
+            start_side_time=start_side_time,
+            bottle_fed=bottle_fed,
+            bottle_quantity=total_volume,
+        )
+        all_drinking_data = pd.concat([read_full_table(DRINKING_TABLE), new_drink_date])
+        save_drinking_data(all_drinking_data, expected_length_difference=1)
+
+
+@page_fragment
+def delete_drink_form(drink_index: pd.DataFrame):
     """
-    Get the sleeping data from GBQ
+    The form to delete a drink
     """
-    client = bq_client()
-    return client.query(f"SELECT * FROM {DRINKING_TABLE}").to_dataframe()
+    st.markdown(
+            "<h4 style='text-align: center;'>Delete Drink</h4>",
+            unsafe_allow_html=True,
+    )
+    st.write('The baby does this by vomiting, but this form is less messy')
+    drinks = search_records(drink_index, 'delete_drink_search')
+    with st.form('delete_drink'):
+        delete_drink_time = pick_record('Select Drink', drinks)
+        delete_drink = st.form_submit_button('Delete Drink')
+    if delete_drink and delete_drink_time is not None:
+        all_drinking_data = read_full_table(DRINKING_TABLE)
+        all_drinking_data = all_drinking_data[all_drinking_data['feed_date']!=delete_drink_time].reset_index(drop=True)
+        save_drinking_data(all_drinking_data, expected_length_difference=-1)
+
+
+@cached_data("Not that kind of drinking...", DRINKING_TABLE.name)
+def get_drinking_data(cache_index: int, start: date | None, end: date | None) -> pd.DataFrame:
+    """
+    Get one slice of the drinking data from GBQ
+    """
+    return read_table(DRINKING_TABLE, start, end)
 
 
-def plot_drinks_per_day(df: pd.DataFrame):
+@prepared_view(DRINKING_TABLE.name)
+def prepare_drinking_data(cache_index: int, start: date | None) -> pd.DataFrame:
     """
-    Plot number of drinks per day, with bottle-fed drinks as a separate line.
+    The drinking data from start onwards, newest first, with each feed's day
+    derived once per data version. The frame is shared, so read-only.
     """
-    df = df.copy()
-    df["feed_date"] = pd.to_datetime(df["feed_date"])
-    df["day"] = df["feed_date"].dt.date
+    df = load_history(get_drinking_data, cache_index, start, "feed_date")
+    df["day"] = df["feed_date"].dt.normalize()
+    return df.sort_values(by=["feed_date"], ascending=False)
 
-    total_counts = df.groupby("day").size()
-    bottle_counts = df[df["bottle_fed"]].groupby("day").size()
 
-    fig, ax = plt.subplots(figsize=(8, 5))
-    total_counts.plot(ax=ax, marker="o", color=COLOURS.PINK_HEX, label="All drinks")
-    bottle_counts.plot(ax=ax, marker="o", color='k', label="Bottle-fed drinks")
+@prepared_view(DRINKING_TABLE.name)
+def prepare_drink_index(cache_index: int, start: date | None) -> pd.DataFrame:
+    """
+    The drinks' feed times for the record picker
+    """
+    return record_index(prepare_drinking_data(cache_index, start)["feed_date"])
 
 
-    plt.ylabel("Number of Drinks", fontsize=14)
-    plt.xlabel("Date",fontsize=14)
-    plt.title("Number of Drinks per Day", fontsize=18)
-    ax.legend()
-    plt.xticks(rotation=45, ha="right")
-    # Ensure that there are whole days shown on the x axis
-    locator = mdates.AutoDateLocator(
-        minticks=1, maxticks=10, interval_multiples=True
+@timed_function("aggregate")
+def drinks_per_day(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Count all drinks and bottle-fed drinks per day
+    """
+    day = df["day"]
+    bottle_fed = df["bottle_fed"].fillna(False).astype(bool)
+    return (
+        pd.DataFrame({"All drinks": 1, "Bottle-fed drinks": bottle_fed.astype(int)})
+        .groupby(day)
+        .sum()
+    )
+
+
+@timed_function("aggregate")
+def bottle_volume_per_day(df: pd.DataFrame) -> pd.Series:
+    """
+    Total bottle volume per day (based on feed start day)
+    """
+    df = df.dropna(subset=["bottle_quantity"])
+    return df["bottle_quantity"].groupby(df["day"]).sum()
+
+
+@timed_function("aggregate")
+def bottle_volume_rolling_24h(df: pd.DataFrame) -> pd.Series:
+    """
+    Rolling 24-hour total bottle quantity, sampled hourly
+    """
+    df = df.dropna(subset=["bottle_quantity"])
+    quantity = pd.Series(
+        df["bottle_quantity"].to_numpy(),
+        index=df["feed_date"],
+        name="Rolling 24-Hour Total",
+    ).sort_index()
+
+    # Resample to an hourly total (adjust frequency if you need finer resolution)
+    hourly = quantity.resample("1h").sum()
+
+    # Rolling 24-hour total
+    return hourly.rolling("24h").sum()
+
+
+def plot_drinks_per_day(df: pd.DataFrame):
+    """
+    Plot number of drinks per day, with bottle-fed drinks as a separate line.
+    """
+    fig, _ = line_chart(
+        drinks_per_day(df),
+        colours=[COLOURS.PINK_HEX, "k"],
+        title="Number of Drinks per Day",
+        ylabel="Number of Drinks",
+        marker="o",
     )
-    ax.xaxis.set_major_locator(locator)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%d-%b"))
-    plt.tight_layout()
     return fig
 
-def _get_gradient_colours(values:pd.Series, hex_colour:str, minimum:float = None):
+
+def spec_drinks_per_day(df: pd.DataFrame):
     """
-    Map values to a gradient between white and the given hex colour.
+    Browser-rendered version of plot_drinks_per_day
     """
-    cmap = mcolors.LinearSegmentedColormap.from_list("custom", ["#ffffff", hex_colour])
-    norm = mcolors.Normalize(vmin=values.min() if minimum is None else minimum, vmax=values.max())
-    return [cmap(norm(v)) for v in values]
+    return line_spec(
+        drinks_per_day(df).reset_index(),
+        x="day",
+        colours=[COLOURS.PINK_HEX, COLOURS.BROWN_HEX],
+        title="Number of Drinks per Day",
+        ylabel="Number of Drinks",
+        points=True,
+    )
 
 
 def plot_bottle_drink_volume_per_day(df: pd.DataFrame):
@@ -142,58 +219,55 @@ def plot_bottle_drink_volume_per_day(df: pd.DataFrame):
     Plot total duration of drinks per day (based on feed start day).
     Colours scaled white → pink.
     """
-    df = df.copy()
-    df["feed_date"] = pd.to_datetime(df["feed_date"])
-    df["day"] = df["feed_date"].dt.date
-
-    duration_by_day = df.dropna(subset=['bottle_quantity']).groupby("day")["bottle_quantity"].sum()
-    colours = _get_gradient_colours(duration_by_day.values, COLOURS.PINK_HEX)
-
-    fig, ax = plt.subplots(figsize=(8, 5))
-    ax.bar(duration_by_day.index, duration_by_day.values, color=colours, ec='k')
-
-    plt.ylabel("Total Volume (ml)", fontsize=14)
-    plt.xlabel("Date", fontsize=14)
-    plt.title("Total Bottle Drink Volume Per Day", fontsize=18)
-    plt.xticks(rotation=45, ha="right")
-    # Ensure that there are whole days shown on the x axis
-    locator = mdates.AutoDateLocator(
-        minticks=1, maxticks=10, interval_multiples=True
+    duration_by_day = bottle_volume_per_day(df)
+    fig, _ = bar_chart(
+        duration_by_day.index,
+        duration_by_day,
+        title="Total Bottle Drink Volume Per Day",
+        ylabel="Total Volume (ml)",
+        xlabel="Date",
+        date_format="%d-%b",
     )
-    ax.xaxis.set_major_locator(locator)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%d-%b"))
-    plt.tight_layout()
     return fig
+
+
+def spec_bottle_drink_volume_per_day(df: pd.DataFrame):
+    """
+    Browser-rendered version of plot_bottle_drink_volume_per_day
+    """
+    return bar_spec(
+        bottle_volume_per_day(df).rename("Volume (ml)").reset_index(),
+        x="day",
+        title="Total Bottle Drink Volume Per Day",
+        ylabel="Total Volume (ml)",
+    )
+
+
 def plot_bottle_drink_volume_rolling_24h(df: pd.DataFrame):
     """
     Plot the rolling 24-hour total bottle quantity.
     Each point represents the total intake over the previous 24 hours.
     """
-    df = df.copy()
-    df["feed_date"] = pd.to_datetime(df["feed_date"])
-    df = df.dropna(subset=["bottle_quantity"])
-    df = df.set_index("feed_date").sort_index()
-
-    # Resample to an hourly total (adjust frequency if you need finer resolution)
-    hourly = df["bottle_quantity"].resample("1h").sum()
-
-    # Rolling 24-hour total
-    rolling_24h_total = hourly.rolling("24h").sum()
-
-    fig, ax = plt.subplots(figsize=(8, 5))
-    ax.plot(rolling_24h_total.index, rolling_24h_total.values, color=COLOURS.PINK_HEX, lw=2)
-
-    ax.set_ylabel("Rolling 24-Hour Total (ml)", fontsize=14)
-    ax.set_xlabel("Date", fontsize=14)
-    ax.set_title("Bottle Intake: Rolling 24-Hour Total", fontsize=18)
+    fig, _ = line_chart(
+        bottle_volume_rolling_24h(df).to_frame(),
+        colours=[COLOURS.PINK_HEX],
+        title="Bottle Intake: Rolling 24-Hour Total",
+        ylabel="Rolling 24-Hour Total (ml)",
+    )
+    return fig
 
-    locator = mdates.AutoDateLocator(minticks=1, maxticks=10, interval_multiples=True)
-    ax.xaxis.set_major_locator(locator)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%d-%b"))
-    plt.xticks(rotation=45, ha="right")
 
-    plt.tight_layout()
-    return fig
+def spec_bottle_drink_volume_rolling_24h(df: pd.DataFrame):
+    """
+    Browser-rendered version of plot_bottle_drink_volume_rolling_24h
+    """
+    return line_spec(
+        bottle_volume_rolling_24h(df).reset_index(),
+        x="feed_date",
+        colours=[COLOURS.PINK_HEX],
+        title="Bottle Intake: Rolling 24-Hour Total",
+        ylabel="Rolling 24-Hour Total (ml)",
+    )
 
 def plot_duration_by_side(df: pd.DataFrame):
     """
@@ -218,16 +292,14 @@ def plot_duration_by_side(df: pd.DataFrame):
         "Right": 100*df["right_duration"].sum()/total_duration,
     })
 
-    colours = _get_gradient_colours(side_durations.values, COLOURS.PINK_HEX, minimum=0)
-
-    fig, ax = plt.subplots(figsize=(8, 5))
-    ax.bar(side_durations.index, side_durations.values, color=colours, ec='k')
-
-    plt.ylabel("Percentage Duration", fontsize=14)
-    plt.xlabel("Side", fontsize=14)
-
-    plt.title("Drink Duration by Side", fontsize=18)
-    plt.tight_layout()
+    fig, _ = bar_chart(
+        side_durations.index,
+        side_durations,
+        title="Drink Duration by Side",
+        ylabel="Percentage Duration",
+        xlabel="Side",
+        colours=gradient_colours(side_durations, vmin=0),
+    )
     return fig
 
 def save_drinking_data(drinking_data: pd.DataFrame, expected_length_difference:int):
@@ -240,39 +312,15 @@ def save_drinking_data(drinking_data: pd.DataFrame, expected_length_difference:i
             and the true dataset
     """
     # Get the (uncached) length of the true dataset
-    client = bq_client()
-    table_length = client.query(f"SELECT COUNT(*) AS length FROM {DRINKING_TABLE}").to_dataframe()['length'].to_numpy()[0]
+    true_length = table_length(DRINKING_TABLE)
 
     # Assert that the length is as expected
-    if len(drinking_data) != table_length + expected_length_difference:
+    if len(drinking_data) != true_length + expected_length_difference:
         st.toast('Unable to save data - please ensure that you have reset the cache to get the most recent table! This can be done using the button at the bottom of the page.') # noqa: E501
         return
 
-    # Ensure data has the correct type
-    drinking_data["feed_date"] = pd.to_datetime(
-        drinking_data["feed_date"]
-    )
-
-    # Job config to overwrite table
-    job_config = bigquery.LoadJobConfig(
-        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
-        schema=[
-            bigquery.SchemaField("feed_date", "DATETIME"),
-            bigquery.SchemaField("breastfeed_duration", "FLOAT"),
-            bigquery.SchemaField("start_side", "STRING"),
-            bigquery.SchemaField("start_side_time", "FLOAT"),
-            bigquery.SchemaField('bottle_fed','BOOLEAN'),
-            bigquery.SchemaField('bottle_quantity','FLOAT'),
-
-
-        ],
-    )
-
-    # Upload dataframe
-    job = bq_client().load_table_from_dataframe(
-        drinking_data, DRINKING_TABLE, job_config=job_config
-    )
-    job.result()  # Wait for the job to complete
+    # Overwrite the table
+    write_table(DRINKING_TABLE, drinking_data)
 
     # Update cache and rerun
     st.success("Drinking Data Updated!")
@@ -284,20 +332,16 @@ def display_drinking_data(df: pd.DataFrame):
     """
     Display the full sleeping data
     """
-    # Tidy columns
-    df = df[
-        [
-            "feed_date",
-            "bottle_fed",
-            "breastfeed_duration",
-            "start_side",
-            "start_side_time",
-            'bottle_quantity'
-        ]
-    ].reset_index(drop=True)
-    df.index += 1
-    df.columns = [
-        x.replace("_", " ").title().replace("Duration","Duration (Mins)").replace("Time", "Time (Mins)").replace('Quantity','Quantity (ml)')
-        for x in df.columns
-    ]
-    st.dataframe(df)
+    st.dataframe(
+        DRINKING_TABLE.labelled(
+            df,
+            [
+                "feed_date",
+                "bottle_fed",
+                "breastfeed_duration",
+                "start_side",
+                "start_side_time",
+                "bottle_quantity",
+            ],
+        )
+    )
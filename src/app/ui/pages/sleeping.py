@@ -1,15 +1,28 @@
 import streamlit as st
-from src.clients.bigquery_client import bq_client
-from google.cloud import bigquery
+from src.clients.tables import SLEEPING_TABLE, read_full_table, read_table, table_length, write_table
+from src.app.history import extend_history, full_history_toggle, history_start, load_history
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime
 import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 import numpy as np
 from src.cfg.colour_config import ColourConfig
+from src.app.ui.plotting import (
+    bar_chart,
+    empty_chart,
+    fit_bars,
+    format_date_axis,
+    gradient_colours,
+    split_intervals,
+    timeline_chart,
+    timeline_pieces,
+)
+from src.app.metrics import timed_function
+from src.app.data_cache import cached_data, prepared_view
+from src.app.ui.fragments import page_fragment
+from src.app.ui.interactive import bar_spec, render_chart, timeline_spec
+from src.app.ui.record_picker import pick_record, record_index, search_records
 
 COLOURS = ColourConfig()
-SLEEPING_TABLE = "archie-baby-app.baby_app.sleeping"
 
 
 def display_sleeping():
@@ -20,266 +33,304 @@ def display_sleeping():
 
     if "sleeping_cache" not in st.session_state:
         st.session_state["sleeping_cache"] = 0
-    sleeping_data = get_sleeping_data(st.session_state["sleeping_cache"]).sort_values(
-        by=["sleep_start_time"], ascending=False
+    sleeping_data = prepare_sleeping_data(
+        st.session_state["sleeping_cache"], history_start("sleeping")
+    )
+    night_data = prepare_sleeps_of_type(
+        st.session_state["sleeping_cache"], history_start("sleeping"), "Night"
+    )
+    nap_data = prepare_sleeps_of_type(
+        st.session_state["sleeping_cache"], history_start("sleeping"), "Nap"
+    )
+    sleep_index = prepare_sleep_index(
+        st.session_state["sleeping_cache"], history_start("sleeping"), False
+    )
+    open_sleep_index = prepare_sleep_index(
+        st.session_state["sleeping_cache"], history_start("sleeping"), True
     )
 
     col1, col2 = st.columns(2)
 
+    # Each form and the timeline rerun on their own; the charts and table
+    # have no widgets, so they are simply drawn with the page
     with col1:
-        # --- Log Nap ---
-        with st.form("nap_form"):
-            st.markdown(
-                "<h4 style='text-align: center;'>Log Nap</h4>", unsafe_allow_html=True
-            )
-            nap_date = st.date_input("Nap Date", value=datetime.today())
-            nap_start_time = st.time_input("Start Time")
-            nap_end_time = st.time_input("End Time")
-            nap_location = st.selectbox(
-                "Location",
-                options=["Pram", "Cot"],
-            )
-            nap_submit = st.form_submit_button("Log Nap")
+        log_nap_form()
+        log_bedtime_form(sleeping_data)
+        log_wake_up_form(open_sleep_index)
+        delete_sleep_form(sleep_index)
 
-        # --- Log Bedtime ---
-        with st.form("bedtime_form"):
-            st.markdown(
-                "<h4 style='text-align: center;'>Log Bedtime</h4>",
-                unsafe_allow_html=True,
-            )
-            bed_date = st.date_input("Date", value=datetime.today())
-            bed_time_input = st.time_input("Bedtime")
-            settle_mins = st.number_input("Time to Settle (Minutes)", min_value=0)
-            bed_location = st.selectbox(
-                "Location",
-                options=["Pram", "Cot"],
-            )
-            existing_techniques = list(
-                set(
-                    x
-                    for _, row in sleeping_data.iterrows()
-                    for x in (row["settling_techniques"] if isinstance(row["settling_techniques"], (list, np.ndarray)) else [])
-                )
-            )
-            bed_techniques = st.multiselect(
-                "Settling Techniques",
-                options=list(
-                    set(
-                        ["Singing", "Bouncing", "Feeding", "Dummy"]
-                        + existing_techniques
-                    )
-                ),
-            )
-            bedtime_submit = st.form_submit_button("Log Bedtime")
-
-        # --- Log Wake Up ---
-        open_sleeps = sleeping_data[pd.isna(sleeping_data["sleep_end_time"])][
-            "sleep_start_time"
-        ].unique().tolist()
-        with st.form("wakeup_form"):
-            st.markdown(
-                "<h4 style='text-align: center;'>Log Wake Up</h4>",
-                unsafe_allow_html=True,
-            )
-            if open_sleeps:
-                selected_sleep = st.selectbox("Select Sleep", options=open_sleeps)
-            else:
-                st.caption("No open sleeps to wake up from!")
-                selected_sleep = None
-                st.selectbox("Select Sleep", options=[], disabled=True)
-            wakeup_date = st.date_input("Wake Up Date")
-            wakeup_time_val = st.time_input("Wake Up Time")
-            is_temporary = st.checkbox("Evening / Temporary Wake Up?")
-            wakeup_submit = st.form_submit_button("Log Wake Up")
-
-        # --- Delete Sleep ---
-        with st.form("delete_form"):
-            st.markdown(
-                "<h4 style='text-align: center;'>Delete Sleep</h4>",
-                unsafe_allow_html=True,
-            )
-            st.caption("When the nightmares get too real...")
-            del_sleep = st.selectbox(
-                "Select Sleep", options=sleeping_data["sleep_start_time"].unique()
-            )
-            delete_submit = st.form_submit_button("Delete Sleep")
+    # --- Charts ---
+    with col2:
+        render_chart(plot_settle_time_over_time, None, night_data)
+        render_chart(plot_total_sleep_by_day, spec_total_sleep_by_day, sleeping_data)
+        if len(nap_data) > 0:
+            render_chart(plot_nap_duration_by_day, None, nap_data)
+        render_chart(plot_evening_wakeups, None, night_data)
+        render_chart(plot_sleep_proportion_by_hour, None, sleeping_data)
+
+    # --- Sleep timeline ---
+    st.markdown("_____________________")
+    st.markdown(
+        "<h3 style='text-align: center;'>Sleep Timeline</h3>", unsafe_allow_html=True
+    )
+    sleep_timeline(sleeping_data)
+
+    # --- Data table ---
+    st.markdown("_____________________")
+    st.markdown(
+        "<h3 style='text-align: center;'>All Sleep Data</h3>", unsafe_allow_html=True
+    )
+    st.markdown(
+        "<p style='text-align: center;'>I promise he has (sometimes) slept...</p>",
+        unsafe_allow_html=True,
+    )
+    # Loading more history changes every part of the page, so this reruns it all
+    full_history_toggle("sleeping")
+    display_sleeping_data(sleeping_data)
+
+
+@page_fragment
+def log_nap_form():
+    """The form to log a nap"""
+    with st.form("nap_form"):
+        st.markdown(
+            "<h4 style='text-align: center;'>Log Nap</h4>", unsafe_allow_html=True
+        )
+        nap_date = st.date_input("Nap Date", value=datetime.today())
+        nap_start_time = st.time_input("Start Time")
+        nap_end_time = st.time_input("End Time")
+        nap_location = st.selectbox(
+            "Location",
+            options=["Pram", "Cot"],
+        )
+        nap_submit = st.form_submit_button("Log Nap")
 
-    # --- Handle submissions ---
     if nap_submit:
-        new_id = 0 if len(sleeping_data) == 0 else int(sleeping_data["sleep_id"].max()) + 1
-        new_nap = pd.DataFrame(
-            {
-                "sleep_id": [new_id],
-                "sleep_start_time": [datetime.combine(nap_date, nap_start_time)],
-                "sleep_end_time": [datetime.combine(nap_date, nap_end_time)],
-                "time_to_settle": [0],
-                "sleep_location": [nap_location],
-                "settling_techniques": [[]],
-                "temporary_wake_up_times": [[]],
-                "sleep_type": ["Nap"],
-            }
+        all_sleeping_data = read_full_table(SLEEPING_TABLE)
+        new_id = 0 if len(all_sleeping_data) == 0 else int(all_sleeping_data["sleep_id"].max()) + 1
+        new_nap = SLEEPING_TABLE.record(
+            sleep_id=new_id,
+            sleep_start_time=datetime.combine(nap_date, nap_start_time),
+            sleep_end_time=datetime.combine(nap_date, nap_end_time),
+            time_to_settle=0,
+            sleep_location=nap_location,
+            settling_techniques=[],
+            temporary_wake_up_times=[],
+            sleep_type="Nap",
         )
         save_sleeping_data(
-            pd.concat([sleeping_data, new_nap]).reset_index(drop=True)
+            pd.concat([all_sleeping_data, new_nap]).reset_index(drop=True),
+            expected_length_difference=1,
+        )
+
+
+@page_fragment
+def log_bedtime_form(sleeping_data: pd.DataFrame):
+    """The form to log a bedtime, offering the settling techniques used before"""
+    with st.form("bedtime_form"):
+        st.markdown(
+            "<h4 style='text-align: center;'>Log Bedtime</h4>",
+            unsafe_allow_html=True,
+        )
+        bed_date = st.date_input("Date", value=datetime.today())
+        bed_time_input = st.time_input("Bedtime")
+        settle_mins = st.number_input("Time to Settle (Minutes)", min_value=0)
+        bed_location = st.selectbox(
+            "Location",
+            options=["Pram", "Cot"],
+        )
+        existing_techniques = list(
+            set(
+                x
+                for _, row in sleeping_data.iterrows()
+                for x in (row["settling_techniques"] if isinstance(row["settling_techniques"], (list, np.ndarray)) else [])
+            )
+        )
+        bed_techniques = st.multiselect(
+            "Settling Techniques",
+            options=list(
+                set(
+                    ["Singing", "Bouncing", "Feeding", "Dummy"]
+                    + existing_techniques
+                )
+            ),
         )
+        bedtime_submit = st.form_submit_button("Log Bedtime")
 
     if bedtime_submit:
-        new_id = 0 if len(sleeping_data) == 0 else int(sleeping_data["sleep_id"].max()) + 1
-        new_night = pd.DataFrame(
-            {
-                "sleep_id": [new_id],
-                "sleep_start_time": [datetime.combine(bed_date, bed_time_input)],
-                "sleep_end_time": [pd.NaT],
-                "time_to_settle": [int(settle_mins)],
-                "sleep_location": [bed_location],
-                "settling_techniques": [bed_techniques],
-                "temporary_wake_up_times": [[]],
-                "sleep_type": ["Night"],
-            }
+        all_sleeping_data = read_full_table(SLEEPING_TABLE)
+        new_id = 0 if len(all_sleeping_data) == 0 else int(all_sleeping_data["sleep_id"].max()) + 1
+        new_night = SLEEPING_TABLE.record(
+            sleep_id=new_id,
+            sleep_start_time=datetime.combine(bed_date, bed_time_input),
+            sleep_end_time=pd.NaT,
+            time_to_settle=int(settle_mins),
+            sleep_location=bed_location,
+            settling_techniques=bed_techniques,
+            temporary_wake_up_times=[],
+            sleep_type="Night",
         )
         save_sleeping_data(
-            pd.concat([sleeping_data, new_night]).reset_index(drop=True)
+            pd.concat([all_sleeping_data, new_night]).reset_index(drop=True),
+            expected_length_difference=1,
         )
 
+
+@page_fragment
+def log_wake_up_form(open_sleep_index: pd.DataFrame):
+    """The form to log a wake up (final or temporary) from an open sleep"""
+    st.markdown(
+        "<h4 style='text-align: center;'>Log Wake Up</h4>",
+        unsafe_allow_html=True,
+    )
+    open_sleeps = search_records(open_sleep_index, "wakeup_search")
+    with st.form("wakeup_form"):
+        if len(open_sleep_index) > 0:
+            selected_sleep = pick_record("Select Sleep", open_sleeps)
+        else:
+            st.caption("No open sleeps to wake up from!")
+            selected_sleep = None
+            st.selectbox("Select Sleep", options=[], disabled=True)
+        wakeup_date = st.date_input("Wake Up Date")
+        wakeup_time_val = st.time_input("Wake Up Time")
+        is_temporary = st.checkbox("Evening / Temporary Wake Up?")
+        wakeup_submit = st.form_submit_button("Log Wake Up")
+
     if wakeup_submit and selected_sleep is not None:
-        original = sleeping_data[
-            sleeping_data["sleep_start_time"] == selected_sleep
+        all_sleeping_data = read_full_table(SLEEPING_TABLE)
+        original = all_sleeping_data[
+            all_sleeping_data["sleep_start_time"] == selected_sleep
         ].iloc[0]
         wakeup_dt = datetime.combine(wakeup_date, wakeup_time_val)
-        sleep_type = original["sleep_type"] if pd.notna(original.get("sleep_type")) else "Night"
         if not is_temporary:
-            updated = pd.DataFrame(
-                {
-                    "sleep_id": [original["sleep_id"]],
-                    "sleep_start_time": [original["sleep_start_time"]],
-                    "sleep_end_time": [wakeup_dt],
-                    "time_to_settle": [original["time_to_settle"]],
-                    "sleep_location": [original["sleep_location"]],
-                    "settling_techniques": [original["settling_techniques"]],
-                    "temporary_wake_up_times": [original["temporary_wake_up_times"]],
-                    "sleep_type": [sleep_type],
-                }
-            )
+            updated = SLEEPING_TABLE.record(**{**original, "sleep_end_time": wakeup_dt})
         else:
             wake_list = [
                 pd.to_datetime(x).to_pydatetime()
                 for x in list(original["temporary_wake_up_times"] if isinstance(original["temporary_wake_up_times"], (list, np.ndarray)) else [])
             ]
             wake_list.append(wakeup_dt)
-            updated = pd.DataFrame(
-                {
-                    "sleep_id": [original["sleep_id"]],
-                    "sleep_start_time": [original["sleep_start_time"]],
-                    "sleep_end_time": [pd.NaT],
-                    "time_to_settle": [original["time_to_settle"]],
-                    "sleep_location": [original["sleep_location"]],
-                    "settling_techniques": [original["settling_techniques"]],
-                    "temporary_wake_up_times": [wake_list],
-                    "sleep_type": [sleep_type],
-                }
+            updated = SLEEPING_TABLE.record(
+                **{**original, "sleep_end_time": pd.NaT, "temporary_wake_up_times": wake_list}
             )
         save_sleeping_data(
             pd.concat(
                 [
-                    sleeping_data[sleeping_data["sleep_start_time"] != selected_sleep],
+                    all_sleeping_data[all_sleeping_data["sleep_start_time"] != selected_sleep],
                     updated,
                 ]
-            ).reset_index(drop=True)
+            ).reset_index(drop=True),
+            expected_length_difference=0,
         )
 
-    if delete_submit:
+
+@page_fragment
+def delete_sleep_form(sleep_index: pd.DataFrame):
+    """The form to delete a sleep"""
+    st.markdown(
+        "<h4 style='text-align: center;'>Delete Sleep</h4>",
+        unsafe_allow_html=True,
+    )
+    st.caption("When the nightmares get too real...")
+    sleeps = search_records(sleep_index, "del_sleep_search")
+    with st.form("delete_form"):
+        del_sleep = pick_record("Select Sleep", sleeps)
+        delete_submit = st.form_submit_button("Delete Sleep")
+
+    if delete_submit and del_sleep is not None:
+        all_sleeping_data = read_full_table(SLEEPING_TABLE)
         save_sleeping_data(
-            sleeping_data[sleeping_data["sleep_start_time"] != del_sleep].reset_index(
+            all_sleeping_data[all_sleeping_data["sleep_start_time"] != del_sleep].reset_index(
                 drop=True
-            )
+            ),
+            expected_length_difference=-1,
         )
 
-    # --- Charts ---
-    night_data = sleeping_data[sleeping_data["sleep_type"] == "Night"].copy()
-    nap_data = sleeping_data[sleeping_data["sleep_type"] == "Nap"].copy()
-
-    with col2:
-        st.pyplot(plot_settle_time_over_time(night_data))
-        st.pyplot(plot_total_sleep_by_day(sleeping_data))
-        if len(nap_data) > 0:
-            st.pyplot(plot_nap_duration_by_day(nap_data))
-        st.pyplot(plot_evening_wakeups(night_data))
-        st.pyplot(plot_sleep_proportion_by_hour(sleeping_data))
 
-    # --- Sleep timeline ---
-    st.markdown("_____________________")
-    st.markdown(
-        "<h3 style='text-align: center;'>Sleep Timeline</h3>", unsafe_allow_html=True
-    )
-    all_dates = pd.to_datetime(sleeping_data["sleep_start_time"]).dt.date
-    default_start = max(all_dates.min(), all_dates.max() - pd.Timedelta(days=13)) if len(all_dates) > 0 else datetime.today().date()
-    default_end = all_dates.max() if len(all_dates) > 0 else datetime.today().date()
+@page_fragment
+def sleep_timeline(sleeping_data: pd.DataFrame):
+    """The sleep timeline and its date range, which redraws just the timeline"""
+    all_days = sleeping_data["day"]
+    default_start = max(all_days.min(), all_days.max() - pd.Timedelta(days=13)).date() if len(all_days) > 0 else datetime.today().date()
+    default_end = all_days.max().date() if len(all_days) > 0 else datetime.today().date()
     timeline_range = st.date_input(
         "Date range",
         value=(default_start, default_end),
         key="timeline_range",
     )
     if isinstance(timeline_range, (list, tuple)) and len(timeline_range) == 2:
-        st.pyplot(plot_sleep_timeline(sleeping_data, timeline_range[0], timeline_range[1]))
+        # Reruns the whole page if the range needs more history loading
+        extend_history("sleeping", timeline_range[0])
+        render_chart(
+            plot_sleep_timeline,
+            spec_sleep_timeline,
+            sleeping_data,
+            timeline_range[0],
+            timeline_range[1],
+        )
 
-    # --- Data table ---
-    st.markdown("_____________________")
-    st.markdown(
-        "<h3 style='text-align: center;'>All Sleep Data</h3>", unsafe_allow_html=True
+
+@cached_data("Shh... The baby's sleeping!", SLEEPING_TABLE.name)
+def get_sleeping_data(cache_index: int, start: date | None, end: date | None) -> pd.DataFrame:
+    """Get one slice of the sleeping data from BigQuery"""
+    return read_table(SLEEPING_TABLE, start, end)
+
+
+@prepared_view(SLEEPING_TABLE.name)
+def prepare_sleeping_data(cache_index: int, start: date | None) -> pd.DataFrame:
+    """
+    The sleeping data from start onwards, newest first, with the columns the
+    charts share (day, duration, settle end and wake up count) derived once
+    per data version. The frame is shared, so read-only.
+    """
+    df = load_history(get_sleeping_data, cache_index, start, "sleep_start_time")
+    df["day"] = df["sleep_start_time"].dt.normalize()
+    df["duration_hours"] = (
+        df["sleep_end_time"] - df["sleep_start_time"]
+    ).dt.total_seconds() / 3600
+    df["settle_end"] = df["sleep_start_time"] + pd.to_timedelta(
+        df["time_to_settle"].fillna(0).astype(float), unit="m"
     )
-    st.markdown(
-        "<p style='text-align: center;'>I promise he has (sometimes) slept...</p>",
-        unsafe_allow_html=True,
+    df["wake_ups"] = df["temporary_wake_up_times"].map(
+        lambda x: len(x) if isinstance(x, (list, np.ndarray)) else 0
     )
-    display_sleeping_data(sleeping_data)
+    return df.sort_values(by=["sleep_start_time"], ascending=False)
 
 
-@st.cache_data(show_spinner="Shh... The baby's sleeping!")
-def get_sleeping_data(cache_index: int) -> pd.DataFrame:
-    """Get the sleeping data from BigQuery"""
-    client = bq_client()
-    df = client.query(f"SELECT * FROM {SLEEPING_TABLE}").to_dataframe()
-    # Backward compat: existing records are night sleeps
-    if "sleep_type" not in df.columns:
-        df["sleep_type"] = "Night"
-    else:
-        df["sleep_type"] = df["sleep_type"].fillna("Night")
-    return df
+@prepared_view(SLEEPING_TABLE.name)
+def prepare_sleeps_of_type(cache_index: int, start: date | None, sleep_type: str) -> pd.DataFrame:
+    """The prepared sleeping data for one type of sleep (read-only)"""
+    df = prepare_sleeping_data(cache_index, start)
+    return df[df["sleep_type"] == sleep_type]
 
 
-def save_sleeping_data(sleeping_data: pd.DataFrame):
-    """Save the sleeping data"""
-    sleeping_data["sleep_start_time"] = pd.to_datetime(
-        sleeping_data["sleep_start_time"]
-    )
-    sleeping_data["sleep_end_time"] = pd.to_datetime(sleeping_data["sleep_end_time"])
-
-    # Fill missing sleep_type
-    if "sleep_type" not in sleeping_data.columns:
-        sleeping_data["sleep_type"] = "Night"
-    else:
-        sleeping_data["sleep_type"] = sleeping_data["sleep_type"].fillna("Night")
-
-    job_config = bigquery.LoadJobConfig(
-        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
-        schema=[
-            bigquery.SchemaField("sleep_start_time", "DATETIME"),
-            bigquery.SchemaField("sleep_end_time", "DATETIME"),
-            bigquery.SchemaField("time_to_settle", "INTEGER"),
-            bigquery.SchemaField("sleep_location", "STRING"),
-            bigquery.SchemaField(
-                "temporary_wake_up_times", "DATETIME", mode="REPEATED"
-            ),
-            bigquery.SchemaField("settling_techniques", "STRING", mode="REPEATED"),
-            bigquery.SchemaField("sleep_id", "INTEGER"),
-            bigquery.SchemaField("sleep_type", "STRING"),
-        ],
-    )
+@prepared_view(SLEEPING_TABLE.name)
+def prepare_sleep_index(cache_index: int, start: date | None, open_only: bool) -> pd.DataFrame:
+    """The sleeps' start times (only open sleeps', if asked) for the record pickers"""
+    df = prepare_sleeping_data(cache_index, start)
+    if open_only:
+        df = df[df["sleep_end_time"].isna()]
+    return record_index(df["sleep_start_time"])
 
-    job = bq_client().load_table_from_dataframe(
-        sleeping_data, SLEEPING_TABLE, job_config=job_config
-    )
-    job.result()
+
+def save_sleeping_data(sleeping_data: pd.DataFrame, expected_length_difference: int):
+    """
+    Save the sleeping data
+
+    Args:
+        sleeping_data (pd.DataFrame): The sleeping data to save
+        expected_length_difference (int): The expected difference in length between the new data
+            and the true dataset
+    """
+    # Get the (uncached) length of the true dataset
+    true_length = table_length(SLEEPING_TABLE)
+
+    # Assert that the length is as expected
+    if len(sleeping_data) != true_length + expected_length_difference:
+        st.toast('Unable to save data - please ensure that you have reset the cache to get the most recent table! This can be done using the button at the bottom of the page.') # noqa: E501
+        return
+
+    write_table(SLEEPING_TABLE, sleeping_data)
 
     st.success("Sleeping Data Updated!")
     st.session_state["sleeping_cache"] += 1
@@ -291,23 +342,20 @@ def plot_settle_time_over_time(df: pd.DataFrame) -> plt.Figure:
     Scatter + linear regression of evening settle time over time.
     Forecasts (and annotates) the date when settle time reaches zero.
     """
-    df = df.copy()
     df = df[df["time_to_settle"] > 0].dropna(
         subset=["time_to_settle", "sleep_start_time"]
     )
-    df["date"] = pd.to_datetime(df["sleep_start_time"]).dt.normalize()
-    daily = df.groupby("date")["time_to_settle"].mean().reset_index().sort_values("date")
-
-    fig, ax = plt.subplots(figsize=(8, 5))
+    daily = (
+        df.groupby(df["day"].rename("date"))["time_to_settle"]
+        .mean()
+        .reset_index()
+        .sort_values("date")
+    )
 
     if len(daily) < 2:
-        ax.text(
-            0.5, 0.5, "Not enough data yet!",
-            ha="center", va="center", transform=ax.transAxes, fontsize=14,
-        )
-        ax.set_title("Evening Settle Time Over Time", fontsize=18)
-        return fig
+        return empty_chart("Evening Settle Time Over Time", "Not enough data yet!")
 
+    fig, ax = plt.subplots(figsize=(8, 5))
     x_origin = daily["date"].min()
     x_num = np.array([(d - x_origin).days for d in daily["date"]])
     y = daily["time_to_settle"].values
@@ -355,9 +403,7 @@ def plot_settle_time_over_time(df: pd.DataFrame) -> plt.Figure:
             arrowprops=dict(arrowstyle="->", color="green"),
         )
 
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%d %b"))
-    ax.xaxis.set_major_locator(mdates.AutoDateLocator())
-    plt.xticks(rotation=45, ha="right")
+    format_date_axis(ax, "%d %b", minticks=5, maxticks=None)
     plt.ylabel("Avg Time to Settle (Mins)", fontsize=13)
     plt.title("Evening Settle Time Over Time", fontsize=18)
     plt.legend()
@@ -365,82 +411,66 @@ def plot_settle_time_over_time(df: pd.DataFrame) -> plt.Figure:
     return fig
 
 
-def plot_total_sleep_by_day(df: pd.DataFrame) -> plt.Figure:
+@timed_function("aggregate")
+def total_sleep_by_day(df: pd.DataFrame) -> pd.Series:
     """Total sleep duration (hours) per calendar day, all sleep types combined."""
-    df = df.copy()
-    df["sleep_start_time"] = pd.to_datetime(df["sleep_start_time"])
-    df["sleep_end_time"] = pd.to_datetime(df["sleep_end_time"])
-
-    daily_sleep = []
-    for _, row in df.iterrows():
-        start, end = row["sleep_start_time"], row["sleep_end_time"]
-        if pd.isnull(start) or pd.isnull(end):
-            continue
-        current = start
-        while current.date() <= end.date():
-            day_end = min(
-                end,
-                pd.Timestamp.combine(current.date(), pd.Timestamp.max.time()),
-            )
-            hours = (day_end - current).total_seconds() / 3600
-            daily_sleep.append({"date": current.date(), "hours": hours})
-            current = pd.Timestamp.combine(
-                current.date() + pd.Timedelta(days=1), pd.Timestamp.min.time()
-            )
-
-    if not daily_sleep:
-        fig, ax = plt.subplots(figsize=(8, 5))
-        ax.text(0.5, 0.5, "No completed sleeps yet!", ha="center", va="center", transform=ax.transAxes, fontsize=14)
-        ax.set_title("Total Sleep by Day", fontsize=18)
-        return fig
+    pieces = split_intervals(df["sleep_start_time"], df["sleep_end_time"], "D")
+    hours = (pieces["end_hours"] - pieces["start_hours"]).rename("Total Sleep (hours)")
+    return hours.groupby(pieces["period_start"].rename("day")).sum()
 
-    sleep_by_day = pd.DataFrame(daily_sleep).groupby("date")["hours"].sum()
-    rng = sleep_by_day.max() - sleep_by_day.min()
-    scaled = (sleep_by_day - sleep_by_day.min()) / rng if rng > 0 else sleep_by_day * 0 + 0.5
-    colors = [tuple(x * c + (1 - x) for c in COLOURS.PINK_RGB) for x in scaled]
 
-    fig, ax = plt.subplots(figsize=(8, 5))
-    sleep_by_day.plot(kind="bar", ax=ax, color=colors, ec="k")
-    plt.ylabel("Total Sleep (hours)", fontsize=13)
-    plt.title("Total Sleep by Day", fontsize=18)
-    plt.xticks(rotation=45, ha="right")
-    plt.tight_layout()
+def plot_total_sleep_by_day(df: pd.DataFrame) -> plt.Figure:
+    """Total sleep duration (hours) per calendar day, all sleep types combined."""
+    sleep_by_day = total_sleep_by_day(df)
+    if len(sleep_by_day) == 0:
+        return empty_chart("Total Sleep by Day", "No completed sleeps yet!")
+    sleep_by_day, title = fit_bars(sleep_by_day, "Total Sleep by Day")
+
+    fig, _ = bar_chart(
+        np.arange(len(sleep_by_day)),
+        sleep_by_day,
+        title=title,
+        ylabel="Total Sleep (hours)",
+        tick_labels=sleep_by_day.index.strftime("%Y-%m-%d"),
+        label_size=13,
+    )
     return fig
 
 
+def spec_total_sleep_by_day(df: pd.DataFrame):
+    """Browser-rendered version of plot_total_sleep_by_day."""
+    return bar_spec(
+        total_sleep_by_day(df).reset_index(),
+        x="day",
+        title="Total Sleep by Day",
+        ylabel="Total Sleep (hours)",
+    )
+
+
 def plot_nap_duration_by_day(df: pd.DataFrame) -> plt.Figure:
     """Bar chart of total daytime nap hours per day, with nap count on secondary axis."""
-    df = df.copy()
     df = df.dropna(subset=["sleep_start_time", "sleep_end_time"])
-    df["date"] = pd.to_datetime(df["sleep_start_time"]).dt.date
-    df["hours"] = (
-        pd.to_datetime(df["sleep_end_time"]) - pd.to_datetime(df["sleep_start_time"])
-    ).dt.total_seconds() / 3600
-
     by_day = (
-        df.groupby("date")
-        .agg(total_hours=("hours", "sum"), nap_count=("hours", "count"))
-        .reset_index()
-        .sort_values("date")
+        df["duration_hours"].groupby(df["day"].rename("date"))
+        .agg(total_hours="sum", nap_count="count")
+        .sort_index()
     )
-    by_day["date"] = pd.to_datetime(by_day["date"])
-
-    rng = by_day["total_hours"].max() - by_day["total_hours"].min()
-    scaled = (by_day["total_hours"] - by_day["total_hours"].min()) / rng if rng > 0 else by_day["total_hours"] * 0 + 0.5
-    colors = [tuple(x * c + (1 - x) for c in COLOURS.PINK_RGB) for x in scaled]
-
-    fig, ax1 = plt.subplots(figsize=(8, 5))
-    x = range(len(by_day))
-    ax1.bar(x, by_day["total_hours"], color=colors, edgecolor="k", label="Total nap hours")
-    ax1.set_ylabel("Total Nap Hours", fontsize=13)
-    ax1.set_xticks(list(x))
-    ax1.set_xticklabels(
-        [d.strftime("%d %b") for d in by_day["date"]], rotation=45, ha="right"
+    by_day, title = fit_bars(by_day, "Daytime Naps by Day")
+
+    x = np.arange(len(by_day))
+    fig, ax1 = bar_chart(
+        x,
+        by_day["total_hours"],
+        title=title,
+        ylabel="Total Nap Hours",
+        tick_labels=by_day.index.strftime("%d %b"),
+        label_size=13,
     )
+    ax1.containers[0].set_label("Total nap hours")
 
     ax2 = ax1.twinx()
     ax2.plot(
-        list(x), by_day["nap_count"],
+        x, by_day["nap_count"],
         color=COLOURS.BROWN_HEX, marker="o", linewidth=2, label="Nap count",
     )
     ax2.set_ylabel("Number of Naps", fontsize=12, color=COLOURS.BROWN_HEX)
@@ -450,139 +480,91 @@ def plot_nap_duration_by_day(df: pd.DataFrame) -> plt.Figure:
     lines1, labels1 = ax1.get_legend_handles_labels()
     lines2, labels2 = ax2.get_legend_handles_labels()
     ax1.legend(lines1 + lines2, labels1 + labels2, loc="upper left")
-
-    plt.title("Daytime Naps by Day", fontsize=18)
-    plt.tight_layout()
+    fig.tight_layout()
     return fig
 
 
 def plot_evening_wakeups(df: pd.DataFrame) -> plt.Figure:
     """Bar chart of evening / temporary wake-up count per night."""
-    df = df.copy()
-    df["date"] = pd.to_datetime(df["sleep_start_time"]).dt.date
-    df["wakeup_count"] = df["temporary_wake_up_times"].apply(
-        lambda x: len(x) if isinstance(x, (list, np.ndarray)) else 0
-    )
-
-    by_day = (
-        df.groupby("date")["wakeup_count"].sum().reset_index().sort_values("date")
-    )
-    by_day["date"] = pd.to_datetime(by_day["date"])
-
-    rng = by_day["wakeup_count"].max() - by_day["wakeup_count"].min()
-    scaled = (by_day["wakeup_count"] - by_day["wakeup_count"].min()) / rng if rng > 0 else by_day["wakeup_count"] * 0 + 0.5
-    colors = [tuple(x * c + (1 - x) for c in COLOURS.PINK_RGB) for x in scaled]
-
-    fig, ax = plt.subplots(figsize=(8, 5))
-    ax.bar(range(len(by_day)), by_day["wakeup_count"], color=colors, edgecolor="k")
-    ax.set_xticks(range(len(by_day)))
-    ax.set_xticklabels(
-        [d.strftime("%d %b") for d in by_day["date"]], rotation=45, ha="right"
+    by_day = df["wake_ups"].groupby(df["day"]).sum().sort_index()
+    by_day, title = fit_bars(by_day, "Evening Wake Ups per Night")
+
+    fig, ax = bar_chart(
+        np.arange(len(by_day)),
+        by_day,
+        title=title,
+        ylabel="Evening Wake Ups",
+        tick_labels=by_day.index.strftime("%d %b"),
+        label_size=13,
     )
     ax.yaxis.set_major_locator(plt.MaxNLocator(integer=True))
-    plt.ylabel("Evening Wake Ups", fontsize=13)
-    plt.title("Evening Wake Ups per Night", fontsize=18)
-    plt.tight_layout()
     return fig
 
 
 def plot_sleep_proportion_by_hour(df: pd.DataFrame) -> plt.Figure:
     """Proportion of time asleep in each hour of the day, averaged across all days."""
-    df = df.copy()
-    df["sleep_start_time"] = pd.to_datetime(df["sleep_start_time"])
-    df["sleep_end_time"] = pd.to_datetime(df["sleep_end_time"])
-    df = df.dropna(subset=["sleep_start_time", "sleep_end_time"])
+    starts = df["sleep_start_time"]
+    ends = df["sleep_end_time"]
+    valid = starts.notna() & ends.notna()
+    starts, ends = starts[valid], ends[valid]
+    # Sleeps logged with an end before their start ran past midnight
+    ends = ends.where(ends > starts, ends + pd.Timedelta(days=1))
+
+    pieces = split_intervals(starts, ends, "h")
+    asleep_minutes = np.bincount(
+        pieces["period_start"].dt.hour,
+        weights=60 * (pieces["end_hours"] - pieces["start_hours"]),
+        minlength=24,
+    )
 
-    asleep_minutes = np.zeros(24)
-    for _, row in df.iterrows():
-        start, end = row["sleep_start_time"], row["sleep_end_time"]
-        if end <= start:
-            end += pd.Timedelta(days=1)
-        current = start.floor("h")
-        while current < end:
-            next_hour = current + pd.Timedelta(hours=1)
-            overlap = (min(end, next_hour) - max(start, current)).total_seconds() / 60.0
-            if overlap > 0:
-                asleep_minutes[current.hour] += overlap
-            current = next_hour
-
-    num_days = df["sleep_start_time"].dt.normalize().nunique()
+    num_days = df["day"][valid].nunique()
     proportions = asleep_minutes / max(num_days * 60.0, 1)
-    colors = [tuple(x * c + (1 - x) for c in COLOURS.PINK_RGB) for x in proportions]
 
-    fig, ax = plt.subplots(figsize=(8, 5))
-    ax.bar(range(24), 100 * proportions, color=colors, edgecolor="k")
-    plt.xticks(range(24))
-    plt.xlabel("Hour of Day", fontsize=13)
-    plt.ylabel("% of Time Asleep", fontsize=13)
-    plt.title("Proportion of Time Asleep by Hour", fontsize=18)
-    plt.tight_layout()
+    fig, _ = bar_chart(
+        np.arange(24),
+        100 * proportions,
+        title="Proportion of Time Asleep by Hour",
+        ylabel="% of Time Asleep",
+        xlabel="Hour of Day",
+        colours=gradient_colours(proportions, vmin=0, vmax=1),
+        tick_labels=[str(h) for h in range(24)],
+        label_size=13,
+    )
+    plt.setp(fig.axes[0].get_xticklabels(), rotation=0, ha="center")
     return fig
 
 
+def sleep_timeline_blocks(df: pd.DataFrame) -> list[tuple[str, pd.Series, pd.Series, str]]:
+    """The asleep and settling blocks of each completed sleep, for the timeline."""
+    df = df.dropna(subset=["sleep_start_time", "sleep_end_time"])
+    sleep_start = df["sleep_start_time"]
+    sleep_end = df["sleep_end_time"]
+    settle_end = df["settle_end"]
+    return [
+        ("Asleep", settle_end, sleep_end, COLOURS.PINK_HEX),
+        ("Settling", sleep_start, settle_end.where(settle_end < sleep_end, sleep_end), COLOURS.GREY_PINK_HEX),
+    ]
+
+
 def plot_sleep_timeline(df: pd.DataFrame, start_date, end_date) -> plt.Figure:
     """
     Vertical bars per day showing shaded blocks for settling (light pink) and
     asleep (dark pink) periods across a chosen date range.
     Y-axis runs midnight-to-midnight (0 at top, 24 at bottom).
     """
-    from matplotlib.patches import Patch
+    return timeline_chart(
+        sleep_timeline_blocks(df), start_date, end_date, title="Sleep Timeline"
+    )
 
-    df = df.copy()
-    df["sleep_start_time"] = pd.to_datetime(df["sleep_start_time"])
-    df["sleep_end_time"] = pd.to_datetime(df["sleep_end_time"])
-    df = df.dropna(subset=["sleep_start_time", "sleep_end_time"])
 
-    dates = pd.date_range(start_date, end_date, freq="D")
-    n = len(dates)
-    fig, ax = plt.subplots(figsize=(max(8, n * 0.9), 7))
-
-    for i, day in enumerate(dates):
-        day_start = pd.Timestamp(day.date())
-        day_end = day_start + pd.Timedelta(hours=24)
-
-        for _, row in df.iterrows():
-            sleep_start = row["sleep_start_time"]
-            sleep_end = row["sleep_end_time"]
-            settle_mins = float(row["time_to_settle"]) if pd.notna(row["time_to_settle"]) else 0.0
-            settle_end = sleep_start + pd.Timedelta(minutes=settle_mins)
-
-            # Settling block
-            s0 = max(sleep_start, day_start)
-            s1 = min(settle_end, day_end)
-            if s0 < s1:
-                y0 = (s0 - day_start).total_seconds() / 3600
-                y1 = (s1 - day_start).total_seconds() / 3600
-                ax.bar(i, y1 - y0, bottom=y0, width=0.7,
-                       color=COLOURS.GREY_PINK_HEX, edgecolor=COLOURS.BROWN_HEX, linewidth=0.5, zorder=2)
-
-            # Asleep block
-            a0 = max(settle_end, day_start)
-            a1 = min(sleep_end, day_end)
-            if a0 < a1:
-                y0 = (a0 - day_start).total_seconds() / 3600
-                y1 = (a1 - day_start).total_seconds() / 3600
-                ax.bar(i, y1 - y0, bottom=y0, width=0.7,
-                       color=COLOURS.PINK_HEX, edgecolor=COLOURS.BROWN_HEX, linewidth=0.5, zorder=2)
-
-    ax.set_ylim(24, 0)  # midnight at top, noon in middle
-    ax.set_yticks(range(0, 25, 2))
-    ax.set_yticklabels([f"{h:02d}:00" for h in range(0, 25, 2)])
-    ax.set_ylabel("Time of Day", fontsize=13)
-    ax.set_xticks(range(n))
-    ax.set_xticklabels([d.strftime("%d %b") for d in dates], rotation=45, ha="right")
-
-    ax.legend(
-        handles=[
-            Patch(facecolor=COLOURS.PINK_HEX, edgecolor=COLOURS.BROWN_HEX, label="Asleep"),
-            Patch(facecolor=COLOURS.GREY_PINK_HEX, edgecolor=COLOURS.BROWN_HEX, label="Settling"),
-        ],
-        loc="upper right",
+def spec_sleep_timeline(df: pd.DataFrame, start_date, end_date):
+    """Browser-rendered version of plot_sleep_timeline."""
+    blocks = sleep_timeline_blocks(df)
+    return timeline_spec(
+        timeline_pieces(blocks, start_date, end_date),
+        colours={label: colour for label, _, _, colour in blocks},
+        title="Sleep Timeline",
     )
-    ax.yaxis.grid(True, linestyle="--", alpha=0.4, zorder=0)
-    plt.title("Sleep Timeline", fontsize=18)
-    plt.tight_layout()
-    return fig
 
 
 def display_sleeping_data(df: pd.DataFrame):
@@ -596,13 +578,9 @@ def display_sleeping_data(df: pd.DataFrame):
         "temporary_wake_up_times",
         "settling_techniques",
     ]
-    df = df[[c for c in cols if c in df.columns]].reset_index(drop=True)
-    df["temporary_wake_up_times"] = df["temporary_wake_up_times"].apply(
-        lambda lst: [pd.to_datetime(x).strftime("%Y-%m-%d %H:%M") for x in (lst if isinstance(lst, (list, np.ndarray)) else [])]
+    df = df.assign(
+        temporary_wake_up_times=df["temporary_wake_up_times"].apply(
+            lambda lst: [pd.to_datetime(x).strftime("%Y-%m-%d %H:%M") for x in (lst if isinstance(lst, (list, np.ndarray)) else [])]
+        )
     )
-    df.index += 1
-    df.columns = [
-        x.replace("_", " ").title().replace("Time To Settle", "Time To Settle (Mins)")
-        for x in df.columns
-    ]
-    st.dataframe(df)
+    st.dataframe(SLEEPING_TABLE.labelled(df, cols))
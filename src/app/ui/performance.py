@@ -0,0 +1,109 @@
+import pandas as pd
+import streamlit as st
+
+from src.app.data_cache import DATA_CACHE
+from src.app.metrics import METRICS
+from src.app.profiling import list_profiles, read_profile_file
+from src.clients.bigquery_client import bq_client
+from src.clients.query_costs import QUERY_COSTS
+from src.clients.shared_cache import shared_cache_stats
+
+
+def display_performance_panel():
+    """
+    Display the timings of the app's hot paths (fetches, saves, aggregations
+    and chart renders) since the process started, with exports
+    """
+    st.markdown('___________________')
+    st.markdown(
+        "<h3 style='text-align: center;'>Performance</h3>", unsafe_allow_html=True
+    )
+    summary = pd.DataFrame(METRICS.summary())
+    if len(summary) == 0:
+        st.write("No timings recorded yet")
+        return
+
+    # Show times in milliseconds, slowest first
+    for column in ["total_seconds", "p50_seconds", "p95_seconds"]:
+        summary[column.replace("seconds", "ms")] = (summary.pop(column) * 1000).round(1)
+    st.dataframe(
+        summary.sort_values("p95_ms", ascending=False),
+        hide_index=True,
+    )
+
+    # Show what the queries behind each page have cost
+    costs = pd.DataFrame(QUERY_COSTS.summary())
+    if len(costs) > 0:
+        for column in ["bytes_processed", "bytes_billed", "estimated_bytes"]:
+            costs[column.replace("bytes", "mb")] = (costs.pop(column) / 1e6).round(2)
+        st.dataframe(costs, hide_index=True)
+
+    # Show how full the data cache is and how well it is doing
+    st.dataframe(pd.DataFrame([DATA_CACHE.stats()]), hide_index=True)
+    with st.expander("Cached Frames"):
+        st.dataframe(pd.DataFrame(DATA_CACHE.entry_sizes()), hide_index=True)
+
+    st.write(f"BigQuery circuit breaker: {bq_client().breaker.state}")
+
+    # And the cache shared between replicas, if there is one
+    shared = shared_cache_stats()
+    if shared is not None:
+        shared["generations"] = ", ".join(f"{table}: {n}" for table, n in shared["generations"].items())
+        st.dataframe(pd.DataFrame([shared]), hide_index=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            "Download Prometheus",
+            METRICS.to_prometheus(),
+            file_name="baby_app_metrics.prom",
+            mime="text/plain",
+        )
+    with col2:
+        st.download_button(
+            "Download JSON",
+            METRICS.to_json(),
+            file_name="baby_app_metrics.json",
+            mime="application/json",
+        )
+    with col3:
+        if st.button("Reset Timings"):
+            METRICS.clear()
+            QUERY_COSTS.clear()
+            st.rerun()
+
+
+def display_profiles():
+    """
+    Display a button to profile the next script run, and the most recent
+    profiles with their downloads
+    """
+    st.markdown(
+        "<h3 style='text-align: center;'>Profiles</h3>", unsafe_allow_html=True
+    )
+    if st.button("Profile Next Run"):
+        st.query_params["profile"] = "1"
+        st.rerun()
+
+    profiles = list_profiles()
+    if len(profiles) == 0:
+        st.write("No profiles saved yet")
+        return
+
+    st.dataframe(pd.DataFrame(profiles), hide_index=True)
+    selected = st.selectbox("Choose Profile", [profile["name"] for profile in profiles])
+    st.code(read_profile_file(selected, ".txt").decode())
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "Download Call Tree",
+            read_profile_file(selected, ".prof"),
+            file_name=f"{selected}.prof",
+        )
+    with col2:
+        st.download_button(
+            "Download Flamegraph Stacks",
+            read_profile_file(selected, ".folded"),
+            file_name=f"{selected}.folded",
+            mime="text/plain",
+        )
@@ -0,0 +1,371 @@
+from functools import lru_cache
+from typing import Mapping, Sequence
+
+import matplotlib.colors as mcolors
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+
+from src.app.ui.downsampling import (
+    MIN_BAR_PIXELS,
+    bar_width,
+    bucket_bars,
+    downsample_line,
+    pixel_width,
+)
+from src.cfg.colour_config import ColourConfig
+
+COLOURS = ColourConfig()
+# The widest a timeline is drawn, however many days it covers
+MAX_TIMELINE_INCHES = 20
+# The room each (rotated) day label on a timeline needs
+DAY_LABEL_PIXELS = 40
+
+
+@lru_cache(maxsize=None)
+def gradient_colourmap(hex_colour: str) -> mcolors.Colormap:
+    """
+    Get the (single, pre-built) white → colour colourmap for a theme colour
+    """
+    return mcolors.LinearSegmentedColormap.from_list(
+        f"white_to_{hex_colour}", ["#ffffff", hex_colour]
+    )
+
+
+def gradient_colours(
+    values,
+    hex_colour: str = COLOURS.PINK_HEX,
+    vmin: float | None = None,
+    vmax: float | None = None,
+) -> np.ndarray:
+    """
+    Map values to a gradient between white and the given hex colour in one
+    vectorized colourmap lookup.
+
+    Args:
+        values: The values to colour
+        hex_colour (str): The colour that the largest value is mapped to
+        vmin (float | None): The value mapped to white (defaults to the minimum)
+        vmax (float | None): The value mapped to the full colour (defaults to the maximum)
+
+    Returns:
+        np.ndarray: An (n, 4) array of RGBA colours
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return np.empty((0, 4))
+    lower = np.nanmin(values) if vmin is None else vmin
+    upper = np.nanmax(values) if vmax is None else vmax
+    if upper > lower:
+        scaled = (values - lower) / (upper - lower)
+    else:
+        # A flat series gets the midpoint of the gradient
+        scaled = np.full(len(values), 0.5)
+    return gradient_colourmap(hex_colour)(np.clip(np.nan_to_num(scaled), 0, 1))
+
+
+def format_date_axis(
+    ax: plt.Axes,
+    date_format: str = "%d-%b",
+    minticks: int = 1,
+    maxticks: int = 10,
+):
+    """
+    Show whole days on a date x axis
+    """
+    locator = mdates.AutoDateLocator(
+        minticks=minticks, maxticks=maxticks, interval_multiples=True
+    )
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter(date_format))
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
+
+
+def empty_chart(title: str, message: str, figsize=(8, 5)) -> Figure:
+    """
+    A placeholder chart for when there is nothing to plot
+    """
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.text(
+        0.5, 0.5, message,
+        ha="center", va="center", transform=ax.transAxes, fontsize=14,
+    )
+    ax.set_title(title, fontsize=18)
+    return fig
+
+
+def fit_bars(data: pd.Series | pd.DataFrame, title: str, figsize=(8, 5)):
+    """
+    Re-bucket per-day bar data to fit a chart's width, for charts that label
+    their own bars
+
+    Args:
+        data (pd.Series | pd.DataFrame): The per-day values, indexed by day
+        title (str): The chart title
+        figsize: The figure size
+
+    Returns:
+        tuple: The data and the title, noting any re-bucketing
+    """
+    data, bucket = bucket_bars(data, pixel_width(figsize) // MIN_BAR_PIXELS)
+    if bucket is not None:
+        title = f"{title} ({bucket} Average)"
+    return data, title
+
+
+def bar_chart(
+    x,
+    heights,
+    title: str,
+    ylabel: str,
+    xlabel: str | None = None,
+    colours=None,
+    date_format: str | None = None,
+    tick_labels: Sequence[str] | None = None,
+    figsize=(8, 5),
+    label_size: int = 14,
+) -> tuple[Figure, plt.Axes]:
+    """
+    Draw a bar chart, gradient coloured by height unless colours are given.
+    Date bars are re-bucketed into weeks or months when the range is too long
+    to draw a bar per day.
+
+    Args:
+        x: The bar positions (dates, categories or numbers)
+        heights: The bar heights, or a frame with one column per stacked bar
+        title (str): The chart title
+        ylabel (str): The y axis label
+        xlabel (str | None): The x axis label
+        colours: The bar colours (defaults to a white → pink gradient), or one
+            colour per stacked column
+        date_format (str | None): If given, format the x axis as dates
+        tick_labels (Sequence[str] | None): If given, label each bar with these
+        figsize: The figure size
+        label_size (int): The axis label font size
+
+    Returns:
+        tuple[Figure, plt.Axes]: The figure and its axes
+    """
+    stacked = pd.DataFrame(heights).set_axis(x) if isinstance(heights, pd.DataFrame) else None
+    width = 0.8
+    if date_format is not None:
+        data = stacked if stacked is not None else pd.Series(np.asarray(heights, dtype=float), index=x)
+        data, title = fit_bars(data, title, figsize)
+        x = data.index
+        width = bar_width(x)
+        if stacked is not None:
+            stacked = data
+        else:
+            heights = data
+
+    fig, ax = plt.subplots(figsize=figsize)
+    if stacked is not None:
+        bottom = np.zeros(len(stacked))
+        for column, colour in zip(stacked.columns, colours):
+            ax.bar(x, stacked[column], bottom=bottom, width=width, color=colour,
+                   edgecolor="k", label=column)
+            bottom = bottom + stacked[column].to_numpy()
+        ax.legend()
+    else:
+        heights = np.asarray(heights, dtype=float)
+        if colours is None:
+            colours = gradient_colours(heights)
+        ax.bar(x, heights, width=width, color=colours, edgecolor="k")
+    ax.set_ylabel(ylabel, fontsize=label_size)
+    if xlabel is not None:
+        ax.set_xlabel(xlabel, fontsize=label_size)
+    ax.set_title(title, fontsize=18)
+    if tick_labels is not None:
+        ax.set_xticks(x)
+        ax.set_xticklabels(tick_labels, rotation=45, ha="right")
+    if date_format is not None:
+        format_date_axis(ax, date_format)
+    fig.tight_layout()
+    return fig, ax
+
+
+def line_chart(
+    lines: pd.DataFrame | Mapping[str, pd.Series],
+    colours: Sequence[str],
+    title: str,
+    ylabel: str,
+    xlabel: str | None = "Date",
+    marker: str | None = None,
+    date_format: str | None = "%d-%b",
+    figsize=(8, 5),
+    label_size: int = 14,
+) -> tuple[Figure, plt.Axes]:
+    """
+    Draw one line per labelled series, sharing a date x axis. Long series are
+    downsampled to about one point per pixel.
+
+    Args:
+        lines (pd.DataFrame | Mapping[str, pd.Series]): The series to plot,
+            keyed by legend label
+        colours (Sequence[str]): The colour of each line
+        title (str): The chart title
+        ylabel (str): The y axis label
+        xlabel (str | None): The x axis label
+        marker (str | None): The point marker, if any
+        date_format (str | None): If given, format the x axis as dates
+        figsize: The figure size
+        label_size (int): The axis label font size
+
+    Returns:
+        tuple[Figure, plt.Axes]: The figure and its axes
+    """
+    fig, ax = plt.subplots(figsize=figsize)
+    for (label, series), colour in zip(lines.items(), colours):
+        if date_format is not None:
+            series = downsample_line(series, pixel_width(figsize))
+        ax.plot(
+            series.index, series.to_numpy(), color=colour, lw=2,
+            marker=marker, label=label,
+        )
+    ax.set_ylabel(ylabel, fontsize=label_size)
+    if xlabel is not None:
+        ax.set_xlabel(xlabel, fontsize=label_size)
+    ax.set_title(title, fontsize=18)
+    if len(lines.keys()) > 1:
+        ax.legend()
+    if date_format is not None:
+        format_date_axis(ax, date_format)
+    fig.tight_layout()
+    return fig, ax
+
+
+def split_intervals(
+    starts: pd.Series, ends: pd.Series, freq: str = "D"
+) -> pd.DataFrame:
+    """
+    Split [start, end) intervals at every period boundary, without a Python
+    loop over the rows.
+
+    Args:
+        starts (pd.Series): The interval start times
+        ends (pd.Series): The interval end times
+        freq (str): The period to split on (e.g. "D" or "h")
+
+    Returns:
+        pd.DataFrame: One row per (interval, period) piece, with the period
+            start, the piece's start/end offsets into the period in hours, and
+            the position of the source interval
+    """
+    starts = pd.to_datetime(pd.Series(starts)).reset_index(drop=True)
+    ends = pd.to_datetime(pd.Series(ends)).reset_index(drop=True)
+    valid = (starts.notna() & ends.notna() & (ends > starts)).to_numpy()
+    source = np.flatnonzero(valid)
+    start_ns = starts.to_numpy("datetime64[ns]")[valid]
+    end_ns = ends.to_numpy("datetime64[ns]")[valid]
+
+    period = np.timedelta64(pd.Timedelta(1, unit=freq).value, "ns")
+    first_period = pd.DatetimeIndex(start_ns).floor(freq).to_numpy()
+    last_period = pd.DatetimeIndex(end_ns - np.timedelta64(1, "ns")).floor(freq).to_numpy()
+    counts = ((last_period - first_period) // period).astype(int) + 1
+
+    # One piece per spanned period
+    piece_source = np.repeat(np.arange(len(start_ns)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    period_start = first_period[piece_source] + offsets * period
+    piece_start = np.maximum(start_ns[piece_source], period_start)
+    piece_end = np.minimum(end_ns[piece_source], period_start + period)
+
+    hour = np.timedelta64(1, "h")
+    return pd.DataFrame(
+        {
+            "period_start": period_start,
+            "start_hours": (piece_start - period_start) / hour,
+            "end_hours": (piece_end - period_start) / hour,
+            "source": source[piece_source],
+        }
+    )
+
+
+def timeline_pieces(
+    blocks: Sequence[tuple[str, pd.Series, pd.Series, str]],
+    start_date,
+    end_date,
+) -> pd.DataFrame:
+    """
+    Split each kind of timeline block into per-day pieces within a date range.
+
+    Args:
+        blocks (Sequence[tuple[str, pd.Series, pd.Series, str]]): One
+            (label, starts, ends, colour) entry per kind of block
+        start_date: The first day shown
+        end_date: The last day shown
+
+    Returns:
+        pd.DataFrame: One row per piece, with the day, its position in the
+            range, the start/end hours and the block label
+    """
+    dates = pd.date_range(start_date, end_date, freq="D")
+    frames = []
+    for label, starts, ends, _ in blocks:
+        pieces = split_intervals(starts, ends, "D")
+        pieces["day_index"] = dates.get_indexer(pd.DatetimeIndex(pieces["period_start"]))
+        pieces["label"] = label
+        frames.append(pieces[pieces["day_index"] >= 0])
+    return pd.concat(frames, ignore_index=True).rename(columns={"period_start": "day"})
+
+
+def timeline_chart(
+    blocks: Sequence[tuple[str, pd.Series, pd.Series, str]],
+    start_date,
+    end_date,
+    title: str,
+) -> Figure:
+    """
+    Vertical bars per day, with one shaded block per interval piece.
+    The y axis runs midnight to midnight (0 at the top, 24 at the bottom).
+    Long ranges are squeezed into MAX_TIMELINE_INCHES, labelling only as
+    many days as fit and leaving out the outlines of bars too narrow for them.
+
+    Args:
+        blocks (Sequence[tuple[str, pd.Series, pd.Series, str]]): One
+            (label, starts, ends, colour) entry per kind of block
+        start_date: The first day shown
+        end_date: The last day shown
+        title (str): The chart title
+
+    Returns:
+        Figure: The timeline figure
+    """
+    dates = pd.date_range(start_date, end_date, freq="D")
+    n = len(dates)
+    figsize = (min(max(8, n * 0.9), MAX_TIMELINE_INCHES), 7)
+    fig, ax = plt.subplots(figsize=figsize)
+    day_pixels = pixel_width(figsize) / max(n, 1)
+
+    pieces = timeline_pieces(blocks, start_date, end_date)
+    handles = []
+    for label, _, _, colour in blocks:
+        block = pieces[pieces["label"] == label]
+        ax.bar(
+            block["day_index"],
+            block["end_hours"] - block["start_hours"],
+            bottom=block["start_hours"],
+            width=0.7,
+            color=colour,
+            edgecolor=COLOURS.BROWN_HEX,
+            linewidth=0.5 if day_pixels >= MIN_BAR_PIXELS else 0,
+            zorder=2,
+        )
+        handles.append(Patch(facecolor=colour, edgecolor=COLOURS.BROWN_HEX, label=label))
+
+    ax.set_xlim(-0.5, n - 0.5)
+    ax.set_ylim(24, 0)
+    ax.set_yticks(range(0, 25, 2))
+    ax.set_yticklabels([f"{h:02d}:00" for h in range(0, 25, 2)])
+    ax.set_ylabel("Time of Day", fontsize=13)
+    labelled = range(0, n, int(np.ceil(DAY_LABEL_PIXELS / day_pixels)))
+    ax.set_xticks(labelled)
+    ax.set_xticklabels([dates[i].strftime("%d %b") for i in labelled], rotation=45, ha="right")
+    ax.legend(handles=handles, loc="upper right")
+    ax.yaxis.grid(True, linestyle="--", alpha=0.4, zorder=0)
+    ax.set_title(title, fontsize=18)
+    fig.tight_layout()
+    return fig
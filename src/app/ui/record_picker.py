@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# How many records a picker lists before it has to be searched
+RECENT_RECORDS = 50
+LABEL_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def record_index(timestamps: pd.Series) -> pd.DataFrame:
+    """
+    Index records by their timestamps for a picker: each distinct timestamp
+    once, oldest first, with its label. Labels are ISO-like so that sorting
+    them sorts the timestamps, which is what lets searches binary search them.
+    Build it in a prepared view, so it is built once per data version.
+
+    Args:
+        timestamps (pd.Series): The timestamp of each record
+
+    Returns:
+        pd.DataFrame: The timestamp and label of each record, oldest first
+    """
+    unique = pd.Series(pd.to_datetime(timestamps).dropna().unique())
+    unique = unique.sort_values(ignore_index=True)
+    return pd.DataFrame({"timestamp": unique, "label": unique.dt.strftime(LABEL_FORMAT)})
+
+
+def match_records(index: pd.DataFrame, prefix: str, limit: int = RECENT_RECORDS) -> pd.DataFrame:
+    """
+    Find the newest records whose labels start with a prefix (e.g. "2025-07"
+    or "2025-07-03 14"), with a binary search of the sorted labels
+
+    Args:
+        index (pd.DataFrame): The record index, as built by record_index
+        prefix (str): The start of the labels to match, or "" for any
+        limit (int): The most records returned
+
+    Returns:
+        pd.DataFrame: The matching records, newest first
+    """
+    labels = index["label"].to_numpy()
+    prefix = prefix.strip()
+    first = np.searchsorted(labels, prefix, side="left")
+    # Any label starting with the prefix sorts before the prefix and a character after all others
+    last = np.searchsorted(labels, prefix + "\uffff", side="left")
+    return index.iloc[max(first, last - limit):last].iloc[::-1]
+
+
+def search_records(index: pd.DataFrame, key: str) -> pd.DataFrame:
+    """
+    Show a search box for a picker (outside its form, so it narrows the
+    picker as you type) and get the records it matches. There is nothing to
+    search if every record is listed, so then there is no box.
+
+    Args:
+        index (pd.DataFrame): The record index, as built by record_index
+        key (str): The search box's widget key
+
+    Returns:
+        pd.DataFrame: The matching records to pick from, newest first
+    """
+    if len(index) <= RECENT_RECORDS:
+        return index.iloc[::-1]
+    prefix = st.text_input(
+        "Search by date",
+        key=key,
+        placeholder="YYYY-MM-DD HH:MM",
+        help=f"Only the {RECENT_RECORDS} most recent matches are listed",
+    )
+    matches = match_records(index, prefix)
+    if len(matches) == 0 and len(index) > 0:
+        st.caption("Nothing matches that date")
+    return matches
+
+
+def pick_record(label: str, matches: pd.DataFrame, key: str | None = None) -> pd.Timestamp | None:
+    """
+    Show a select box of records, labelled by their timestamps
+
+    Args:
+        label (str): The select box's label
+        matches (pd.DataFrame): The records to pick from, as found by search_records
+        key (str | None): The select box's widget key
+
+    Returns:
+        pd.Timestamp | None: The timestamp of the picked record, or None if
+            there are none
+    """
+    labels = dict(zip(matches["timestamp"], matches["label"]))
+    return st.selectbox(label, options=list(labels), format_func=labels.get, key=key)
@@ -0,0 +1,26 @@
+import matplotlib.pyplot as plt
+from matplotlib import font_manager
+
+from src.cfg.colour_config import ColourConfig
+
+COLOURS = ColourConfig()
+# The app's font, for the charts
+FONT_PATH = "src/cfg/fonts/playpen_sans.ttf"
+
+
+def apply_chart_theme():
+    """
+    Give matplotlib the app's font and colours. Every process that draws
+    charts needs this, so it is also run in each worker as it starts.
+    """
+    font_manager.fontManager.addfont(FONT_PATH)
+    plt.rcParams.update(
+        {
+            "font.family": "Playpen Sans",
+            "legend.facecolor": COLOURS.YELLOW_HEX,
+            "legend.edgecolor": COLOURS.BROWN_HEX,
+            "legend.labelcolor": COLOURS.BROWN_HEX,
+            "axes.facecolor": COLOURS.BLUE_HEX,
+            "figure.facecolor": COLOURS.YELLOW_HEX,
+        }
+    )
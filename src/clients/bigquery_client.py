@@ -2,14 +2,27 @@ from google.oauth2 import service_account
 from google.cloud.bigquery import Client
 import streamlit as st
 
+from src.clients.fake_bigquery import FakeBigQueryClient
+from src.clients.resilience import ResilientClient
+
 
 @st.cache_resource()
-def bq_client() -> Client:
+def bq_client() -> ResilientClient:
     """
-    Get the GBQ client, authenticated via a service account
+    Get the GBQ client, authenticated via a service account, with deadlines,
+    retries and a circuit breaker on its calls. Setting the bigquery_backend
+    secret to "fake" uses an in-process stand-in instead, for running offline.
     """
+    if st.secrets.get("bigquery_backend", None) == "fake":
+        return ResilientClient(
+            FakeBigQueryClient(
+                latency_seconds=float(st.secrets.get("fake_bigquery_latency_seconds", 0.0)),
+                failure_rate=float(st.secrets.get("fake_bigquery_failure_rate", 0.0)),
+            )
+        )
+
     sa_info = st.secrets["google_service_account"]
     credentials = service_account.Credentials.from_service_account_info(sa_info)
     client = Client(credentials=credentials, project=credentials.project_id)
 
-    return client
+    return ResilientClient(client)
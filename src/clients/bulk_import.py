@@ -0,0 +1,278 @@
+import ast
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from google.cloud import bigquery
+
+from src.clients.tables import SLEEPING_TABLE, TableLayout, append_table, read_table
+
+# How many rows are parsed at a time
+DEFAULT_CHUNK_SIZE = 10_000
+
+_TRUE = {"true", "t", "yes", "y", "1"}
+_FALSE = {"false", "f", "no", "n", "0"}
+
+
+class ImportValidationError(Exception):
+    """
+    Raised when imported rows do not match their table's schema
+    """
+
+    def __init__(self, errors: list[str]):
+        super().__init__(f"{len(errors)} invalid value(s), e.g. {errors[0]}")
+        self.errors = errors
+
+
+@dataclass
+class ImportSummary:
+    """
+    What an import read, dropped and loaded
+    """
+
+    rows_read: int = 0
+    duplicates_in_files: int = 0
+    already_in_table: int = 0
+    new_rows: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+def read_chunks(path: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Stream a CSV or Parquet file in chunks of rows, as strings (CSV) or their
+    stored types (Parquet)
+
+    Args:
+        path (str | Path): The file to read
+        chunk_size (int): The number of rows per chunk
+
+    Yields:
+        pd.DataFrame: Each chunk of rows
+    """
+    path = Path(path)
+    if path.suffix.lower() in [".parquet", ".pq"]:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif path.suffix.lower() in [".csv", ".txt"]:
+        yield from pd.read_csv(
+            path, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=[""]
+        )
+    else:
+        raise ValueError(f"Cannot import {path}: only CSV and Parquet files are supported")
+
+
+def _parse_list(value) -> list:
+    """
+    Parse a list cell, written as a JSON/Python list or as ";"- or
+    ","-separated values
+    """
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return list(value)
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    text = str(value).strip()
+    if text == "":
+        return []
+    if text.startswith("["):
+        try:
+            return list(json.loads(text))
+        except json.JSONDecodeError:
+            return list(ast.literal_eval(text))
+    separator = ";" if ";" in text else ","
+    return [item.strip() for item in text.split(separator) if item.strip()]
+
+
+def _parse_bool(value):
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if pd.isna(value):
+        return pd.NA
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"{value!r} is not a true/false value")
+
+
+def _parse_datetimes(values: pd.Series) -> pd.Series:
+    """
+    Parse ISO dates and times, or else day-first ones (as UK spreadsheets write them)
+    """
+    try:
+        return pd.to_datetime(values, format="ISO8601")
+    except (ValueError, TypeError):
+        return pd.to_datetime(values, format="mixed", dayfirst=True)
+
+
+def _parse_column(values: pd.Series, field_type: str) -> pd.Series:
+    """
+    Parse a column to a BigQuery type, raising ValueError for bad values
+    """
+    if field_type in ["DATETIME", "TIMESTAMP"]:
+        return _parse_datetimes(values)
+    if field_type == "DATE":
+        return _parse_datetimes(values).dt.date
+    if field_type == "TIME":
+        return pd.to_datetime(values.astype(str), format="mixed").dt.time.where(values.notna(), None)
+    if field_type in ["INTEGER", "INT64"]:
+        return pd.to_numeric(values).astype("Int64")
+    if field_type in ["FLOAT", "FLOAT64"]:
+        return pd.to_numeric(values).astype(float)
+    if field_type in ["BOOLEAN", "BOOL"]:
+        return values.map(_parse_bool).astype("boolean")
+    return values.astype(object).where(values.notna(), None).map(
+        lambda value: value if value is None else str(value)
+    )
+
+
+def _first_bad_value(values: pd.Series, field_type: str) -> tuple[int, object]:
+    """
+    Find the first value in a column that does not parse, for the error message
+    """
+    for position, value in enumerate(values):
+        try:
+            _parse_column(pd.Series([value], dtype=object), field_type)
+        except (ValueError, TypeError, SyntaxError):
+            return position, value
+    return 0, values.iloc[0]
+
+
+def validate_chunk(
+    layout: TableLayout,
+    schema: list[bigquery.SchemaField],
+    chunk: pd.DataFrame,
+    first_row: int = 0,
+) -> pd.DataFrame:
+    """
+    Check a chunk of imported rows against a table's schema and convert each
+    column to its type. Missing optional columns are left empty, list columns
+    are parsed, and sleeps without a type are backfilled as night sleeps (as
+    older records were, by the sleeping table's first migration).
+
+    Args:
+        layout (TableLayout): The table being imported into
+        schema (list[bigquery.SchemaField]): The table's schema
+        chunk (pd.DataFrame): The raw rows
+        first_row (int): The file row number of the chunk's first row
+
+    Returns:
+        pd.DataFrame: The typed rows, with the table's columns
+
+    Raises:
+        ImportValidationError: If any column is unknown or missing, or any value does not parse
+    """
+    names = [schema_field.name for schema_field in schema]
+    errors = [f"Unknown column {column!r}" for column in chunk.columns if column not in names]
+    for key in layout.key_fields:
+        if key not in chunk.columns:
+            errors.append(f"Missing column {key!r}")
+        elif chunk[key].isna().any():
+            row = first_row + int(np.argmax(chunk[key].isna().to_numpy()))
+            errors.append(f"Row {row}: {key} is empty")
+    if errors:
+        raise ImportValidationError(errors)
+
+    chunk = chunk.reset_index(drop=True)
+    rows = pd.DataFrame(index=chunk.index)
+    for schema_field in schema:
+        values = (
+            chunk[schema_field.name]
+            if schema_field.name in chunk.columns
+            else pd.Series([None] * len(chunk), dtype=object)
+        )
+        try:
+            if schema_field.mode == "REPEATED":
+                lists = values.map(_parse_list)
+                rows[schema_field.name] = lists.map(
+                    lambda items, field_type=schema_field.field_type: _parse_column(
+                        pd.Series(items, dtype=object), field_type
+                    ).to_numpy()
+                )
+            else:
+                rows[schema_field.name] = _parse_column(values, schema_field.field_type)
+        except (ValueError, TypeError, SyntaxError):
+            position, value = _first_bad_value(values, schema_field.field_type)
+            errors.append(
+                f"Row {first_row + position}: {value!r} is not a valid "
+                f"{schema_field.field_type} for {schema_field.name}"
+            )
+    if errors:
+        raise ImportValidationError(errors)
+
+    if layout is SLEEPING_TABLE:
+        rows["sleep_type"] = rows["sleep_type"].fillna("Night")
+    return rows
+
+
+def _keys(df: pd.DataFrame, layout: TableLayout) -> pd.Series:
+    """
+    Each row's key as one string, so typed and stored rows compare equal
+    """
+    return df[list(layout.key_fields)].astype(str).agg("|".join, axis=1)
+
+
+def import_files(
+    layout: TableLayout,
+    paths: list[str | Path],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dry_run: bool = False,
+) -> ImportSummary:
+    """
+    Import historical records into a table: stream and validate every file,
+    drop rows that repeat within the files or are already in the table, and
+    append what is left with a single load job (rather than rewriting the
+    table once per record).
+
+    Args:
+        layout (TableLayout): The table to import into
+        paths (list[str | Path]): The CSV and Parquet files to import
+        chunk_size (int): The number of rows parsed at a time
+        dry_run (bool): Whether to validate and count without loading
+
+    Returns:
+        ImportSummary: What was read, dropped and (unless a dry run) loaded,
+            and any errors, in which case nothing is loaded
+    """
+    schema = list(layout.schema)
+    summary = ImportSummary()
+    chunks = []
+    for path in paths:
+        row = 2 if Path(path).suffix.lower() in [".csv", ".txt"] else 1
+        for chunk in read_chunks(path, chunk_size):
+            try:
+                chunks.append(validate_chunk(layout, schema, chunk, first_row=row))
+            except ImportValidationError as e:
+                summary.errors += [f"{path}: {error}" for error in e.errors]
+            summary.rows_read += len(chunk)
+            row += len(chunk)
+    if summary.errors or not chunks:
+        return summary
+
+    imported = pd.concat(chunks, ignore_index=True)
+    keys = _keys(imported, layout)
+    unique = ~keys.duplicated()
+    summary.duplicates_in_files = int((~unique).sum())
+    imported, keys = imported[unique], keys[unique]
+
+    existing = read_table(layout)
+    new = ~keys.isin(set(_keys(existing, layout))) if len(existing) > 0 else keys.notna()
+    summary.already_in_table = int((~new).sum())
+    imported = imported[new].reset_index(drop=True)
+
+    # Number new sleeps on from the existing ones
+    if layout is SLEEPING_TABLE:
+        # Older sleeps may have no id, so start from 0 if none has one
+        highest = existing["sleep_id"].max(skipna=True) if len(existing) > 0 else None
+        next_id = 0 if pd.isna(highest) else int(highest) + 1
+        missing = imported["sleep_id"].isna()
+        imported.loc[missing, "sleep_id"] = np.arange(next_id, next_id + int(missing.sum()))
+
+    summary.new_rows = len(imported)
+    if not dry_run and len(imported) > 0:
+        append_table(layout, imported)
+    return summary
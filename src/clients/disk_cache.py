@@ -0,0 +1,104 @@
+import hashlib
+import os
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+
+def disk_cache_dir() -> Path | None:
+    """
+    Get the directory of the on-disk data cache, or None if it is turned off
+    """
+    directory = st.secrets.get("disk_cache_dir", None)
+    return Path(directory) if directory is not None else None
+
+
+def table_version(table) -> str:
+    """
+    Get a short version string for a table from its metadata, which changes
+    whenever the table does
+
+    Args:
+        table (bigquery.Table): The table's metadata
+
+    Returns:
+        str: The version
+    """
+    modified = table.modified.isoformat() if table.modified is not None else ""
+    return hashlib.sha256(f"{modified}|{table.num_rows}".encode()).hexdigest()[:16]
+
+
+def _window(start: date | None, end: date | None) -> str:
+    return f"{start or 'start'}_{end or 'end'}"
+
+
+def read_disk_cache(
+    name: str, start: date | None, end: date | None, version: str
+) -> pd.DataFrame | None:
+    """
+    Read a window of a table from the on-disk cache, if it was cached at the
+    table's current version
+
+    Args:
+        name (str): The table name
+        start (date | None): The first day of the window
+        end (date | None): The last day of the window
+        version (str): The table's current version
+
+    Returns:
+        pd.DataFrame | None: The cached rows, or None on a miss
+    """
+    directory = disk_cache_dir()
+    if directory is None:
+        return None
+    path = directory / name / f"{_window(start, end)}_{version}.arrow"
+    try:
+        with pa.OSFile(str(path), "rb") as source:
+            table = pa.ipc.open_file(source).read_all()
+    except FileNotFoundError:
+        # Not cached, or just deleted by a write of a newer version
+        return None
+    return table.to_pandas()
+
+
+def write_disk_cache(
+    name: str, start: date | None, end: date | None, version: str, df: pd.DataFrame
+):
+    """
+    Write a window of a table to the on-disk cache as an Arrow IPC file, and
+    delete any windows cached at older versions of the table
+
+    Args:
+        name (str): The table name
+        start (date | None): The first day of the window
+        end (date | None): The last day of the window
+        version (str): The table's version when the rows were read
+        df (pd.DataFrame): The rows
+    """
+    directory = disk_cache_dir()
+    if directory is None:
+        return
+    table_dir = directory / name
+    table_dir.mkdir(parents=True, exist_ok=True)
+    for old in table_dir.glob("*.arrow"):
+        if not old.stem.endswith(version):
+            old.unlink(missing_ok=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    path = table_dir / f"{_window(start, end)}_{version}.arrow"
+    # Each writer (thread or process) writes its own temporary file, and the
+    # finished file replaces any other writer's in one step
+    fd, temp_path = tempfile.mkstemp(dir=table_dir, prefix=f"{path.stem}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        with pa.OSFile(temp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
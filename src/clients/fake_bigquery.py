@@ -0,0 +1,409 @@
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as time_of_day, timezone
+
+import db_dtypes  # noqa: F401 (registers the dbdate and dbtime dtypes)
+import numpy as np
+import pandas as pd
+from google.api_core.exceptions import (
+    BadRequest,
+    Conflict,
+    DeadlineExceeded,
+    NotFound,
+    ServiceUnavailable,
+)
+from google.cloud import bigquery
+
+# Dtypes rows are stored with, by BigQuery type, matching to_dataframe
+_DTYPES = {
+    "DATETIME": "datetime64[ns]",
+    "TIMESTAMP": "datetime64[ns, UTC]",
+    "DATE": "dbdate",
+    "TIME": "dbtime",
+    "INTEGER": "Int64",
+    "INT64": "Int64",
+    "FLOAT": "float64",
+    "FLOAT64": "float64",
+    "BOOLEAN": "boolean",
+    "BOOL": "boolean",
+    "STRING": "object",
+}
+
+_SELECT = re.compile(r"^\s*SELECT \* FROM `(?P<table>[^`]+)`(?: WHERE (?P<where>.+?))?\s*$", re.S)
+_PREDICATE = re.compile(
+    r"^\s*(?P<open>\()?(?P<column>\w+) (?P<op>>=|<=|>|<|=) @(?P<param>\w+)"
+    r"(?(open) OR (?P=column) (?P<or_null>IS NULL)\))\s*$"
+)
+_CTAS = re.compile(
+    r"^\s*CREATE OR REPLACE TABLE `(?P<table>[^`]+)`\s+"
+    r"PARTITION BY (?:DATE\()?(?P<partition>\w+)\)?\s+"
+    r"CLUSTER BY (?P<cluster>[\w, ]+?)\s+"
+    r"OPTIONS \(require_partition_filter = (?P<require>TRUE|FALSE)\)\s+"
+    r"AS SELECT \* FROM `(?P<source>[^`]+)`\s*$",
+    re.S,
+)
+_OPERATORS = {
+    ">=": pd.Series.ge,
+    "<=": pd.Series.le,
+    ">": pd.Series.gt,
+    "<": pd.Series.lt,
+    "=": pd.Series.eq,
+}
+
+
+@dataclass
+class FakeTable:
+    """
+    A table's metadata and rows
+    """
+
+    table_id: str
+    schema: list[bigquery.SchemaField]
+    rows: pd.DataFrame
+    time_partitioning: bigquery.TimePartitioning | None = None
+    clustering_fields: list[str] | None = None
+    require_partition_filter: bool = False
+    # Every change replaces the table, so this is set as it is made
+    modified: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    @property
+    def num_rows(self) -> int:
+        """
+        The number of rows in the table
+        """
+        return len(self.rows)
+
+
+@dataclass
+class FakeJob:
+    """
+    A finished query or load job, with the statistics the real job reports
+    """
+
+    rows: pd.DataFrame | None = None
+    total_bytes_processed: int = 0
+    slot_millis: int = 0
+    cache_hit: bool = False
+    dry_run: bool = False
+    total_bytes_billed: int = field(init=False)
+
+    def __post_init__(self):
+        self.total_bytes_billed = 0 if self.dry_run else self.total_bytes_processed
+
+    def result(self, timeout: float | None = None):
+        """
+        Wait for the job (which has already finished)
+        """
+        return self
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Get the query results
+        """
+        if self.rows is None:
+            raise BadRequest("This job has no results to fetch")
+        return self.rows.copy()
+
+
+def _coerce(values: pd.Series, schema_field: bigquery.SchemaField) -> pd.Series:
+    """
+    Convert a column to how BigQuery would store (and return) it
+    """
+    if schema_field.mode == "REPEATED":
+        element = bigquery.SchemaField(schema_field.name, schema_field.field_type)
+        return values.map(
+            lambda lst: _coerce(
+                pd.Series(list(lst) if isinstance(lst, (list, np.ndarray)) else [], dtype=object),
+                element,
+            ).to_numpy()
+        )
+    dtype = _DTYPES.get(schema_field.field_type)
+    if dtype is None:
+        raise BadRequest(f"Unsupported type {schema_field.field_type} for {schema_field.name}")
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(values, utc=dtype.endswith("UTC]")).astype(dtype)
+    if dtype == "dbdate":
+        return pd.to_datetime(values).dt.date.astype(dtype)
+    if dtype == "dbtime":
+        return values.astype(object).where(values.notna(), None).astype(dtype)
+    if dtype == "object":
+        return values.astype(object).where(values.notna(), None)
+    return values.astype(dtype)
+
+
+def _detect_schema(df: pd.DataFrame) -> list[bigquery.SchemaField]:
+    """
+    Guess a schema from a data frame's dtypes, like a load job's autodetect
+    """
+    schema = []
+    for column, dtype in df.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            field_type = "BOOLEAN"
+        elif pd.api.types.is_integer_dtype(dtype):
+            field_type = "INTEGER"
+        elif pd.api.types.is_float_dtype(dtype):
+            field_type = "FLOAT"
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            field_type = "DATETIME"
+        elif str(dtype) == "dbdate" or df[column].map(type).eq(date).any():
+            field_type = "DATE"
+        elif str(dtype) == "dbtime" or df[column].map(type).eq(time_of_day).any():
+            field_type = "TIME"
+        else:
+            field_type = "STRING"
+        schema.append(bigquery.SchemaField(column, field_type))
+    return schema
+
+
+class FakeBigQueryClient:
+    """
+    An in-process stand-in for google.cloud.bigquery.Client, supporting the
+    calls the app makes: reading tables with date predicates, loading data
+    frames (with schemas, REPEATED fields and write dispositions), table
+    metadata, and rebuilding a table's partitioning and clustering. Every
+    call can be slowed down to mimic network latency, and made to fail some
+    of the time to mimic an outage.
+    """
+
+    def __init__(
+        self, latency_seconds: float = 0.0, project: str = "fake-project", failure_rate: float = 0.0
+    ):
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self.project = project
+        self._tables: dict[str, FakeTable] = {}
+        self._lock = threading.Lock()
+
+    def _wait(self, timeout: float | None = None):
+        """
+        Wait out the latency, timing out (like the real client's requests) if
+        it is longer than the call's timeout, and fail at the failure rate
+        """
+        if timeout is not None and self.latency_seconds > timeout:
+            time.sleep(max(timeout, 0))
+            raise DeadlineExceeded("The fake BigQuery call timed out")
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+        if random.random() < self.failure_rate:
+            raise ServiceUnavailable("The fake BigQuery backend is unavailable")
+
+    def _table(self, table_id: str) -> FakeTable:
+        if table_id not in self._tables:
+            raise NotFound(f"Not found: Table {table_id}")
+        return self._tables[table_id]
+
+    def get_table(self, table_id: str, timeout: float | None = None) -> FakeTable:
+        """
+        Get a table's metadata
+        """
+        self._wait(timeout)
+        with self._lock:
+            return self._table(str(table_id))
+
+    def create_table(
+        self, table: bigquery.Table | str, exists_ok: bool = False, timeout: float | None = None
+    ) -> FakeTable:
+        """
+        Create an empty table
+        """
+        self._wait(timeout)
+        if isinstance(table, str):
+            table = bigquery.Table(table)
+        table_id = f"{table.project}.{table.dataset_id}.{table.table_id}"
+        with self._lock:
+            if table_id in self._tables:
+                if exists_ok:
+                    return self._tables[table_id]
+                raise Conflict(f"Already Exists: Table {table_id}")
+            schema = list(table.schema)
+            self._tables[table_id] = FakeTable(
+                table_id=table_id,
+                schema=schema,
+                rows=self._conform(pd.DataFrame(columns=[f.name for f in schema]), schema),
+                time_partitioning=table.time_partitioning,
+                clustering_fields=table.clustering_fields,
+                require_partition_filter=bool(table.require_partition_filter),
+            )
+            return self._tables[table_id]
+
+    def delete_table(self, table_id: str, not_found_ok: bool = False, timeout: float | None = None):
+        """
+        Delete a table
+        """
+        self._wait(timeout)
+        with self._lock:
+            if table_id not in self._tables and not not_found_ok:
+                raise NotFound(f"Not found: Table {table_id}")
+            self._tables.pop(table_id, None)
+
+    @staticmethod
+    def _conform(df: pd.DataFrame, schema: list[bigquery.SchemaField]) -> pd.DataFrame:
+        """
+        Check a data frame against a schema and convert each column to its type
+        """
+        names = [f.name for f in schema]
+        unknown = [column for column in df.columns if column not in names]
+        if unknown:
+            raise BadRequest(f"No such field(s) in the schema: {', '.join(unknown)}")
+        for schema_field in schema:
+            if schema_field.mode == "REQUIRED" and (
+                schema_field.name not in df.columns or df[schema_field.name].isna().any()
+            ):
+                raise BadRequest(f"Missing required field: {schema_field.name}")
+        rows = pd.DataFrame(index=range(len(df)))
+        for schema_field in schema:
+            values = (
+                df[schema_field.name].reset_index(drop=True)
+                if schema_field.name in df.columns
+                else pd.Series([None] * len(df), dtype=object)
+            )
+            rows[schema_field.name] = _coerce(values, schema_field)
+        return rows
+
+    def load_table_from_dataframe(
+        self,
+        dataframe: pd.DataFrame,
+        destination: str,
+        job_config: bigquery.LoadJobConfig | None = None,
+        timeout: float | None = None,
+    ) -> FakeJob:
+        """
+        Load a data frame into a table. Like the real load job, the default is
+        to append, the table is created if needed, the config's schema (or
+        else the table's, or an autodetected one) is enforced, and an existing
+        table's partitioning cannot be changed.
+        """
+        self._wait(timeout)
+        job_config = job_config or bigquery.LoadJobConfig()
+        disposition = job_config.write_disposition or bigquery.WriteDisposition.WRITE_APPEND
+        table_id = str(destination)
+        with self._lock:
+            existing = self._tables.get(table_id)
+            if disposition == bigquery.WriteDisposition.WRITE_EMPTY and existing is not None and existing.num_rows > 0:
+                raise Conflict(f"Already Exists: Table {table_id} is not empty")
+
+            partitioning = job_config.time_partitioning
+            if existing is not None and partitioning is not None and (
+                existing.time_partitioning is None
+                or existing.time_partitioning.field != partitioning.field
+            ):
+                # Loads cannot change a table's partitioning, only a rebuild can
+                raise BadRequest(f"Incompatible table partitioning specification for {table_id}")
+
+            if job_config.schema:
+                schema = list(job_config.schema)
+            elif existing is not None and disposition != bigquery.WriteDisposition.WRITE_TRUNCATE:
+                schema = existing.schema
+            else:
+                schema = _detect_schema(dataframe)
+            rows = self._conform(dataframe, schema)
+            if existing is not None and disposition == bigquery.WriteDisposition.WRITE_APPEND:
+                if [f.name for f in schema] != [f.name for f in existing.schema]:
+                    raise BadRequest(f"The schema does not match table {table_id}")
+                rows = pd.concat([existing.rows, rows], ignore_index=True)
+
+            self._tables[table_id] = FakeTable(
+                table_id=table_id,
+                schema=schema,
+                rows=rows,
+                time_partitioning=job_config.time_partitioning
+                or (existing.time_partitioning if existing is not None else None),
+                clustering_fields=job_config.clustering_fields
+                or (existing.clustering_fields if existing is not None else None),
+                # A table option, which loads keep
+                require_partition_filter=existing is not None and existing.require_partition_filter,
+            )
+        return FakeJob(total_bytes_processed=int(dataframe.memory_usage(deep=True).sum()))
+
+    def query(
+        self,
+        query: str,
+        job_config: bigquery.QueryJobConfig | None = None,
+        timeout: float | None = None,
+    ) -> FakeJob:
+        """
+        Run a query. Only the queries the app makes are understood: SELECT *
+        with AND-ed comparisons against parameters (each of which may also
+        take NULLs), and rebuilding a table with new partitioning and clustering.
+        """
+        self._wait(timeout)
+        job_config = job_config or bigquery.QueryJobConfig()
+        with self._lock:
+            select = _SELECT.match(query)
+            if select is not None:
+                return self._select(select, job_config)
+            ctas = _CTAS.match(query)
+            if ctas is not None:
+                return self._rebuild(ctas, job_config)
+        raise NotImplementedError(f"The fake BigQuery client cannot run: {query}")
+
+    def _select(self, match: re.Match, job_config: bigquery.QueryJobConfig) -> FakeJob:
+        table = self._table(match["table"])
+        parameters = {p.name: p.value for p in job_config.query_parameters}
+        predicates = [
+            _PREDICATE.match(predicate)
+            for predicate in re.split(r"\s+AND\s+", match["where"] or "")
+            if predicate.strip()
+        ]
+        if any(predicate is None for predicate in predicates):
+            raise NotImplementedError(f"The fake BigQuery client cannot filter on: {match['where']}")
+
+        partitioning = table.time_partitioning
+        if (
+            partitioning is not None
+            and table.require_partition_filter
+            and not any(p["column"] == partitioning.field for p in predicates)
+        ):
+            raise BadRequest(
+                f"Cannot query over table '{table.table_id}' without a filter over "
+                f"column(s) '{partitioning.field}' that can be used for partition elimination"
+            )
+
+        keep = pd.Series(True, index=table.rows.index)
+        for predicate in predicates:
+            if predicate["param"] not in parameters:
+                raise BadRequest(f"Query parameter '{predicate['param']}' not found")
+            if predicate["column"] not in table.rows.columns:
+                raise BadRequest(f"Unrecognized name: {predicate['column']}")
+            value = parameters[predicate["param"]]
+            column = table.rows[predicate["column"]]
+            if isinstance(value, (date, datetime)):
+                column, value = pd.to_datetime(column), pd.Timestamp(value)
+            matches = _OPERATORS[predicate["op"]](column, value).fillna(False).astype(bool)
+            if predicate["or_null"] is not None:
+                matches |= column.isna()
+            keep &= matches
+
+        rows = table.rows[keep].reset_index(drop=True)
+        scanned = int(rows.memory_usage(deep=True).sum())
+        if job_config.dry_run:
+            return FakeJob(total_bytes_processed=scanned, dry_run=True)
+        return FakeJob(
+            rows=rows,
+            total_bytes_processed=scanned,
+            slot_millis=int(self.latency_seconds * 1000),
+        )
+
+    def _rebuild(self, match: re.Match, job_config: bigquery.QueryJobConfig) -> FakeJob:
+        source = self._table(match["source"])
+        cluster_fields = [f.strip() for f in match["cluster"].split(",")]
+        for column in [match["partition"], *cluster_fields]:
+            if column not in [f.name for f in source.schema]:
+                raise BadRequest(f"Unrecognized name: {column}")
+        scanned = int(source.rows.memory_usage(deep=True).sum())
+        if job_config.dry_run:
+            return FakeJob(total_bytes_processed=scanned, dry_run=True)
+        self._tables[match["table"]] = FakeTable(
+            table_id=match["table"],
+            schema=list(source.schema),
+            rows=source.rows.copy(),
+            time_partitioning=bigquery.TimePartitioning(
+                type_=bigquery.TimePartitioningType.DAY, field=match["partition"]
+            ),
+            clustering_fields=cluster_fields,
+            require_partition_filter=match["require"] == "TRUE",
+        )
+        return FakeJob(total_bytes_processed=scanned)
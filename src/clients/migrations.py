@@ -0,0 +1,275 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+import pandas as pd
+import streamlit as st
+from google.cloud import bigquery
+
+from src.clients.bigquery_client import bq_client
+from src.clients.query_costs import QUERY_COSTS
+from src.clients.shared_cache import broadcast_write
+from src.clients.tables import (
+    DRINKING_TABLE,
+    NAPPY_TABLE,
+    PUMPING_TABLE,
+    SLEEPING_TABLE,
+    TABLES,
+    TableLayout,
+    date_filter,
+    ensure_table,
+)
+
+# Each applied migration is recorded here, so it is only applied once
+MIGRATIONS_TABLE_ID = "archie-baby-app.baby_app.schema_migrations"
+MIGRATIONS_SCHEMA = (
+    bigquery.SchemaField("table_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("version", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("description", "STRING"),
+    bigquery.SchemaField("applied_at", "DATETIME"),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    One numbered change to a table: either to its rows (apply), or to the
+    table itself (rebuild), which runs on the table as the migrations before
+    it left it. Either must be idempotent, as a migration that was applied
+    but not recorded (e.g. if the app stopped in between) is applied again.
+    """
+
+    version: int
+    description: str
+    apply: Callable[[pd.DataFrame], pd.DataFrame] = lambda df: df
+    rebuild: Callable[[TableLayout], bool] | None = None
+
+
+def backfill_sleep_type(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sleeps logged before naps were tracked are night sleeps
+    """
+    if "sleep_type" not in df.columns:
+        df["sleep_type"] = "Night"
+    df["sleep_type"] = df["sleep_type"].fillna("Night")
+    return df
+
+
+def adopt_layout(layout: TableLayout) -> bool:
+    """
+    Rebuild a table with its managed partitioning, clustering and partition
+    filter if it has other ones (e.g. it was created implicitly by a load
+    job). Loads cannot change a table's partitioning, so this rebuilds the
+    table from itself, after the rows the layout needs (e.g. the clustering
+    columns) have been migrated.
+
+    Args:
+        layout (TableLayout): The table to lay out
+
+    Returns:
+        bool: Whether the table was rebuilt
+    """
+    client = bq_client()
+    table = client.get_table(layout.table_id)
+    partitioning = table.time_partitioning
+    if (
+        partitioning is not None
+        and partitioning.field == layout.date_column
+        and tuple(table.clustering_fields or ()) == layout.cluster_fields
+        and bool(table.require_partition_filter) == layout.require_partition_filter
+    ):
+        return False
+
+    partition_by = (
+        layout.date_column
+        if layout.date_type == "DATE"
+        else f"DATE({layout.date_column})"
+    )
+    job = client.query(
+        f"""
+        CREATE OR REPLACE TABLE `{layout.table_id}`
+        PARTITION BY {partition_by}
+        CLUSTER BY {", ".join(layout.cluster_fields)}
+        OPTIONS (require_partition_filter = {str(layout.require_partition_filter).upper()})
+        AS SELECT * FROM `{layout.table_id}`
+        """
+    )
+    job.result()
+    QUERY_COSTS.record_job(job, layout.name)
+    return True
+
+
+# Used to be applied by the first read or save of each table in a process
+ADOPT_LAYOUT = "Adopt the managed partitioning, clustering and partition filter"
+
+# A table's row migrations are applied together and the table rewritten with
+# its managed schema (keeping its layout), so a row migration need only
+# change the rows. The layout is adopted after that, by rebuilding the table.
+MIGRATIONS: dict[str, list[Migration]] = {
+    SLEEPING_TABLE.table_id: [
+        Migration(1, "Backfill the type of older sleeps, which is then required", backfill_sleep_type),
+        Migration(2, ADOPT_LAYOUT, rebuild=adopt_layout),
+    ],
+    # The table itself was migrated by hand from the old drinking table
+    DRINKING_TABLE.table_id: [
+        Migration(1, "Adopt the managed schema"),
+        Migration(2, ADOPT_LAYOUT, rebuild=adopt_layout),
+    ],
+    PUMPING_TABLE.table_id: [
+        Migration(1, "Adopt the managed schema"),
+        Migration(2, ADOPT_LAYOUT, rebuild=adopt_layout),
+    ],
+    # Until now the schema was autodetected by each load
+    NAPPY_TABLE.table_id: [
+        Migration(1, "Adopt an explicit schema"),
+        Migration(2, ADOPT_LAYOUT, rebuild=adopt_layout),
+    ],
+}
+
+
+def schema_versions() -> dict[str, int]:
+    """
+    Get the version each table has been migrated to, creating the table the
+    migrations are recorded in if it does not exist yet
+
+    Returns:
+        dict[str, int]: The version of each table that has been migrated
+    """
+    client = bq_client()
+    client.create_table(
+        bigquery.Table(MIGRATIONS_TABLE_ID, schema=list(MIGRATIONS_SCHEMA)), exists_ok=True
+    )
+    job = client.query(f"SELECT * FROM `{MIGRATIONS_TABLE_ID}`")
+    QUERY_COSTS.record_job(job, "schema_migrations")
+    applied = job.to_dataframe()
+    if len(applied) == 0:
+        return {}
+    return {
+        table_id: int(version)
+        for table_id, version in applied.groupby("table_id")["version"].max().items()
+    }
+
+
+def pending_migrations(table_id: str, versions: dict[str, int]) -> list[Migration]:
+    """
+    Get the migrations not yet applied to a table, in order
+    """
+    version = versions.get(table_id, 0)
+    return [
+        migration
+        for migration in sorted(MIGRATIONS[table_id], key=lambda m: m.version)
+        if migration.version > version
+    ]
+
+
+def _read_all(layout: TableLayout) -> pd.DataFrame:
+    """
+    Read every row of a table (including any with no date), bypassing the caches
+    """
+    where, parameters = date_filter(layout, None, None)
+    job = bq_client().query(
+        f"SELECT * FROM `{layout.table_id}` WHERE {where}",
+        job_config=bigquery.QueryJobConfig(query_parameters=parameters),
+    )
+    QUERY_COSTS.record_job(job, layout.name)
+    return job.to_dataframe()
+
+
+def _record(layout: TableLayout, migrations: list[Migration]):
+    """
+    Record migrations as applied to a table
+    """
+    applied = pd.DataFrame(
+        {
+            "table_id": [layout.table_id] * len(migrations),
+            "version": [migration.version for migration in migrations],
+            "description": [migration.description for migration in migrations],
+            "applied_at": [datetime.now()] * len(migrations),
+        }
+    )
+    job = bq_client().load_table_from_dataframe(
+        applied,
+        MIGRATIONS_TABLE_ID,
+        job_config=bigquery.LoadJobConfig(
+            schema=list(MIGRATIONS_SCHEMA),
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        ),
+    )
+    job.result()
+
+
+def _rewrite(layout: TableLayout, df: pd.DataFrame):
+    """
+    Overwrite a table with its managed schema, keeping whatever partitioning
+    and clustering it has, as its layout may not have been migrated yet
+    """
+    df = layout.validate(df)
+    client = bq_client()
+    table = client.get_table(layout.table_id)
+    job = client.load_table_from_dataframe(
+        df,
+        layout.table_id,
+        job_config=bigquery.LoadJobConfig(
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+            schema=list(layout.schema),
+            time_partitioning=table.time_partitioning,
+            clustering_fields=table.clustering_fields,
+        ),
+    )
+    job.result()
+    broadcast_write(layout.name)
+
+
+def migrate_table(layout: TableLayout, versions: dict[str, int]) -> list[Migration]:
+    """
+    Apply a table's pending migrations in order. Consecutive row migrations
+    share one read of the table, and are recorded once the table has been
+    rewritten with their changes; a rebuild runs (and is recorded) on the
+    table as they left it.
+
+    Args:
+        layout (TableLayout): The table to migrate
+        versions (dict[str, int]): The version each table has been migrated to
+
+    Returns:
+        list[Migration]: The migrations applied
+    """
+    migrations = pending_migrations(layout.table_id, versions)
+    if len(migrations) == 0:
+        return []
+    ensure_table(layout.table_id)
+    batch: list[Migration] = []
+    df = None
+    for migration in migrations:
+        if migration.rebuild is None:
+            df = _read_all(layout) if df is None else df
+            df = migration.apply(df)
+            batch.append(migration)
+            continue
+        if batch:
+            _rewrite(layout, df)
+            _record(layout, batch)
+            batch, df = [], None
+        migration.rebuild(layout)
+        _record(layout, [migration])
+    if batch:
+        _rewrite(layout, df)
+        _record(layout, batch)
+    return migrations
+
+
+@st.cache_resource(show_spinner="Bringing the tables up to date...")
+def migrate_tables() -> dict[str, list[int]]:
+    """
+    Bring every table up to its latest schema version. This runs once per
+    process, before any page reads a table, so reads and saves can rely on
+    the tables' fixed schemas.
+
+    Returns:
+        dict[str, list[int]]: The versions applied to each table
+    """
+    versions = schema_versions()
+    return {
+        layout.name: [migration.version for migration in migrate_table(layout, versions)]
+        for layout in TABLES.values()
+    }
@@ -0,0 +1,326 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
+
+import pandas as pd
+import streamlit as st
+from google.cloud import bigquery
+
+from src.app.metrics import current_page
+from src.clients.bigquery_client import bq_client
+from src.clients.resilience import BigQueryUnavailable
+
+# How many query results are kept to fall back on when a page is over budget
+# or BigQuery is slow
+MAX_FALLBACKS = 64
+# How long a read waits for fresh results before serving the last ones
+STALE_AFTER_SECONDS = 3.0
+# How many dry-run estimates are kept, and for how long. A table's estimates
+# are dropped when this process writes it; the expiry catches other writers.
+MAX_ESTIMATES = 256
+ESTIMATE_TTL_SECONDS = 600.0
+
+
+@dataclass
+class QueryCost:
+    """
+    Running totals of what the queries for one (page, table) have cost
+    """
+
+    queries: int = 0
+    cache_hits: int = 0
+    bytes_processed: int = 0
+    bytes_billed: int = 0
+    slot_millis: int = 0
+    estimated_bytes: int = 0
+    fallbacks: int = 0
+
+
+@dataclass
+class RunSpend:
+    """
+    What the current page view has scanned, the tables it went over budget
+    for, and the tables it was shown stale data for while BigQuery was slow
+    """
+
+    bytes_processed: int = 0
+    over_budget: list[str] = field(default_factory=list)
+    stale: list[str] = field(default_factory=list)
+
+
+class QueryLedger:
+    """
+    Process-wide query costs, keyed by (page, table)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._costs: dict[tuple[str, str], QueryCost] = {}
+
+    def _cost(self, name: str) -> QueryCost:
+        return self._costs.setdefault((current_page.get(), name), QueryCost())
+
+    def record_job(self, job: bigquery.QueryJob, name: str):
+        """
+        Record the statistics of a finished query
+
+        Args:
+            job (bigquery.QueryJob): The finished query
+            name (str): What was queried (e.g. a table)
+        """
+        with self._lock:
+            cost = self._cost(name)
+            cost.queries += 1
+            cost.cache_hits += int(bool(job.cache_hit))
+            cost.bytes_processed += job.total_bytes_processed or 0
+            cost.bytes_billed += job.total_bytes_billed or 0
+            cost.slot_millis += job.slot_millis or 0
+
+    def record_estimate(self, name: str, estimated_bytes: int):
+        """
+        Record a dry-run estimate
+        """
+        with self._lock:
+            self._cost(name).estimated_bytes += estimated_bytes
+
+    def record_fallback(self, name: str):
+        """
+        Record a query that was skipped in favour of cached data
+        """
+        with self._lock:
+            self._cost(name).fallbacks += 1
+
+    def summary(self) -> list[dict]:
+        """
+        Get the totals for every (page, table)
+        """
+        with self._lock:
+            return [
+                {"page": page, "name": name, **vars(cost)}
+                for (page, name), cost in sorted(self._costs.items())
+            ]
+
+    def clear(self):
+        """
+        Forget all costs
+        """
+        with self._lock:
+            self._costs.clear()
+
+
+QUERY_COSTS = QueryLedger()
+
+# The spend of the page view being run, if it has a scan budget
+run_spend: ContextVar[RunSpend | None] = ContextVar("run_spend", default=None)
+# The tables served stale during the load being run, so it is not cached
+stale_reads: ContextVar[list[str] | None] = ContextVar("stale_reads", default=None)
+
+# Each query's estimate, with the table it reads and when it was made
+_estimates: OrderedDict[tuple, tuple[str, float, int]] = OrderedDict()
+_fallbacks: OrderedDict[tuple, pd.DataFrame] = OrderedDict()
+_refreshes: dict[tuple, Future] = {}
+_cache_lock = threading.Lock()
+_refresh_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="bigquery-refresh")
+
+
+def scan_budget_bytes() -> int | None:
+    """
+    Get the most bytes one page view may scan, or None if there is no budget
+    """
+    budget = st.secrets.get("scan_budget_bytes", None)
+    return int(budget) if budget is not None else None
+
+
+def scan_budget_action() -> str:
+    """
+    Get what happens when a page view goes over budget: "warn" runs the query
+    anyway, while "fallback" uses the last result of the same query if there is one
+    """
+    return st.secrets.get("scan_budget_action", "warn")
+
+
+@contextmanager
+def scan_budget():
+    """
+    Track the bytes scanned by the queries inside the block (one page view)
+
+    Yields:
+        RunSpend: The page view's spend
+    """
+    spend = RunSpend()
+    token = run_spend.set(spend)
+    try:
+        yield spend
+    finally:
+        run_spend.reset(token)
+
+
+def _query_key(sql: str, job_config: bigquery.QueryJobConfig) -> tuple:
+    parameters = tuple(
+        (parameter.name, parameter.value) for parameter in job_config.query_parameters
+    )
+    return sql, parameters
+
+
+def estimate_bytes(sql: str, job_config: bigquery.QueryJobConfig, name: str) -> int:
+    """
+    Estimate the bytes a query would scan with a (free) dry run. Estimates are
+    cached, as the same query is estimated each time it would run, until the
+    table is written or the estimate expires.
+
+    Args:
+        sql (str): The query
+        job_config (bigquery.QueryJobConfig): The query's config
+        name (str): What is being queried (e.g. a table)
+
+    Returns:
+        int: The estimated bytes processed
+    """
+    key = _query_key(sql, job_config)
+    with _cache_lock:
+        cached = _estimates.get(key)
+        if cached is not None and time.monotonic() - cached[1] < ESTIMATE_TTL_SECONDS:
+            _estimates.move_to_end(key)
+            return cached[2]
+
+    dry_run_config = bigquery.QueryJobConfig(
+        dry_run=True,
+        use_query_cache=False,
+        query_parameters=job_config.query_parameters,
+    )
+    job = bq_client().query(sql, job_config=dry_run_config)
+    estimate = job.total_bytes_processed or 0
+    with _cache_lock:
+        _estimates[key] = (name, time.monotonic(), estimate)
+        _estimates.move_to_end(key)
+        while len(_estimates) > MAX_ESTIMATES:
+            _estimates.popitem(last=False)
+    return estimate
+
+
+def forget_estimates(name: str):
+    """
+    Drop the estimates of the queries of a table, e.g. once it has been written
+    """
+    with _cache_lock:
+        for key in [key for key, (estimated, _, _) in _estimates.items() if estimated == name]:
+            del _estimates[key]
+
+
+def stale_after_seconds() -> float:
+    """
+    Get how long a read waits for fresh results before serving its last ones
+    """
+    return float(st.secrets.get("bigquery_stale_after_seconds", STALE_AFTER_SECONDS))
+
+
+def _fetch(sql: str, job_config: bigquery.QueryJobConfig, name: str, key: tuple) -> pd.DataFrame:
+    """
+    Run a query, record its cost and keep its result to fall back on
+    """
+    try:
+        job = bq_client().query(sql, job_config=job_config)
+        df = job.to_dataframe()
+        QUERY_COSTS.record_job(job, name)
+        spend = run_spend.get()
+        if spend is not None:
+            spend.bytes_processed += job.total_bytes_processed or 0
+
+        with _cache_lock:
+            _fallbacks[key] = df
+            _fallbacks.move_to_end(key)
+            while len(_fallbacks) > MAX_FALLBACKS:
+                _fallbacks.popitem(last=False)
+        return df
+    finally:
+        with _cache_lock:
+            _refreshes.pop(key, None)
+
+
+def _serve_stale(last_result: pd.DataFrame, name: str, slow: bool = True) -> pd.DataFrame:
+    """
+    Serve a query's last result in place of a fresh one, marked as stale so
+    it is never cached as the table's current rows or saved over the table.
+    Results served because BigQuery is slow (rather than to keep within the
+    scan budget, which is warned about separately) are warned about as such.
+    """
+    QUERY_COSTS.record_fallback(name)
+    spend = run_spend.get()
+    if spend is not None and slow:
+        spend.stale.append(name)
+    reads = stale_reads.get()
+    if reads is not None:
+        reads.append(name)
+    df = last_result.copy()
+    df.attrs["stale"] = True
+    return df
+
+
+def run_query(
+    sql: str, job_config: bigquery.QueryJobConfig, name: str, allow_stale: bool = True
+) -> pd.DataFrame:
+    """
+    Run a query, recording its cost. If the page view has a scan budget, the
+    query is dry-run first, and a query that would take the page over budget
+    either runs with a warning or falls back to its last result.
+
+    Once a query has a last result, reads stay quick while BigQuery is slow
+    or down: if fresh results do not arrive within a few seconds (or the
+    circuit breaker is open), the last result is served, marked stale in
+    its attrs, while the query carries on in the background to refresh it.
+    Reads that must be current (e.g. the rows a save rewrites the table
+    from) can refuse stale results.
+
+    Args:
+        sql (str): The query
+        job_config (bigquery.QueryJobConfig): The query's config
+        name (str): What is being queried (e.g. a table)
+        allow_stale (bool): Whether the last result may be served in place
+            of a fresh one
+
+    Returns:
+        pd.DataFrame: The query results
+
+    Raises:
+        BigQueryUnavailable: If BigQuery cannot be reached and there is no
+            last result to serve (or stale results are not allowed)
+    """
+    key = _query_key(sql, job_config)
+    if not allow_stale:
+        return _fetch(sql, job_config, name, key)
+    with _cache_lock:
+        last_result = _fallbacks.get(key)
+
+    spend = run_spend.get()
+    budget = scan_budget_bytes()
+    if spend is not None and budget is not None:
+        estimate = estimate_bytes(sql, job_config, name)
+        QUERY_COSTS.record_estimate(name, estimate)
+        if spend.bytes_processed + estimate > budget:
+            spend.over_budget.append(name)
+            if scan_budget_action() == "fallback" and last_result is not None:
+                return _serve_stale(last_result, name, slow=False)
+
+    if last_result is None:
+        return _fetch(sql, job_config, name, key)
+
+    # Refresh in the background, unless a refresh is already running, and
+    # wait a little for it either way
+    with _cache_lock:
+        refresh = _refreshes.get(key)
+        if refresh is None:
+            refresh = _refresh_pool.submit(
+                copy_context().run, _fetch, sql, job_config, name, key
+            )
+            _refreshes[key] = refresh
+    if bq_client().available():
+        try:
+            return refresh.result(timeout=stale_after_seconds())
+        except (FutureTimeout, BigQueryUnavailable):
+            pass
+    return _serve_stale(last_result, name)
@@ -0,0 +1,232 @@
+import random
+import threading
+import time
+from typing import Callable, TypeVar
+
+import streamlit as st
+from google.api_core.exceptions import (
+    BadGateway,
+    DeadlineExceeded,
+    InternalServerError,
+    ServiceUnavailable,
+    TooManyRequests,
+)
+from google.cloud import bigquery
+
+T = TypeVar("T")
+
+# Errors worth retrying: the backend (or the network to it) having a bad moment
+TRANSIENT_ERRORS = (
+    BadGateway,
+    DeadlineExceeded,
+    InternalServerError,
+    ServiceUnavailable,
+    TooManyRequests,
+    ConnectionError,
+    TimeoutError,
+)
+MAX_ATTEMPTS = 3
+BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 8.0
+# The breaker opens after this many failures in a row, and lets a trial call
+# through once it has been open this long
+FAILURE_THRESHOLD = 5
+RESET_SECONDS = 30.0
+
+
+class BigQueryUnavailable(Exception):
+    """
+    Raised when BigQuery cannot be reached in time: its calls kept failing or
+    timing out, or the circuit breaker is open after recent failures
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend that keeps failing, so pages fail (or fall back)
+    straight away instead of each waiting out its own timeouts. After a
+    cool-off one trial call is let through, and its outcome closes the
+    breaker again or reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_seconds: float = RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        """
+        "closed" (calls go through), "open" (calls are refused) or
+        "half-open" (a trial call may go through)
+        """
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may be made now
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def _setting(name: str, default: float) -> float:
+    return float(st.secrets.get(name, default))
+
+
+class ResilientClient:
+    """
+    Wraps a BigQuery client so every call has a deadline, transient failures
+    are retried with jittered exponential backoff, and a circuit breaker
+    stops calls while the backend is down. Jobs are waited on (within the
+    deadline) before they are returned. Anything not wrapped is passed
+    through to the client.
+    """
+
+    def __init__(self, client, breaker: CircuitBreaker | None = None):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker(
+            int(_setting("bigquery_failure_threshold", FAILURE_THRESHOLD)),
+            _setting("bigquery_reset_seconds", RESET_SECONDS),
+        )
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+    def available(self) -> bool:
+        """
+        Check whether calls would go through, without using up a trial call
+        """
+        return self.breaker.state != "open"
+
+    def call(self, func: Callable[[float], T], deadline: float | None = None, retry: bool = True) -> T:
+        """
+        Call the backend, retrying transient failures until the deadline
+
+        Args:
+            func (Callable[[float], T]): Makes the call, given the seconds left
+            deadline (float | None): The seconds allowed for every attempt and
+                wait (the bigquery_deadline_seconds secret, 60 by default)
+            retry (bool): Whether the call is safe to repeat
+
+        Returns:
+            T: The call's result
+
+        Raises:
+            BigQueryUnavailable: If the breaker is open, or the call still
+                fails or times out when the attempts or deadline run out
+        """
+        deadline = deadline if deadline is not None else _setting("bigquery_deadline_seconds", 60)
+        give_up_at = time.monotonic() + deadline
+        attempts = MAX_ATTEMPTS if retry else 1
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise BigQueryUnavailable("BigQuery is unavailable after repeated failures")
+            remaining = give_up_at - time.monotonic()
+            try:
+                result = func(remaining)
+            except TRANSIENT_ERRORS as e:
+                self.breaker.record_failure()
+                # Full jitter, so retrying sessions do not all come back at once
+                backoff = random.uniform(0, min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2**attempt))
+                if attempt == attempts - 1 or time.monotonic() + backoff >= give_up_at:
+                    raise BigQueryUnavailable(f"BigQuery call failed: {e}") from e
+                time.sleep(backoff)
+            except Exception:
+                # Anything else (a missing table, a bad query) is an answer
+                # from a working backend, and must not leave a trial running
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+        raise BigQueryUnavailable("BigQuery call ran out of attempts")
+
+    def query(self, query: str, job_config: bigquery.QueryJobConfig | None = None, deadline: float | None = None):
+        """
+        Run a query and wait for it to finish
+        """
+
+        def run(timeout: float):
+            job = self.client.query(query, job_config=job_config, timeout=timeout)
+            job.result(timeout=timeout)
+            return job
+
+        return self.call(run, deadline)
+
+    def get_table(self, table_id: str, deadline: float | None = None):
+        """
+        Get a table's metadata
+        """
+        return self.call(lambda timeout: self.client.get_table(table_id, timeout=timeout), deadline)
+
+    def create_table(self, table, exists_ok: bool = False, deadline: float | None = None):
+        """
+        Create a table
+        """
+        return self.call(
+            lambda timeout: self.client.create_table(table, exists_ok=exists_ok, timeout=timeout),
+            deadline,
+        )
+
+    def delete_table(self, table_id: str, not_found_ok: bool = False, deadline: float | None = None):
+        """
+        Delete a table
+        """
+        return self.call(
+            lambda timeout: self.client.delete_table(table_id, not_found_ok=not_found_ok, timeout=timeout),
+            deadline,
+        )
+
+    def load_table_from_dataframe(
+        self,
+        dataframe,
+        destination: str,
+        job_config: bigquery.LoadJobConfig | None = None,
+        deadline: float | None = None,
+    ):
+        """
+        Load a data frame into a table and wait for it to finish. Only loads
+        that overwrite the table are retried, as a repeated append could add
+        the rows twice.
+        """
+
+        def run(timeout: float):
+            job = self.client.load_table_from_dataframe(
+                dataframe, destination, job_config=job_config, timeout=timeout
+            )
+            job.result(timeout=timeout)
+            return job
+
+        disposition = job_config.write_disposition if job_config is not None else None
+        return self.call(run, deadline, retry=disposition == bigquery.WriteDisposition.WRITE_TRUNCATE)
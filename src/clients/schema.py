@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+
+import db_dtypes  # noqa: F401 (registers the dbdate and dbtime dtypes)
+import pandas as pd
+from google.cloud import bigquery
+
+# The dtype each BigQuery type is held in once read, matching to_dataframe
+DTYPES = {
+    "DATETIME": "datetime64[ns]",
+    "TIMESTAMP": "datetime64[ns, UTC]",
+    "DATE": "dbdate",
+    "TIME": "dbtime",
+    "INTEGER": "Int64",
+    "FLOAT": "float64",
+    "BOOLEAN": "boolean",
+    "STRING": "object",
+}
+
+
+class RecordError(ValueError):
+    """
+    Raised when rows do not match their table's columns
+    """
+
+
+@dataclass(frozen=True, slots=True)
+class Column:
+    """
+    One column of a table: its BigQuery type and mode, and the label it is
+    shown with
+    """
+
+    name: str
+    field_type: str
+    mode: str = "NULLABLE"
+    label: str | None = None
+
+    @property
+    def schema_field(self) -> bigquery.SchemaField:
+        """
+        The column's field in the table's storage schema
+        """
+        return bigquery.SchemaField(self.name, self.field_type, mode=self.mode)
+
+    @property
+    def dtype(self) -> str:
+        """
+        The dtype the column is held in (lists of values, if it is repeated)
+        """
+        return "object" if self.mode == "REPEATED" else DTYPES[self.field_type]
+
+    @property
+    def display_label(self) -> str:
+        """
+        The column's heading in tables, e.g. "Sleep Start Time"
+        """
+        return self.label or self.name.replace("_", " ").title()
+
+
+def coerce_column(values: pd.Series, column: Column) -> pd.Series:
+    """
+    Convert a column's values to its dtype. Values already of the dtype are
+    returned as they are.
+
+    Args:
+        values (pd.Series): The values
+        column (Column): The column they belong to
+
+    Returns:
+        pd.Series: The values, as the column's dtype
+
+    Raises:
+        ValueError, TypeError: If a value is not of the column's type
+    """
+    dtype = column.dtype
+    if str(values.dtype) == dtype and dtype != "object":
+        return values
+    if column.mode == "REPEATED":
+        return values
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(values, utc=dtype.endswith("UTC]")).astype(dtype)
+    if dtype == "dbdate":
+        return pd.to_datetime(values).dt.date.astype(dtype)
+    if dtype == "dbtime":
+        return values.astype(object).where(values.notna(), None).astype(dtype)
+    if dtype in ["Int64", "float64"]:
+        return pd.to_numeric(values).astype(dtype)
+    if dtype == "object":
+        return values.astype(object).where(values.notna(), None)
+    return values.astype(dtype)
+
+
+def coerce_frame(df: pd.DataFrame, columns: tuple[Column, ...]) -> pd.DataFrame:
+    """
+    Convert each of a table's columns in a frame to its dtype, once, as the
+    rows are read. Other columns are left as they are.
+
+    Args:
+        df (pd.DataFrame): The rows
+        columns (tuple[Column, ...]): The table's columns
+
+    Returns:
+        pd.DataFrame: The rows, with their columns typed
+    """
+    typed = {
+        column.name: coerce_column(df[column.name], column)
+        for column in columns
+        if column.name in df.columns
+    }
+    return df.assign(**typed) if typed else df
+
+
+def validate_frame(df: pd.DataFrame, columns: tuple[Column, ...]) -> pd.DataFrame:
+    """
+    Check rows against a table's columns, before they are written: every
+    column must be known, every value must be of its column's type, and
+    required columns must be filled. Missing optional columns are left empty.
+
+    Args:
+        df (pd.DataFrame): The rows
+        columns (tuple[Column, ...]): The table's columns
+
+    Returns:
+        pd.DataFrame: The typed rows, with the table's columns in order
+
+    Raises:
+        RecordError: If the rows do not match the columns
+    """
+    names = [column.name for column in columns]
+    errors = [f"Unknown column {name!r}" for name in df.columns if name not in names]
+    df = df.reset_index(drop=True)
+    rows = {}
+    for column in columns:
+        values = (
+            df[column.name]
+            if column.name in df.columns
+            else pd.Series([None] * len(df), dtype=object)
+        )
+        try:
+            rows[column.name] = coerce_column(values, column)
+        except (ValueError, TypeError):
+            errors.append(f"{column.display_label} must be a {column.field_type.lower()}")
+            continue
+        if column.mode == "REQUIRED" and rows[column.name].isna().any():
+            errors.append(f"{column.display_label} is required")
+    if errors:
+        raise RecordError("; ".join(errors))
+    return pd.DataFrame(rows, index=df.index)
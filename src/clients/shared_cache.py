@@ -0,0 +1,286 @@
+import hashlib
+import pickle
+import socket
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from multiprocessing import AuthenticationError
+from multiprocessing.managers import BaseManager
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+# How much the cache process holds unless told otherwise
+DEFAULT_MAX_MB = 1024
+# How long a replica waits to reach the cache process before going without it
+CONNECT_TIMEOUT_SECONDS = 1.0
+# How long a replica goes without the cache after failing to reach it
+RETRY_SECONDS = 30.0
+
+
+class SharedStore:
+    """
+    The key-value store behind the shared cache, which lives in its own
+    process. Values are bytes, keyed "<table>/<kind>/<...>", and the least
+    recently used are evicted once the store is over its size limit. Each
+    table also has a generation, bumped whenever it is written, which every
+    replica folds into its own cache keys. Generations restart from 0 with
+    the process, so they are given with when it started.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.started = time.time_ns()
+        self._lock = threading.Lock()
+        self._values: OrderedDict[str, bytes] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            value = self._values.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._values.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: bytes):
+        with self._lock:
+            old = self._values.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._values[key] = value
+            self.nbytes += len(value)
+            while self.nbytes > self.max_bytes and len(self._values) > 1:
+                _, evicted = self._values.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.evictions += 1
+
+    def generation(self, table: str) -> tuple[int, int]:
+        """
+        Get when the store started and how many times a table has been
+        written since, so generations from before a restart never match
+        """
+        with self._lock:
+            return self.started, self._generations.get(table, 0)
+
+    def invalidate(self, table: str) -> int:
+        """
+        Drop everything cached for a table and bump its generation
+        """
+        with self._lock:
+            for key in [key for key in self._values if key.startswith(f"{table}/")]:
+                self.nbytes -= len(self._values.pop(key))
+            self._generations[table] = self._generations.get(table, 0) + 1
+            return self._generations[table]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._values),
+                "size_mb": round(self.nbytes / 1e6, 2),
+                "max_mb": round(self.max_bytes / 1e6, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "generations": dict(self._generations),
+            }
+
+
+class SharedCacheManager(BaseManager):
+    """
+    Serves (or connects to) the shared store over a socket
+    """
+
+
+SharedCacheManager.register("store")
+
+
+def _address(address: str) -> tuple[str, int]:
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def serve(address: str, authkey: str, max_mb: float = DEFAULT_MAX_MB):
+    """
+    Run the shared cache process until it is stopped
+
+    Args:
+        address (str): The host:port to listen on
+        authkey (str): The key replicas must present to connect
+        max_mb (float): The most the store holds before evicting
+    """
+    store = SharedStore(int(max_mb * 1e6))
+    SharedCacheManager.register("store", callable=lambda: store)
+    manager = SharedCacheManager(address=_address(address), authkey=authkey.encode())
+    manager.get_server().serve_forever()
+
+
+# When this process may next try to reach the shared store, after failing to
+_retry_at = 0.0
+
+
+@st.cache_resource(show_spinner=False)
+def _connect(address: str, authkey: str):
+    # The manager waits on the socket indefinitely, so check it can be reached first
+    socket.create_connection(_address(address), timeout=CONNECT_TIMEOUT_SECONDS).close()
+    manager = SharedCacheManager(address=_address(address), authkey=authkey.encode())
+    manager.connect()
+    return manager.store()
+
+
+def _unreachable():
+    """
+    Go without the shared store for a while, rather than every session
+    waiting on it again straight away
+    """
+    global _retry_at
+    _connect.clear()
+    _retry_at = time.monotonic() + RETRY_SECONDS
+
+
+def shared_store():
+    """
+    Get this process's handle on the shared store, or None if no shared cache
+    is configured (the shared_cache_address secret) or it cannot be reached,
+    in which case the app carries on with its own caches (and tries again
+    after RETRY_SECONDS)
+
+    Returns:
+        The store proxy, or None
+
+    Raises:
+        ValueError: If the shared_cache_authkey secret is not set with the address
+    """
+    address = st.secrets.get("shared_cache_address", None)
+    if address is None:
+        return None
+    authkey = st.secrets.get("shared_cache_authkey", None)
+    if not authkey:
+        # The store unpickles what it is sent, so it must never be reachable with a known key
+        raise ValueError("The shared_cache_authkey secret must be set with shared_cache_address")
+    if time.monotonic() < _retry_at:
+        return None
+    try:
+        return _connect(address, authkey)
+    except (OSError, EOFError, AuthenticationError):
+        _unreachable()
+        return None
+
+
+def _call(method: str, *args):
+    """
+    Call the shared store, treating a lost connection as a miss (and
+    reconnecting once RETRY_SECONDS have passed)
+    """
+    store = shared_store()
+    if store is None:
+        return None
+    try:
+        return getattr(store, method)(*args)
+    except (OSError, EOFError):
+        _unreachable()
+        return None
+
+
+def table_generation(table: str) -> tuple[int, int] | None:
+    """
+    Get when the shared cache started and how many times a table has been
+    written through it since, or None if there is no shared cache
+    """
+    return _call("generation", table)
+
+
+def broadcast_write(table: str):
+    """
+    Tell every replica a table has changed: its cached windows are dropped and
+    its generation bumped, so their data caches miss and reload it
+    """
+    _call("invalidate", table)
+
+
+def _window(start: date | None, end: date | None) -> str:
+    return f"{start or 'start'}_{end or 'end'}"
+
+
+def read_shared_frame(
+    table: str, start: date | None, end: date | None, version: str
+) -> pd.DataFrame | None:
+    """
+    Read a window of a table from the shared cache, if another replica
+    cached it at the table's current version
+
+    Args:
+        table (str): The table name
+        start (date | None): The first day of the window
+        end (date | None): The last day of the window
+        version (str): The table's current version
+
+    Returns:
+        pd.DataFrame | None: The rows, or None on a miss
+    """
+    value = _call("get", f"{table}/frame/{_window(start, end)}/{version}")
+    if value is None:
+        return None
+    return pa.ipc.open_stream(value).read_all().to_pandas()
+
+
+def write_shared_frame(
+    table: str, start: date | None, end: date | None, version: str, df: pd.DataFrame
+):
+    """
+    Share a window of a table with the other replicas, as Arrow IPC bytes
+
+    Args:
+        table (str): The table name
+        start (date | None): The first day of the window
+        end (date | None): The last day of the window
+        version (str): The table's version when the rows were read
+        df (pd.DataFrame): The rows
+    """
+    if shared_store() is None:
+        return
+    table_arrow = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table_arrow.schema) as writer:
+        writer.write_table(table_arrow)
+    _call("put", f"{table}/frame/{_window(start, end)}/{version}", sink.getvalue().to_pybytes())
+
+
+def chart_key(name: str, args: tuple) -> str:
+    """
+    Key a rendered chart by its name and a hash of what identifies the data
+    it was drawn from, so any replica drawing the same chart of the same
+    data shares it
+    """
+    digest = hashlib.sha256(pickle.dumps(args, protocol=5)).hexdigest()[:32]
+    return f"charts/{name}/{digest}"
+
+
+def read_shared_chart(key: str) -> bytes | None:
+    """
+    Get a rendered chart's PNG from the shared cache, or None on a miss
+    """
+    return _call("get", key)
+
+
+def write_shared_chart(key: str, png: bytes):
+    """
+    Share a rendered chart's PNG with the other replicas
+    """
+    _call("put", key, png)
+
+
+def shared_cache_stats() -> dict | None:
+    """
+    Get the shared store's size and hit, miss and eviction counts, or None
+    if there is no shared cache
+    """
+    return _call("stats")
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+if TYPE_CHECKING:
+    from src.clients.tables import TableLayout
+
+MANIFEST = "manifest.json"
+# Where rows with no date go
+NULL_PARTITION = "null"
+
+
+@dataclass
+class SnapshotSummary:
+    """
+    What a snapshot export wrote
+    """
+
+    written: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    rows: int = 0
+
+
+def snapshot_dir() -> Path:
+    """
+    Get the directory snapshots are kept in
+    """
+    return Path(st.secrets.get("snapshot_dir", "snapshots"))
+
+
+def warm_start_enabled() -> bool:
+    """
+    Check whether reads may be served from a current snapshot
+    """
+    return bool(st.secrets.get("snapshot_warm_start", False))
+
+
+def _table_dir(layout: "TableLayout") -> Path:
+    return snapshot_dir() / layout.name
+
+
+def _partition_path(layout: "TableLayout", partition: str) -> Path:
+    return _table_dir(layout) / f"{partition}.parquet"
+
+
+def _modified(table_modified: datetime | None) -> str | None:
+    return table_modified.astimezone(timezone.utc).isoformat() if table_modified else None
+
+
+def read_manifest(layout: "TableLayout") -> dict | None:
+    """
+    Get a table's snapshot manifest, or None if it has no snapshot
+    """
+    path = _table_dir(layout) / MANIFEST
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _partition_hash(rows: pd.DataFrame) -> str:
+    """
+    Hash a partition's rows, ignoring their order, to tell if it has changed
+    """
+    hashable = rows.apply(
+        lambda column: column.map(
+            lambda value: str(list(value)) if isinstance(value, (list, np.ndarray)) else value
+        )
+        if column.dtype == object
+        else column
+    )
+    row_hashes = np.sort(pd.util.hash_pandas_object(hashable, index=False).to_numpy())
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def export_snapshot(
+    layout: "TableLayout", df: pd.DataFrame, table_modified: datetime | None
+) -> SnapshotSummary:
+    """
+    Write a table to zstd-compressed Parquet files, one per day of its
+    event date, rewriting only the days whose rows have changed since the
+    last snapshot and deleting days that no longer have rows
+
+    Args:
+        layout (TableLayout): The table being exported
+        df (pd.DataFrame): The table's full contents
+        table_modified (datetime | None): When the table was last modified,
+            read before its contents were
+
+    Returns:
+        SnapshotSummary: How many days were written, unchanged and deleted
+    """
+    table_dir = _table_dir(layout)
+    table_dir.mkdir(parents=True, exist_ok=True)
+    previous = (read_manifest(layout) or {}).get("partitions", {})
+
+    days = pd.to_datetime(df[layout.date_column]).dt.strftime("%Y-%m-%d").fillna(NULL_PARTITION)
+    summary = SnapshotSummary(rows=len(df))
+    partitions = {}
+    for partition, rows in df.groupby(days, sort=True):
+        digest = _partition_hash(rows)
+        partitions[partition] = {"hash": digest, "rows": len(rows)}
+        if previous.get(partition, {}).get("hash") == digest:
+            summary.unchanged += 1
+            continue
+        temp_path = table_dir / f"{partition}.parquet.tmp"
+        rows.to_parquet(temp_path, compression="zstd", index=False)
+        os.replace(temp_path, _partition_path(layout, partition))
+        summary.written += 1
+
+    for partition in set(previous) - set(partitions):
+        _partition_path(layout, partition).unlink(missing_ok=True)
+        summary.deleted += 1
+
+    manifest = {
+        "table_id": layout.table_id,
+        "table_modified": _modified(table_modified),
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "num_rows": len(df),
+        "partitions": partitions,
+    }
+    temp_path = table_dir / f"{MANIFEST}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, table_dir / MANIFEST)
+    return summary
+
+
+def read_snapshot(
+    layout: "TableLayout",
+    start: date | None,
+    end: date | None,
+    table_modified: datetime | None,
+) -> pd.DataFrame | None:
+    """
+    Read the rows whose event date falls in [start, end] from a table's
+    snapshot, if the snapshot is of the table as it is now. As with a query,
+    reading the whole table also reads the rows with no date.
+
+    Args:
+        layout (TableLayout): The table to read
+        start (date | None): The first day to read (defaults to all history)
+        end (date | None): The last day to read (defaults to no upper bound)
+        table_modified (datetime | None): When the table was last modified
+
+    Returns:
+        pd.DataFrame | None: The rows, or None if there is no current snapshot
+    """
+    manifest = read_manifest(layout)
+    if manifest is None or table_modified is None:
+        return None
+    if manifest["table_modified"] != _modified(table_modified):
+        return None
+
+    first = start.isoformat() if start is not None else ""
+    last = end.isoformat() if end is not None else "9999-12-31"
+    whole_table = start is None and end is None
+    partitions = [
+        partition
+        for partition in manifest["partitions"]
+        if (whole_table if partition == NULL_PARTITION else first <= partition <= last)
+    ]
+    if not partitions:
+        # Take the (typed) columns from any day, or let the table be queried
+        if not manifest["partitions"]:
+            return None
+        any_partition = next(iter(manifest["partitions"]))
+        return pd.read_parquet(_partition_path(layout, any_partition)).iloc[0:0]
+    return pd.concat(
+        [pd.read_parquet(_partition_path(layout, partition)) for partition in partitions],
+        ignore_index=True,
+    )
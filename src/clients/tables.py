@@ -0,0 +1,430 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+import streamlit as st
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from src.app.metrics import timed
+from src.clients.bigquery_client import bq_client
+from src.clients.disk_cache import disk_cache_dir, read_disk_cache, table_version, write_disk_cache
+from src.clients.query_costs import QUERY_COSTS, forget_estimates, run_query
+from src.clients.resilience import BigQueryUnavailable
+from src.clients.schema import Column, coerce_frame, validate_frame
+from src.clients.shared_cache import (
+    broadcast_write,
+    read_shared_frame,
+    shared_store,
+    write_shared_frame,
+)
+from src.clients.snapshots import read_snapshot, warm_start_enabled
+
+# The lower bound used when reading "all" history, so every read still prunes.
+# This is not date.min, whose four-digit year the client cannot serialise
+EARLIEST_DATE = date(1970, 1, 1)
+
+
+@dataclass(frozen=True)
+class TableLayout:
+    """
+    The managed layout of a table: its columns, partitioned by day on its
+    event date, clustered on the columns that are commonly filtered, and
+    requiring a date predicate on every query. The columns define the
+    storage schema, the dtypes rows are read into, the checks new rows must
+    pass and the labels the table is shown with.
+    """
+
+    table_id: str
+    date_column: str
+    date_type: str  # "DATE" or "DATETIME"
+    cluster_fields: tuple[str, ...]
+    columns: tuple[Column, ...] = field(default=(), hash=False)
+    # The columns that identify a record, for spotting duplicates
+    key_fields: tuple[str, ...] = ()
+    # Whether every query must filter on the date column, whether the table
+    # is created (see table) or rebuilt by its layout migration
+    require_partition_filter: bool = True
+
+    @property
+    def name(self) -> str:
+        """
+        The table name, without its project and dataset
+        """
+        return self.table_id.split(".")[-1]
+
+    @property
+    def time_partitioning(self) -> bigquery.TimePartitioning:
+        """
+        Daily partitions on the event date
+        """
+        return bigquery.TimePartitioning(
+            type_=bigquery.TimePartitioningType.DAY, field=self.date_column
+        )
+
+    def table(self) -> bigquery.Table:
+        """
+        The table as it is created, with its schema, partitioning, clustering
+        and partition filter
+        """
+        table = bigquery.Table(self.table_id, schema=list(self.schema))
+        table.time_partitioning = self.time_partitioning
+        table.clustering_fields = list(self.cluster_fields)
+        table.require_partition_filter = self.require_partition_filter
+        return table
+
+    @property
+    def schema(self) -> tuple[bigquery.SchemaField, ...]:
+        """
+        The table's storage schema
+        """
+        return tuple(column.schema_field for column in self.columns)
+
+    @property
+    def dtypes(self) -> dict[str, str]:
+        """
+        The dtype each column is read into
+        """
+        return {column.name: column.dtype for column in self.columns}
+
+    def coerce(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Type rows as they are read, so nothing downstream has to
+        """
+        return coerce_frame(df, self.columns)
+
+    def validate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Check and type rows before they are written (see validate_frame)
+        """
+        return validate_frame(df, self.columns)
+
+    def record(self, **values) -> pd.DataFrame:
+        """
+        Make a new row from its column values, checked and typed
+
+        Raises:
+            RecordError: If a value is unknown, of the wrong type or missing
+                but required
+        """
+        return self.validate(pd.DataFrame({name: [value] for name, value in values.items()}))
+
+    def labelled(self, df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+        """
+        Some of the table's columns, headed by their labels and numbered from 1, for display
+        """
+        labels = {column.name: column.display_label for column in self.columns}
+        df = df[columns].rename(columns=labels).reset_index(drop=True)
+        df.index += 1
+        return df
+
+
+SLEEPING_TABLE = TableLayout(
+    table_id="archie-baby-app.baby_app.sleeping",
+    date_column="sleep_start_time",
+    date_type="DATETIME",
+    cluster_fields=("sleep_type", "sleep_location"),
+    columns=(
+        Column("sleep_start_time", "DATETIME"),
+        Column("sleep_end_time", "DATETIME"),
+        Column("time_to_settle", "INTEGER", label="Time To Settle (Mins)"),
+        Column("sleep_location", "STRING"),
+        Column("temporary_wake_up_times", "DATETIME", mode="REPEATED"),
+        Column("settling_techniques", "STRING", mode="REPEATED"),
+        Column("sleep_id", "INTEGER"),
+        # Backfilled by migration 1, so every sleep has a type
+        Column("sleep_type", "STRING", mode="REQUIRED"),
+    ),
+    key_fields=("sleep_start_time",),
+)
+DRINKING_TABLE = TableLayout(
+    table_id="archie-baby-app.baby_app.drinking_refactored",
+    date_column="feed_date",
+    date_type="DATETIME",
+    cluster_fields=("bottle_fed", "start_side"),
+    columns=(
+        Column("feed_date", "DATETIME"),
+        Column("breastfeed_duration", "FLOAT", label="Breastfeed Duration (Mins)"),
+        Column("start_side", "STRING"),
+        Column("start_side_time", "FLOAT", label="Start Side Time (Mins)"),
+        Column("bottle_fed", "BOOLEAN"),
+        Column("bottle_quantity", "FLOAT", label="Bottle Quantity (ml)"),
+    ),
+    key_fields=("feed_date",),
+)
+PUMPING_TABLE = TableLayout(
+    table_id="archie-baby-app.baby_app.pumping",
+    date_column="pump_date",
+    date_type="DATETIME",
+    # Pumping is only ever filtered by time, so cluster within each day on it
+    cluster_fields=("pump_date",),
+    columns=(
+        Column("pump_date", "DATETIME"),
+        Column("left_volume", "FLOAT", label="Left Volume (ml)"),
+        Column("right_volume", "FLOAT", label="Right Volume (ml)"),
+    ),
+    key_fields=("pump_date",),
+)
+NAPPY_TABLE = TableLayout(
+    table_id="archie-baby-app.baby_app.nappies",
+    date_column="nappy_date",
+    date_type="DATE",
+    cluster_fields=("nappy_changer", "contains_poo"),
+    columns=(
+        Column("nappy_date", "DATE"),
+        Column("nappy_time", "TIME"),
+        Column("nappy_changer", "STRING"),
+        Column("contains_wee", "BOOLEAN"),
+        Column("contains_poo", "BOOLEAN"),
+        Column("poo_colour", "STRING"),
+        Column("notes", "STRING"),
+    ),
+    key_fields=("nappy_date", "nappy_time"),
+)
+TABLES = {
+    table.table_id: table
+    for table in [SLEEPING_TABLE, DRINKING_TABLE, PUMPING_TABLE, NAPPY_TABLE]
+}
+
+
+@st.cache_resource(show_spinner=False)
+def ensure_table(table_id: str) -> bigquery.Table:
+    """
+    Create a table, empty and with its managed layout, if it does not exist
+    yet. Tables that exist are left as they are: only their migrations
+    change them. This runs once per process for each table.
+
+    Args:
+        table_id (str): The table to check
+
+    Returns:
+        bigquery.Table: The table
+    """
+    client = bq_client()
+    try:
+        return client.get_table(table_id)
+    except NotFound:
+        return client.create_table(TABLES[table_id].table())
+
+
+def date_bound(layout: TableLayout, day: date, name: str) -> bigquery.ScalarQueryParameter:
+    """
+    A query parameter for the start of a day, typed to match the date column
+    """
+    if layout.date_type == "DATE":
+        return bigquery.ScalarQueryParameter(name, "DATE", day)
+    return bigquery.ScalarQueryParameter(name, "DATETIME", datetime.combine(day, time.min))
+
+
+def date_filter(
+    layout: TableLayout, start: date | None, end: date | None
+) -> tuple[str, list[bigquery.ScalarQueryParameter]]:
+    """
+    The WHERE clause (and its parameters) picking the rows whose event date
+    falls in [start, end]. It always bounds the date column, so only the
+    partitions in the window are scanned. Reading the whole table (no start
+    or end) also picks the rows with no date, so rewriting the table from
+    what was read keeps them.
+
+    Args:
+        layout (TableLayout): The table being read
+        start (date | None): The first day to read (defaults to all history)
+        end (date | None): The last day to read (defaults to no upper bound)
+
+    Returns:
+        tuple[str, list[bigquery.ScalarQueryParameter]]: The clause and its parameters
+    """
+    column = layout.date_column
+    if start is None and end is None:
+        return (
+            f"({column} >= @start OR {column} IS NULL)",
+            [date_bound(layout, EARLIEST_DATE, "start")],
+        )
+    predicates = [f"{column} >= @start"]
+    parameters = [date_bound(layout, start or EARLIEST_DATE, "start")]
+    if end is not None:
+        predicates.append(f"{column} < @end")
+        parameters.append(date_bound(layout, end + timedelta(days=1), "end"))
+    return " AND ".join(predicates), parameters
+
+
+def read_table(
+    layout: TableLayout,
+    start: date | None = None,
+    end: date | None = None,
+    allow_stale: bool = True,
+) -> pd.DataFrame:
+    """
+    Read the rows of a table whose event date falls in [start, end]. The query
+    always carries a predicate on the partitioning column, so only the
+    partitions in the window are scanned. When the table has not changed
+    since, the rows come from the on-disk cache (if configured), the cache
+    shared between replicas (if configured), or else the local snapshot (with
+    warm starts enabled), instead. Wherever they come from, the rows are typed
+    by the table's columns here, so pages can use them as they are. Reading
+    the whole table also reads any rows with no date (see date_filter).
+
+    Args:
+        layout (TableLayout): The table to read
+        start (date | None): The first day to read (defaults to all history)
+        end (date | None): The last day to read (defaults to no upper bound)
+        allow_stale (bool): Whether the query's last result may be served
+            while BigQuery is slow (see run_query). Reads that a save rewrites
+            the table from must not allow it.
+
+    Returns:
+        pd.DataFrame: The rows in the window
+
+    Raises:
+        BigQueryUnavailable: If BigQuery cannot be reached (and, if allowed,
+            there is no last result to serve)
+    """
+    return layout.coerce(_read_table(layout, start, end, allow_stale))
+
+
+def _read_table(
+    layout: TableLayout, start: date | None, end: date | None, allow_stale: bool
+) -> pd.DataFrame:
+    ensure_table(layout.table_id)
+    table = None
+    shared = shared_store() is not None
+    if disk_cache_dir() is not None or shared or warm_start_enabled():
+        with timed("metadata", layout.name):
+            table = bq_client().get_table(layout.table_id)
+
+    # Serve the window from disk if it was cached at the table's current version
+    if disk_cache_dir() is not None:
+        with timed("disk_cache", layout.name):
+            cached = read_disk_cache(layout.name, start, end, table_version(table))
+        if cached is not None:
+            return cached
+
+    # Or from another replica that has already read it
+    if shared:
+        with timed("shared_cache", layout.name):
+            cached = read_shared_frame(layout.name, start, end, table_version(table))
+        if cached is not None:
+            write_disk_cache(layout.name, start, end, table_version(table), cached)
+            return cached
+
+    df = None
+    if warm_start_enabled():
+        with timed("snapshot", layout.name):
+            df = read_snapshot(layout, start, end, table.modified)
+
+    if df is None:
+        where, parameters = date_filter(layout, start, end)
+        job_config = bigquery.QueryJobConfig(query_parameters=parameters)
+        with timed("fetch", layout.name):
+            df = run_query(
+                f"SELECT * FROM `{layout.table_id}` WHERE {where}",
+                job_config,
+                layout.name,
+                allow_stale,
+            )
+
+    # A stale result is not the table as of its current version
+    if df.attrs.get("stale"):
+        return df
+    if table is not None:
+        write_disk_cache(layout.name, start, end, table_version(table), df)
+    if shared:
+        write_shared_frame(layout.name, start, end, table_version(table), df)
+    return df
+
+
+def read_full_table(layout: TableLayout) -> pd.DataFrame:
+    """
+    Read every row of a table, to build the full table a save overwrites it
+    with. This is read fresh rather than from any cache, and never from a
+    stale result, so a save cannot drop rows written since.
+
+    Args:
+        layout (TableLayout): The table to read
+
+    Returns:
+        pd.DataFrame: Every row of the table
+
+    Raises:
+        BigQueryUnavailable: If BigQuery cannot be reached in time
+    """
+    return read_table(layout, allow_stale=False)
+
+
+def table_length(layout: TableLayout) -> int:
+    """
+    Get the number of rows in a table from its metadata, which scans nothing
+    """
+    with timed("metadata", layout.name):
+        return bq_client().get_table(layout.table_id).num_rows
+
+
+def _refuse_stale(layout: TableLayout, df: pd.DataFrame):
+    """
+    Refuse to write rows built from a stale read, which would drop any rows
+    written since
+    """
+    if df.attrs.get("stale"):
+        raise BigQueryUnavailable(f"Refusing to write {layout.name} from a stale read")
+
+
+def write_table(layout: TableLayout, df: pd.DataFrame):
+    """
+    Overwrite a table, keeping its managed partitioning and clustering, and
+    tell the other replicas it has changed
+
+    Args:
+        layout (TableLayout): The table to write
+        df (pd.DataFrame): The full table contents
+
+    Raises:
+        RecordError: If the rows do not match the table's columns
+        BigQueryUnavailable: If the rows were built from a stale read
+    """
+    _refuse_stale(layout, df)
+    df = layout.validate(df)
+    ensure_table(layout.table_id)
+    job_config = bigquery.LoadJobConfig(
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        schema=list(layout.schema),
+        time_partitioning=layout.time_partitioning,
+        clustering_fields=list(layout.cluster_fields),
+    )
+    with timed("save", layout.name):
+        job = bq_client().load_table_from_dataframe(
+            df, layout.table_id, job_config=job_config
+        )
+        job.result()  # Wait for the job to complete
+    forget_estimates(layout.name)
+    broadcast_write(layout.name)
+
+
+def append_table(layout: TableLayout, df: pd.DataFrame):
+    """
+    Append rows to a table in a single load job, keeping its managed
+    partitioning and clustering, and tell the other replicas it has changed
+
+    Args:
+        layout (TableLayout): The table to append to
+        df (pd.DataFrame): The new rows
+
+    Raises:
+        RecordError: If the rows do not match the table's columns
+        BigQueryUnavailable: If the rows were built from a stale read
+    """
+    _refuse_stale(layout, df)
+    df = layout.validate(df)
+    ensure_table(layout.table_id)
+    job_config = bigquery.LoadJobConfig(
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        schema=list(layout.schema),
+        time_partitioning=layout.time_partitioning,
+        clustering_fields=list(layout.cluster_fields),
+    )
+    with timed("save", layout.name):
+        job = bq_client().load_table_from_dataframe(
+            df, layout.table_id, job_config=job_config
+        )
+        job.result()  # Wait for the job to complete
+    forget_estimates(layout.name)
+    broadcast_write(layout.name)
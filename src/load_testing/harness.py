@@ -0,0 +1,195 @@
+import resource
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.secrets import Secrets
+from streamlit.testing.v1 import AppTest
+
+from src.app.metrics import METRICS
+
+# The app as run by each simulated session, against synthetic data
+APP_SCRIPT = """
+from src.app.run_app import run_app
+from src.load_testing.synthetic_data import seed_tables
+
+seed_tables()
+run_app()
+"""
+PASSWORD = "load-test"
+
+
+@dataclass
+class SessionResult:
+    """
+    What one simulated session saw
+    """
+
+    rerun_seconds: list[float] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    rejected_saves: int = 0
+
+
+def _rss_mb() -> float:
+    """
+    Get the process's resident memory, falling back to its peak where the
+    current value is not available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1e6
+    except OSError:
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+def _run(at: AppTest, result: SessionResult, action: str):
+    """
+    Rerun the app, recording how long it took and anything that went wrong
+    """
+    start = time.perf_counter()
+    at.run()
+    result.rerun_seconds.append(time.perf_counter() - start)
+    result.errors += [f"{action}: {exception.message}" for exception in at.exception]
+    result.rejected_saves += sum("Unable to save" in toast.value for toast in at.toast)
+
+
+def _button(at: AppTest, label: str):
+    return next(button for button in at.button if button.label == label)
+
+
+def walk_session(rounds: int, result: SessionResult) -> Iterator[None]:
+    """
+    Drive one caregiver's session through the app: visit every page and
+    submit its form, and change the sleep timeline's range. This pauses
+    after each rerun so sessions can be interleaved.
+
+    Args:
+        rounds (int): How many times to repeat the walk through the pages
+        result (SessionResult): Where the session's rerun times and errors go
+    """
+    at = AppTest.from_string(APP_SCRIPT, default_timeout=300)
+    at.query_params["password"] = PASSWORD
+    _run(at, result, "open")
+    yield
+
+    for _ in range(rounds):
+        at.sidebar.selectbox[0].set_value("Sleeping")
+        _run(at, result, "switch to sleeping")
+        yield
+        _button(at, "Log Nap").click()
+        _run(at, result, "log nap")
+        yield
+        at.date_input(key="timeline_range").set_value(
+            (date.today() - timedelta(days=60), date.today())
+        )
+        _run(at, result, "widen timeline")
+        yield
+
+        at.sidebar.selectbox[0].set_value("Drinking")
+        _run(at, result, "switch to drinking")
+        yield
+        _button(at, "Add Drink!").click()
+        _run(at, result, "add drink")
+        yield
+
+        at.sidebar.selectbox[0].set_value("Pumping")
+        _run(at, result, "switch to pumping")
+        yield
+        next(n for n in at.number_input if n.label.startswith("Left")).set_value(50)
+        _button(at, "Add Session!").click()
+        _run(at, result, "add pumping session")
+        yield
+
+        at.sidebar.selectbox[0].set_value("Bowels")
+        _run(at, result, "switch to bowels")
+        yield
+        _button(at, "Upload Nappy").click()
+        _run(at, result, "upload nappy")
+        yield
+
+
+def _cache_hit_rate() -> float:
+    """
+    Get the share of history slices served from the data cache rather than
+    fetched, since the metrics were last cleared
+    """
+    counts = {
+        operation: sum(row["count"] for row in METRICS.summary() if row["operation"] == operation)
+        for operation in ["slice", "fetch"]
+    }
+    if counts["slice"] == 0:
+        return float("nan")
+    return 1 - counts["fetch"] / counts["slice"]
+
+
+def run_load_test(
+    session_counts: list[int], rounds: int = 1, latency_seconds: float = 0.05
+) -> pd.DataFrame:
+    """
+    Run increasing numbers of simultaneous sessions against the app in this
+    process (as one Streamlit server would), sharing its caches
+
+    Args:
+        session_counts (list[int]): The numbers of concurrent sessions to try
+        rounds (int): How many times each session walks through the pages
+        latency_seconds (float): The fake BigQuery latency per call
+
+    Returns:
+        pd.DataFrame: For each session count, the rerun latency percentiles,
+            memory growth, cache hit rate, rejected saves and errors
+    """
+    # AppTest would swap the global secrets around each run if given its
+    # own, so every session shares these instead
+    saved_secrets = st.secrets
+    st.secrets = Secrets()
+    st.secrets._secrets = {
+        "password": PASSWORD,
+        "bigquery_backend": "fake",
+        "fake_bigquery_latency_seconds": latency_seconds,
+    }
+    try:
+        return pd.DataFrame(
+            [_run_sessions(sessions, rounds) for sessions in session_counts]
+        ).round(2)
+    finally:
+        st.secrets = saved_secrets
+
+
+def _run_sessions(sessions: int, rounds: int) -> dict:
+    """
+    Run sessions side by side and summarise how the app coped. AppTest can
+    only run one script at a time in a process (it tears down the global
+    runtime after each run), so the sessions' reruns are interleaved rather
+    than run in parallel threads. They still share the process's caches and
+    backend, like sessions on one server.
+    """
+    METRICS.clear()
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    results = [SessionResult() for _ in range(sessions)]
+    walks = [walk_session(rounds, result) for result in results]
+    while walks:
+        walks = [walk for walk in walks if next(walk, StopIteration) is not StopIteration]
+    elapsed = time.perf_counter() - start
+
+    reruns = np.concatenate([result.rerun_seconds for result in results])
+    errors = [error for result in results for error in result.errors]
+    return {
+        "sessions": sessions,
+        "reruns": len(reruns),
+        "p50_ms": np.quantile(reruns, 0.5) * 1000,
+        "p95_ms": np.quantile(reruns, 0.95) * 1000,
+        "max_ms": reruns.max() * 1000,
+        "reruns_per_second": len(reruns) / elapsed,
+        "rss_growth_mb": _rss_mb() - rss_before,
+        "cache_hit_rate": _cache_hit_rate(),
+        "rejected_saves": sum(result.rejected_saves for result in results),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else "",
+    }
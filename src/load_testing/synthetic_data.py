@@ -0,0 +1,144 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.clients.tables import (
+    DRINKING_TABLE,
+    NAPPY_TABLE,
+    PUMPING_TABLE,
+    SLEEPING_TABLE,
+    write_table,
+)
+
+
+def _day_starts(days: int, last_day: date) -> pd.DatetimeIndex:
+    """
+    The midnight of each of the `days` days up to last_day, oldest first
+    """
+    return pd.date_range(end=pd.Timestamp(last_day), periods=days, freq="D")
+
+
+def sleeping_data(days: int, rng: np.random.Generator, last_day: date) -> pd.DataFrame:
+    """
+    A night's sleep and three naps a day
+    """
+    day_starts = _day_starts(days, last_day)
+    nights = day_starts + pd.to_timedelta(19 * 60 + rng.integers(0, 90, days), unit="m")
+    naps = np.concatenate(
+        [
+            day_starts + pd.to_timedelta(hour * 60 + rng.integers(0, 60, days), unit="m")
+            for hour in [9, 12, 15]
+        ]
+    )
+    starts = pd.DatetimeIndex(np.concatenate([nights, naps])).sort_values()
+    is_night = starts.hour >= 19
+    ends = starts + pd.to_timedelta(
+        np.where(is_night, rng.integers(600, 720, len(starts)), rng.integers(30, 120, len(starts))),
+        unit="m",
+    )
+    wake_ups = [
+        (start + pd.to_timedelta(np.sort(rng.choice(np.arange(1, 9), n, replace=False)), unit="h")).to_numpy()
+        if night
+        else np.array([], dtype="datetime64[ns]")
+        for start, night, n in zip(starts, is_night, rng.integers(0, 3, len(starts)))
+    ]
+    return pd.DataFrame(
+        {
+            "sleep_start_time": starts,
+            "sleep_end_time": ends,
+            "time_to_settle": rng.integers(0, 40, len(starts)),
+            "sleep_location": rng.choice(["Cot", "Pram", "Car", "Arms"], len(starts)),
+            "temporary_wake_up_times": wake_ups,
+            "settling_techniques": [
+                np.array(rng.choice(["Singing", "Rocking", "Shushing"], rng.integers(0, 3), replace=False))
+                for _ in range(len(starts))
+            ],
+            "sleep_id": np.arange(len(starts)),
+            "sleep_type": np.where(is_night, "Night", "Nap"),
+        }
+    )
+
+
+def drinking_data(days: int, rng: np.random.Generator, last_day: date) -> pd.DataFrame:
+    """
+    Eight feeds a day, a quarter of them bottle fed
+    """
+    feeds = _day_starts(days, last_day).repeat(8) + pd.to_timedelta(
+        np.tile(np.arange(8) * 180, days) + rng.integers(0, 60, days * 8), unit="m"
+    )
+    bottle_fed = rng.random(len(feeds)) < 0.25
+    duration = rng.integers(10, 40, len(feeds)).astype(float)
+    return pd.DataFrame(
+        {
+            "feed_date": feeds,
+            "breastfeed_duration": np.where(bottle_fed, np.nan, duration),
+            "start_side": np.where(bottle_fed, "None", rng.choice(["Left", "Right"], len(feeds))),
+            "start_side_time": np.where(bottle_fed, np.nan, duration / 2),
+            "bottle_fed": bottle_fed,
+            "bottle_quantity": np.where(bottle_fed, rng.integers(60, 180, len(feeds)), np.nan),
+        }
+    )
+
+
+def pumping_data(days: int, rng: np.random.Generator, last_day: date) -> pd.DataFrame:
+    """
+    Two pumping sessions a day
+    """
+    pumps = _day_starts(days, last_day).repeat(2) + pd.to_timedelta(
+        np.tile([7 * 60, 21 * 60], days) + rng.integers(0, 60, days * 2), unit="m"
+    )
+    return pd.DataFrame(
+        {
+            "pump_date": pumps,
+            "left_volume": rng.integers(0, 120, len(pumps)).astype(float),
+            "right_volume": rng.integers(0, 120, len(pumps)).astype(float),
+        }
+    )
+
+
+def nappy_data(days: int, rng: np.random.Generator, last_day: date) -> pd.DataFrame:
+    """
+    Seven nappies a day, shared between three changers
+    """
+    changes = _day_starts(days, last_day).repeat(7) + pd.to_timedelta(
+        np.tile(np.arange(7) * 200, days) + rng.integers(0, 90, days * 7), unit="m"
+    )
+    contains_poo = rng.random(len(changes)) < 0.4
+    return pd.DataFrame(
+        {
+            "nappy_date": changes.date,
+            "nappy_time": changes.time,
+            "nappy_changer": rng.choice(["Matt", "Grace", "Nana"], len(changes)),
+            "contains_wee": rng.random(len(changes)) < 0.9,
+            "contains_poo": contains_poo,
+            "poo_colour": np.where(contains_poo, "#9a6b00", None),
+            "notes": "",
+        }
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def seed_tables(days: int = 120, seed: int = 0) -> date:
+    """
+    Fill every table with a realistic history ending yesterday. This is for the
+    fake BigQuery backend, and runs once per process.
+
+    Args:
+        days (int): The number of days of history
+        seed (int): The random seed
+
+    Returns:
+        date: The last day of the history
+    """
+    rng = np.random.default_rng(seed)
+    last_day = date.today() - timedelta(days=1)
+    for layout, build in [
+        (SLEEPING_TABLE, sleeping_data),
+        (DRINKING_TABLE, drinking_data),
+        (PUMPING_TABLE, pumping_data),
+        (NAPPY_TABLE, nappy_data),
+    ]:
+        write_table(layout, build(days, rng, last_day))
+    return last_day
@@ -0,0 +1,128 @@
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.runtime.secrets import Secrets
+
+from src.app.data_cache import DATA_CACHE
+from src.clients import query_costs
+from src.clients.bigquery_client import bq_client
+from src.clients.tables import (
+    DRINKING_TABLE,
+    NAPPY_TABLE,
+    PUMPING_TABLE,
+    SLEEPING_TABLE,
+    write_table,
+)
+
+# The secrets every test runs with: no password, and an in-process BigQuery
+TEST_SECRETS = {"environment": "dev", "bigquery_backend": "fake"}
+
+
+@pytest.fixture(autouse=True)
+def fake_bigquery(monkeypatch):
+    """
+    Run each test against its own empty fake BigQuery, with nothing cached
+    """
+    secrets = Secrets()
+    secrets._secrets = dict(TEST_SECRETS)
+    monkeypatch.setattr(st, "secrets", secrets)
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    DATA_CACHE.clear()
+    with query_costs._cache_lock:
+        query_costs._estimates.clear()
+        query_costs._fallbacks.clear()
+    yield bq_client().client
+    st.cache_resource.clear()
+
+
+def _days_ago(days: int, hour: int) -> datetime:
+    return datetime.combine(date.today() - timedelta(days=days), time(hour))
+
+
+def sleeping_rows() -> pd.DataFrame:
+    """
+    A week of nights and naps, the last night still going
+    """
+    starts = [_days_ago(day, hour) for day in range(7, 0, -1) for hour in (13, 19)]
+    ends = [start + timedelta(hours=1 if start.hour == 13 else 11) for start in starts]
+    ends[-1] = None
+    return pd.DataFrame(
+        {
+            "sleep_start_time": starts,
+            "sleep_end_time": ends,
+            "time_to_settle": 10,
+            "sleep_location": "Cot",
+            "temporary_wake_up_times": [np.array([], dtype="datetime64[us]")] * len(starts),
+            "settling_techniques": [np.array(["Singing"])] * len(starts),
+            "sleep_id": np.arange(len(starts)),
+            "sleep_type": ["Nap" if start.hour == 13 else "Night" for start in starts],
+        }
+    )
+
+
+def drinking_rows() -> pd.DataFrame:
+    """
+    A week of alternating breast and bottle feeds
+    """
+    feeds = [_days_ago(day, hour) for day in range(7, 0, -1) for hour in (6, 12, 18)]
+    bottle = np.arange(len(feeds)) % 2 == 1
+    return pd.DataFrame(
+        {
+            "feed_date": feeds,
+            "breastfeed_duration": np.where(bottle, np.nan, 20.0),
+            "start_side": np.where(bottle, "None", "Left"),
+            "start_side_time": np.where(bottle, 0.0, 10.0),
+            "bottle_fed": bottle,
+            "bottle_quantity": np.where(bottle, 120.0, np.nan),
+        }
+    )
+
+
+def pumping_rows() -> pd.DataFrame:
+    """
+    A week of daily pumping sessions
+    """
+    return pd.DataFrame(
+        {
+            "pump_date": [_days_ago(day, 9) for day in range(7, 0, -1)],
+            "left_volume": 50.0,
+            "right_volume": 60.0,
+        }
+    )
+
+
+def nappy_rows() -> pd.DataFrame:
+    """
+    A week of nappies, changed by two people
+    """
+    changes = [_days_ago(day, hour) for day in range(7, 0, -1) for hour in (8, 16)]
+    return pd.DataFrame(
+        {
+            "nappy_date": [change.date() for change in changes],
+            "nappy_time": [change.time() for change in changes],
+            "nappy_changer": ["Matt", "Grace"] * 7,
+            "contains_wee": True,
+            "contains_poo": [True, False] * 7,
+            "poo_colour": "#aa7700",
+            "notes": "",
+        }
+    )
+
+
+@pytest.fixture
+def seeded(fake_bigquery):
+    """
+    Fill every table with a week of records
+    """
+    for layout, rows in [
+        (SLEEPING_TABLE, sleeping_rows()),
+        (DRINKING_TABLE, drinking_rows()),
+        (PUMPING_TABLE, pumping_rows()),
+        (NAPPY_TABLE, nappy_rows()),
+    ]:
+        write_table(layout, rows)
+    return fake_bigquery
@@ -0,0 +1,31 @@
+import matplotlib.colors as mcolors
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from src.app.ui.pages.bowels import caregiver_colours, plot_nappies_over_time
+from src.cfg.colour_config import ColourConfig
+
+COLOURS = ColourConfig()
+
+# The columns of the nappy data the charts are drawn from
+NAPPY_COLUMNS = ["nappy_date", "nappy_time", "nappy_changer", "contains_wee", "contains_poo", "day"]
+
+
+def test_nappies_over_time_with_no_nappies():
+    fig = plot_nappies_over_time(pd.DataFrame(columns=NAPPY_COLUMNS))
+    assert fig.axes[0].get_title() == "Nappies Over Time"
+    plt.close(fig)
+
+
+def test_caregivers_get_distinct_colours():
+    colours = caregiver_colours(8)
+    assert len(colours) == 8
+    assert len({tuple(colour) for colour in colours}) == 8
+    assert tuple(colours[0]) == mcolors.to_rgba(COLOURS.PINK_HEX)
+
+
+def test_caregivers_stand_out_from_the_background():
+    background = np.array(mcolors.to_rgb(COLOURS.BLUE_HEX))
+    distances = np.linalg.norm(caregiver_colours(10)[:, :3] - background, axis=1)
+    assert distances.min() > 0.15
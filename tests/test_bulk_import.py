@@ -0,0 +1,80 @@
+import pandas as pd
+
+from src.clients.bulk_import import import_files
+from src.clients.tables import DRINKING_TABLE, SLEEPING_TABLE, read_table, write_table
+from tests.conftest import drinking_rows, sleeping_rows
+
+
+def test_import_drops_duplicates_in_the_files_and_the_table(seeded, tmp_path):
+    existing = drinking_rows()
+    new = pd.DataFrame(
+        {
+            "feed_date": ["2024-01-01 06:00", "2024-01-02 06:00"],
+            "bottle_fed": ["yes", "no"],
+            "bottle_quantity": ["120", ""],
+        }
+    )
+    first = tmp_path / "first.csv"
+    pd.concat([new, existing.head(2)]).to_csv(first, index=False)
+    # The second file repeats a row of the first
+    second = tmp_path / "second.csv"
+    new.head(1).to_csv(second, index=False)
+
+    summary = import_files(DRINKING_TABLE, [first, second])
+    assert summary.errors == []
+    assert summary.rows_read == 5
+    assert summary.duplicates_in_files == 1
+    assert summary.already_in_table == 2
+    assert summary.new_rows == 2
+    assert len(read_table(DRINKING_TABLE)) == len(existing) + 2
+
+
+def test_import_numbers_new_sleeps_on_from_the_table(fake_bigquery, tmp_path):
+    write_table(SLEEPING_TABLE, sleeping_rows())
+    path = tmp_path / "sleeps.csv"
+    pd.DataFrame(
+        {
+            "sleep_start_time": ["2024-01-01 19:00", "2024-01-02 19:00", "2024-01-03 19:00"],
+            "sleep_end_time": ["2024-01-02 07:00", "2024-01-03 07:00", "2024-01-04 07:00"],
+            "sleep_id": ["", "100", ""],
+        }
+    ).to_csv(path, index=False)
+
+    summary = import_files(SLEEPING_TABLE, [path])
+    assert summary.new_rows == 3
+    imported = read_table(SLEEPING_TABLE).sort_values("sleep_start_time").head(3)
+    assert list(imported["sleep_id"]) == [14, 100, 15]
+    # Sleeps without a type are night sleeps, as the first migration made them
+    assert (imported["sleep_type"] == "Night").all()
+
+
+def test_import_with_bad_values_loads_nothing(seeded, tmp_path):
+    path = tmp_path / "bad.csv"
+    pd.DataFrame({"feed_date": ["2024-01-01 06:00"], "bottle_fed": ["perhaps"]}).to_csv(path, index=False)
+
+    summary = import_files(DRINKING_TABLE, [path])
+    assert summary.new_rows == 0
+    assert "'perhaps' is not a valid BOOLEAN for bottle_fed" in summary.errors[0]
+    assert len(read_table(DRINKING_TABLE)) == len(drinking_rows())
+
+
+def test_dry_run_loads_nothing(seeded, tmp_path):
+    path = tmp_path / "drinks.csv"
+    pd.DataFrame({"feed_date": ["2024-01-01 06:00"]}).to_csv(path, index=False)
+    assert import_files(DRINKING_TABLE, [path], dry_run=True).new_rows == 1
+    assert len(read_table(DRINKING_TABLE)) == len(drinking_rows())
+
+
+def test_import_numbers_new_sleeps_from_0_when_no_sleep_has_an_id(fake_bigquery, tmp_path):
+    write_table(SLEEPING_TABLE, sleeping_rows().assign(sleep_id=None))
+    path = tmp_path / "sleeps.csv"
+    pd.DataFrame(
+        {
+            "sleep_start_time": ["2024-01-01 19:00", "2024-01-02 19:00"],
+            "sleep_end_time": ["2024-01-02 07:00", "2024-01-03 07:00"],
+        }
+    ).to_csv(path, index=False)
+
+    assert import_files(SLEEPING_TABLE, [path]).new_rows == 2
+    imported = read_table(SLEEPING_TABLE).sort_values("sleep_start_time").head(2)
+    assert list(imported["sleep_id"]) == [0, 1]
@@ -0,0 +1,121 @@
+import pandas as pd
+import pytest
+import streamlit as st
+
+from src.app.data_cache import (
+    DATA_CACHE,
+    DataCache,
+    cached_data,
+    data_version,
+    prepared_view,
+    view_identity,
+)
+from src.clients.query_costs import stale_reads
+
+
+def frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({"value": range(rows)})
+
+
+def set_budget(mb: float):
+    st.secrets._secrets["data_cache_mb"] = mb
+
+
+def test_get_after_put():
+    cache = DataCache()
+    df = frame(10)
+    cache.put("drinking", (0, 0, 1), df)
+    assert cache.get("drinking", (0, 0, 1)) is df
+    assert cache.get("drinking", (0, 0, 2)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_frames_are_evicted_over_budget():
+    set_budget(frame(1000).memory_usage(deep=True).sum() * 2.5 / 1e6)
+    cache = DataCache()
+    for key in ["a", "b", "c"]:
+        cache.put(key, (0, 0, 0), frame(1000))
+    assert cache.get("a", (0, 0, 0)) is None
+    cache.get("b", (0, 0, 0))
+    cache.put("d", (0, 0, 0), frame(1000))
+    assert cache.get("b", (0, 0, 0)) is not None
+    assert cache.get("c", (0, 0, 0)) is None
+    assert cache.stats()["evictions"] == 2
+
+
+def test_superseded_versions_are_evicted_first():
+    set_budget(frame(1000).memory_usage(deep=True).sum() * 2.5 / 1e6)
+    cache = DataCache()
+    cache.put("other", (0, 0, 0), frame(1000))
+    cache.put("page", (0, 0, 1), frame(1000))
+    cache.put("page", (0, 0, 2), frame(1000))
+    assert cache.get("page", (0, 0, 1)) is None
+    assert cache.get("other", (0, 0, 0)) is not None
+    assert cache.stats()["superseded_evictions"] == 1
+
+
+def test_the_newest_frame_is_kept_even_over_budget():
+    set_budget(0.0001)
+    cache = DataCache()
+    cache.put("page", (0, 0, 0), frame(1000))
+    assert cache.get("page", (0, 0, 0)) is not None
+
+
+def test_versions_without_a_shared_cache_are_tuples():
+    assert data_version(3, "sleeping") == (0, 0, 3)
+    assert data_version(3, None) == (0, 0, 3)
+
+
+def test_versions_with_and_without_a_shared_cache_compare(monkeypatch):
+    cache = DataCache()
+    cache.put("page", data_version(1, "sleeping"), frame(10))
+    monkeypatch.setattr("src.app.data_cache.table_generation", lambda table: (1_000, 2))
+    shared = data_version(1, "sleeping")
+    assert shared == (1_000, 2, 1)
+    cache.put("page", shared, frame(10))
+    cache.put("page", data_version(0, "sleeping"), frame(10))
+    assert cache.stats()["entries"] == 3
+
+
+def test_versions_from_a_restarted_shared_cache_are_newer(monkeypatch):
+    monkeypatch.setattr("src.app.data_cache.table_generation", lambda table: (1_000, 5))
+    before = data_version(1, "sleeping")
+    monkeypatch.setattr("src.app.data_cache.table_generation", lambda table: (2_000, 0))
+    assert data_version(1, "sleeping") > before
+
+
+@prepared_view("pumping")
+def prepare_window(cache_index: int, start: int) -> pd.DataFrame:
+    return frame(10)[start:]
+
+
+def test_prepared_views_are_identified_by_their_view_and_version():
+    assert view_identity(prepare_window(1, 2)) == ("pumping", (0, 0, 1), "prepare_window", 2)
+    assert view_identity(prepare_window(1, 2)) != view_identity(prepare_window(1, 3))
+    assert view_identity(prepare_window(1, 2)) != view_identity(prepare_window(2, 2))
+
+
+def test_frames_derived_from_a_prepared_view_are_not_identified_as_it():
+    df = prepare_window(1, 2)
+    assert view_identity(df[df["value"] > 5]) is None
+    assert view_identity(frame(10)) is None
+
+
+@cached_data("Loading...")
+def load_failing(cache_index: int) -> pd.DataFrame:
+    raise ValueError("BigQuery said no")
+
+
+@cached_data("Loading...")
+def load_stale(cache_index: int) -> pd.DataFrame:
+    stale_reads.get().append("pumping")
+    return frame(10)
+
+
+def test_loads_leave_no_locks_behind():
+    prepare_window(1, 2)
+    with pytest.raises(ValueError):
+        load_failing(1)
+    load_stale(1)
+    assert DATA_CACHE._loading == {}
+    assert DATA_CACHE.stats()["entries"] == 1
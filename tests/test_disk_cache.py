@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+from src.clients.disk_cache import read_disk_cache, write_disk_cache
+
+
+def test_a_window_reads_back_at_its_version(tmp_path):
+    st.secrets._secrets["disk_cache_dir"] = str(tmp_path)
+    df = pd.DataFrame({"pump_date": pd.date_range("2025-01-01", periods=5), "left_volume": 50.0})
+    write_disk_cache("pumping", None, None, "v1", df)
+    pd.testing.assert_frame_equal(read_disk_cache("pumping", None, None, "v1"), df)
+    assert read_disk_cache("pumping", None, None, "v2") is None
+
+
+def test_threads_writing_the_same_window_do_not_collide(tmp_path):
+    st.secrets._secrets["disk_cache_dir"] = str(tmp_path)
+    df = pd.DataFrame({"value": range(100_000)})
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: write_disk_cache("pumping", None, None, "v1", df), range(16)))
+    pd.testing.assert_frame_equal(read_disk_cache("pumping", None, None, "v1"), df)
+    assert [path.suffix for path in (tmp_path / "pumping").iterdir()] == [".arrow"]
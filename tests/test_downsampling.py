@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from src.app.ui.downsampling import bucket_bars, lttb_indices
+
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[[250, 500, 750]] = [10, -10, 10]
+    kept = lttb_indices(x, y, 20)
+    assert len(kept) == 20
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+    assert {250, 500, 750} <= set(kept)
+
+
+def test_lttb_keeps_everything_when_it_fits():
+    x = np.arange(10, dtype=float)
+    assert list(lttb_indices(x, x, 10)) == list(range(10))
+    assert list(lttb_indices(x, x, 2)) == list(range(10))
+
+
+def test_bucket_bars_leaves_short_ranges_daily():
+    days = pd.date_range("2025-06-01", periods=30, freq="D")
+    data = pd.Series(1.0, index=days)
+    bucketed, label = bucket_bars(data, max_bars=60)
+    assert label is None
+    pd.testing.assert_series_equal(bucketed, data)
+
+
+def test_bucket_bars_averages_per_day_by_week_then_month():
+    days = pd.date_range("2025-01-01", "2025-12-31", freq="D")
+    data = pd.Series(2.0, index=days)
+
+    weekly, label = bucket_bars(data, max_bars=60)
+    assert label == "Weekly"
+    assert len(weekly) == 53
+    assert (weekly == 2.0).all()
+
+    monthly, label = bucket_bars(data, max_bars=20)
+    assert label == "Monthly"
+    assert len(monthly) == 12
+
+
+def test_bucket_bars_counts_missing_days_as_zero():
+    # A Monday and a Sunday, so both weeks are whole
+    days = pd.to_datetime(["2025-01-06", "2025-06-29"])
+    weekly, label = bucket_bars(pd.Series([7.0, 7.0], index=days), max_bars=30)
+    assert label == "Weekly"
+    assert weekly.iloc[0] == 1.0
+    assert weekly.sum() == 2.0
@@ -0,0 +1,21 @@
+import sys
+
+import pytest
+import streamlit as st
+
+from export_snapshots import LAYOUTS, main
+
+
+def test_export_with_no_arguments_exports_every_table(seeded, tmp_path, monkeypatch, capsys):
+    st.secrets._secrets["snapshot_dir"] = str(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["export_snapshots.py"])
+    main()
+    output = capsys.readouterr().out
+    for name in LAYOUTS:
+        assert f"{name}: " in output
+
+
+def test_export_rejects_unknown_tables(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["export_snapshots.py", "sleeping", "feeds"])
+    with pytest.raises(SystemExit):
+        main()
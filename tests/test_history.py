@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+
+from src.app.history import default_start, history_slices
+
+
+def test_history_slices_are_calendar_months_up_to_an_open_one():
+    assert history_slices(date(2025, 5, 20), today=date(2025, 7, 3)) == [
+        (date(2025, 5, 1), date(2025, 5, 31)),
+        (date(2025, 6, 1), date(2025, 6, 30)),
+        (date(2025, 7, 1), None),
+    ]
+
+
+def test_history_slices_within_this_month():
+    assert history_slices(date(2025, 7, 2), today=date(2025, 7, 3)) == [(date(2025, 7, 1), None)]
+
+
+def test_history_slices_cross_the_new_year():
+    slices = history_slices(date(2024, 12, 15), today=date(2025, 1, 10))
+    assert slices == [(date(2024, 12, 1), date(2024, 12, 31)), (date(2025, 1, 1), None)]
+
+
+def test_full_history_adds_everything_before_the_default_window():
+    slices = history_slices(None, today=date.today())
+    first_month = default_start().replace(day=1)
+    assert slices[0] == (None, first_month - timedelta(days=1))
+    assert slices[1][0] == first_month
+    assert slices[-1][1] is None
@@ -0,0 +1,105 @@
+import pytest
+from google.api_core.exceptions import BadRequest
+from google.cloud import bigquery
+
+from src.clients.migrations import (
+    MIGRATIONS,
+    migrate_table,
+    pending_migrations,
+    schema_versions,
+)
+from src.clients.tables import NAPPY_TABLE, PUMPING_TABLE, SLEEPING_TABLE, read_table
+from tests.conftest import nappy_rows, pumping_rows, sleeping_rows
+
+
+def test_pending_migrations_are_those_after_the_table_version():
+    table_id = SLEEPING_TABLE.table_id
+    assert pending_migrations(table_id, {}) == MIGRATIONS[table_id]
+    assert [migration.version for migration in pending_migrations(table_id, {table_id: 1})] == [2]
+    assert pending_migrations(table_id, {table_id: 2}) == []
+
+
+def test_migrate_table_backfills_and_records(fake_bigquery):
+    # Sleeps logged before naps were tracked have no type
+    legacy = sleeping_rows()
+    legacy.loc[legacy.index % 3 == 0, "sleep_type"] = None
+    schema = [
+        bigquery.SchemaField("sleep_type", "STRING") if schema_field.name == "sleep_type" else schema_field
+        for schema_field in SLEEPING_TABLE.schema
+    ]
+    fake_bigquery.load_table_from_dataframe(
+        legacy, SLEEPING_TABLE.table_id, job_config=bigquery.LoadJobConfig(schema=schema)
+    ).result()
+
+    applied = migrate_table(SLEEPING_TABLE, schema_versions())
+    assert [migration.version for migration in applied] == [1, 2]
+    migrated = read_table(SLEEPING_TABLE)
+    assert len(migrated) == len(legacy)
+    assert migrated["sleep_type"].notna().all()
+    assert (migrated["sleep_type"] == "Night").sum() == (legacy["sleep_type"] != "Nap").sum()
+    assert schema_versions() == {SLEEPING_TABLE.table_id: 2}
+
+    # Applied migrations are not applied again
+    assert migrate_table(SLEEPING_TABLE, schema_versions()) == []
+
+
+def test_migrate_table_adopts_the_managed_schema(fake_bigquery):
+    # Until its first migration the nappy table's schema was autodetected
+    rows = nappy_rows()
+    fake_bigquery.load_table_from_dataframe(
+        rows.assign(nappy_time=rows["nappy_time"].astype(str)), NAPPY_TABLE.table_id
+    ).result()
+
+    migrate_table(NAPPY_TABLE, schema_versions())
+    table = fake_bigquery.get_table(NAPPY_TABLE.table_id)
+    assert [schema_field.field_type for schema_field in table.schema] == [
+        schema_field.field_type for schema_field in NAPPY_TABLE.schema
+    ]
+    assert len(read_table(NAPPY_TABLE)) == len(rows)
+
+
+def test_reads_leave_the_layout_to_its_migration(fake_bigquery):
+    # Tables used to be created implicitly by load jobs, with no partitioning
+    fake_bigquery.load_table_from_dataframe(pumping_rows(), PUMPING_TABLE.table_id).result()
+    assert len(read_table(PUMPING_TABLE)) == 7
+    assert fake_bigquery.get_table(PUMPING_TABLE.table_id).time_partitioning is None
+
+    migrate_table(PUMPING_TABLE, schema_versions())
+    table = fake_bigquery.get_table(PUMPING_TABLE.table_id)
+    assert table.time_partitioning.field == "pump_date"
+    assert tuple(table.clustering_fields) == PUMPING_TABLE.cluster_fields
+    assert table.require_partition_filter
+    with pytest.raises(BadRequest):
+        fake_bigquery.query(f"SELECT * FROM `{PUMPING_TABLE.table_id}`")
+    assert len(read_table(PUMPING_TABLE)) == 7
+
+
+def test_migrations_keep_rows_with_no_date(fake_bigquery):
+    rows = pumping_rows()
+    rows.loc[0, "pump_date"] = None
+    fake_bigquery.load_table_from_dataframe(rows, PUMPING_TABLE.table_id).result()
+
+    migrate_table(PUMPING_TABLE, schema_versions())
+    assert fake_bigquery.get_table(PUMPING_TABLE.table_id).num_rows == 7
+
+
+def test_the_layout_is_adopted_after_the_rows_it_clusters_on_are_migrated(fake_bigquery):
+    # The oldest sleeping tables have no sleep_type column at all
+    legacy = sleeping_rows().drop(columns="sleep_type")
+    schema = [schema_field for schema_field in SLEEPING_TABLE.schema if schema_field.name != "sleep_type"]
+    fake_bigquery.load_table_from_dataframe(
+        legacy, SLEEPING_TABLE.table_id, job_config=bigquery.LoadJobConfig(schema=schema)
+    ).result()
+
+    migrate_table(SLEEPING_TABLE, schema_versions())
+    table = fake_bigquery.get_table(SLEEPING_TABLE.table_id)
+    assert tuple(table.clustering_fields) == SLEEPING_TABLE.cluster_fields
+    assert (read_table(SLEEPING_TABLE)["sleep_type"] == "Night").all()
+
+
+def test_a_table_on_version_1_only_has_its_layout_adopted(fake_bigquery):
+    fake_bigquery.load_table_from_dataframe(pumping_rows(), PUMPING_TABLE.table_id).result()
+    applied = migrate_table(PUMPING_TABLE, {PUMPING_TABLE.table_id: 1})
+    assert [migration.version for migration in applied] == [2]
+    assert fake_bigquery.get_table(PUMPING_TABLE.table_id).time_partitioning.field == "pump_date"
+    assert schema_versions() == {PUMPING_TABLE.table_id: 2}
@@ -0,0 +1,93 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from src.clients.tables import (
+    DRINKING_TABLE,
+    NAPPY_TABLE,
+    PUMPING_TABLE,
+    SLEEPING_TABLE,
+    read_table,
+)
+from tests.conftest import TEST_SECRETS
+
+PAGES = ["Sleeping", "Drinking", "Pumping", "Bowels"]
+
+
+def run_page(page: str) -> AppTest:
+    """
+    Open the app on a page
+    """
+    at = AppTest.from_file("../main.py", default_timeout=60)
+    for name, value in TEST_SECRETS.items():
+        at.secrets[name] = value
+    at.run()
+    at.sidebar.selectbox[0].set_value(page).run()
+    assert not at.exception
+    return at
+
+
+def submit(at: AppTest, label: str):
+    """
+    Press a form's submit button
+    """
+    next(button for button in at.button if button.label == label).click().run()
+    assert not at.exception
+    assert not at.error
+
+
+@pytest.mark.parametrize("page", PAGES)
+def test_page_draws_its_charts(seeded, page):
+    at = run_page(page)
+    assert len(at.get("imgs")) > 0
+    assert len(at.dataframe) > 0
+
+
+@pytest.mark.parametrize("page", PAGES)
+def test_page_draws_with_no_data(fake_bigquery, page):
+    run_page(page)
+
+
+def test_log_nap(seeded):
+    at = run_page("Sleeping")
+    before = len(read_table(SLEEPING_TABLE))
+    submit(at, "Log Nap")
+    after = read_table(SLEEPING_TABLE)
+    assert len(after) == before + 1
+    assert after["sleep_id"].is_unique
+    assert (after["sleep_type"] == "Nap").sum() == 8
+
+
+def test_add_drink(seeded):
+    at = run_page("Drinking")
+    next(box for box in at.checkbox if box.label == "Bottle Fed?").check()
+    next(box for box in at.number_input if box.label == "Feed Volume (ml)").set_value(150)
+    submit(at, "Add Drink!")
+    after = read_table(DRINKING_TABLE)
+    assert len(after) == 22
+    assert after["bottle_quantity"].max() == 150
+
+
+def test_add_pumping_session(seeded):
+    at = run_page("Pumping")
+    next(box for box in at.number_input if box.label == "Left Breast Volume (ml)").set_value(70)
+    submit(at, "Add Session!")
+    after = read_table(PUMPING_TABLE)
+    assert len(after) == 8
+    assert after["left_volume"].max() == 70
+    assert after["right_volume"].isna().sum() == 1
+
+
+def test_empty_pumping_session_is_not_saved(seeded):
+    at = run_page("Pumping")
+    next(button for button in at.button if button.label == "Add Session!").click().run()
+    assert len(at.error) == 1
+    assert len(read_table(PUMPING_TABLE)) == 7
+
+
+def test_upload_nappy(seeded):
+    at = run_page("Bowels")
+    next(box for box in at.checkbox if box.label == "Contains Poo?").check()
+    submit(at, "Upload Nappy")
+    after = read_table(NAPPY_TABLE)
+    assert len(after) == 15
+    assert after["contains_poo"].sum() == 8
@@ -0,0 +1,64 @@
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from src.app.ui.plotting import MAX_TIMELINE_INCHES, split_intervals, timeline_chart
+
+
+def test_split_intervals_splits_at_midnight():
+    starts = pd.Series(pd.to_datetime(["2025-06-01 19:00", "2025-06-03 13:00"]))
+    ends = pd.Series(pd.to_datetime(["2025-06-02 07:00", "2025-06-03 14:30"]))
+    pieces = split_intervals(starts, ends)
+    assert list(pieces["period_start"]) == list(
+        pd.to_datetime(["2025-06-01", "2025-06-02", "2025-06-03"])
+    )
+    assert list(pieces["start_hours"]) == [19.0, 0.0, 13.0]
+    assert list(pieces["end_hours"]) == [24.0, 7.0, 14.5]
+    assert list(pieces["source"]) == [0, 0, 1]
+
+
+def test_split_intervals_spans_whole_periods():
+    pieces = split_intervals(
+        pd.Series(pd.to_datetime(["2025-06-01 22:00"])),
+        pd.Series(pd.to_datetime(["2025-06-04 02:00"])),
+    )
+    assert len(pieces) == 4
+    assert list(pieces["end_hours"] - pieces["start_hours"]) == [2.0, 24.0, 24.0, 2.0]
+
+
+def test_split_intervals_skips_open_and_empty_intervals():
+    starts = pd.Series(pd.to_datetime(["2025-06-01 10:00", "2025-06-01 12:00", "2025-06-01 14:00"]))
+    ends = pd.Series(pd.to_datetime([None, "2025-06-01 12:00", "2025-06-01 15:00"]))
+    pieces = split_intervals(starts, ends)
+    assert list(pieces["source"]) == [2]
+
+
+def test_split_intervals_by_hour():
+    pieces = split_intervals(
+        pd.Series(pd.to_datetime(["2025-06-01 10:30"])),
+        pd.Series(pd.to_datetime(["2025-06-01 12:15"])),
+        "h",
+    )
+    assert list(pieces["period_start"].dt.hour) == [10, 11, 12]
+    assert list(pieces["end_hours"] - pieces["start_hours"]) == [0.5, 1.0, 0.25]
+
+
+def timeline(days: int):
+    end = pd.Timestamp("2025-06-30")
+    start = end - pd.Timedelta(days=days - 1)
+    starts = pd.Series(pd.date_range(start, end, freq="D") + pd.Timedelta(hours=13))
+    return timeline_chart([("Nap", starts, starts + pd.Timedelta(hours=1), "#FF80AB")], start, end, "Naps")
+
+
+def test_short_timelines_label_every_day():
+    fig = timeline(7)
+    assert len(fig.axes[0].get_xticks()) == 7
+    plt.close(fig)
+
+
+def test_long_timelines_are_capped_and_label_fewer_days():
+    fig = timeline(400)
+    assert fig.get_size_inches()[0] == MAX_TIMELINE_INCHES
+    ticks = fig.axes[0].get_xticks()
+    assert 10 < len(ticks) < 100
+    assert ticks[0] == 0
+    plt.close(fig)
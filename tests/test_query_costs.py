@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import streamlit as st
+from google.cloud import bigquery
+
+from src.clients import query_costs
+from src.clients.query_costs import estimate_bytes
+from src.clients.tables import PUMPING_TABLE, date_filter, read_table, write_table
+from tests.conftest import pumping_rows
+
+
+def test_reads_during_a_refresh_wait_for_it(fake_bigquery):
+    write_table(PUMPING_TABLE, pumping_rows())
+    read_table(PUMPING_TABLE)
+    write_table(PUMPING_TABLE, pumping_rows().head(3))
+    st.secrets._secrets["bigquery_stale_after_seconds"] = 5
+    fake_bigquery.latency_seconds = 0.2
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        reads = list(pool.map(lambda _: read_table(PUMPING_TABLE), range(2)))
+    for df in reads:
+        assert not df.attrs.get("stale")
+        assert len(df) == 3
+
+
+def test_reads_serve_the_last_result_when_a_refresh_is_slow(fake_bigquery):
+    write_table(PUMPING_TABLE, pumping_rows())
+    read_table(PUMPING_TABLE)
+    st.secrets._secrets["bigquery_stale_after_seconds"] = 0.1
+    fake_bigquery.latency_seconds = 0.5
+
+    df = read_table(PUMPING_TABLE)
+    assert df.attrs["stale"]
+    assert len(df) == 7
+
+
+def estimate_pumping(start: date | None = None) -> int:
+    where, parameters = date_filter(PUMPING_TABLE, start, None)
+    return estimate_bytes(
+        f"SELECT * FROM `{PUMPING_TABLE.table_id}` WHERE {where}",
+        bigquery.QueryJobConfig(query_parameters=parameters),
+        PUMPING_TABLE.name,
+    )
+
+
+def test_estimates_are_dropped_when_the_table_is_written(fake_bigquery):
+    write_table(PUMPING_TABLE, pumping_rows().head(1))
+    small = estimate_pumping()
+    assert estimate_pumping() == small
+    write_table(PUMPING_TABLE, pumping_rows())
+    assert estimate_pumping() > small
+
+
+def test_estimates_are_bounded(fake_bigquery, monkeypatch):
+    monkeypatch.setattr(query_costs, "MAX_ESTIMATES", 2)
+    write_table(PUMPING_TABLE, pumping_rows())
+    for days in range(5):
+        estimate_pumping(date.today() - timedelta(days=days))
+    assert len(query_costs._estimates) == 2
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from src.app.ui.record_picker import match_records, record_index
+
+INDEX = record_index(
+    pd.Series(
+        pd.to_datetime(
+            ["2025-07-03 14:05", "2025-06-30 09:00", "2025-07-03 14:55", "2025-07-01 08:00", "2025-07-03 14:05"]
+        )
+    )
+)
+
+
+def test_record_index_is_each_timestamp_once_oldest_first():
+    assert list(INDEX["label"]) == [
+        "2025-06-30 09:00",
+        "2025-07-01 08:00",
+        "2025-07-03 14:05",
+        "2025-07-03 14:55",
+    ]
+
+
+def test_match_records_by_prefix_newest_first():
+    assert list(match_records(INDEX, "2025-07")["label"]) == [
+        "2025-07-03 14:55",
+        "2025-07-03 14:05",
+        "2025-07-01 08:00",
+    ]
+    assert list(match_records(INDEX, " 2025-07-03 14:0 ")["label"]) == ["2025-07-03 14:05"]
+
+
+def test_match_records_with_no_prefix_lists_the_newest():
+    assert list(match_records(INDEX, "", limit=2)["label"]) == ["2025-07-03 14:55", "2025-07-03 14:05"]
+
+
+def test_match_records_with_no_match():
+    assert len(match_records(INDEX, "2024")) == 0
+    assert len(match_records(INDEX, "2025-07-02")) == 0
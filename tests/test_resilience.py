@@ -0,0 +1,65 @@
+import time
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+from src.clients.resilience import CircuitBreaker, ResilientClient
+
+
+def test_breaker_opens_after_failures_in_a_row():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_lets_one_trial_call_through_after_the_cool_off():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_a_successful_trial_closes_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_a_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=0.05)
+    for _ in range(5):
+        breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_a_trial_that_raises_an_answer_from_the_backend_closes_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    client = ResilientClient(None, breaker)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    def missing_table(timeout: float):
+        raise NotFound("Not found: Table sleeping")
+
+    with pytest.raises(NotFound):
+        client.call(missing_table, deadline=1)
+    assert breaker.state == "closed"
+    assert client.call(lambda timeout: "ok", deadline=1) == "ok"
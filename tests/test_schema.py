@@ -0,0 +1,73 @@
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.clients.schema import Column, RecordError, validate_frame
+from src.clients.tables import NAPPY_TABLE, SLEEPING_TABLE
+
+COLUMNS = (
+    Column("when", "DATETIME"),
+    Column("volume", "FLOAT"),
+    Column("count", "INTEGER"),
+    Column("kind", "STRING", mode="REQUIRED"),
+    Column("tags", "STRING", mode="REPEATED"),
+)
+
+
+def test_validate_frame_types_the_columns():
+    df = validate_frame(
+        pd.DataFrame(
+            {
+                "when": [datetime(2025, 6, 1, 9)],
+                "volume": [120],
+                "count": [2.0],
+                "kind": ["Nap"],
+                "tags": [["Singing"]],
+            }
+        ),
+        COLUMNS,
+    )
+    assert df["when"].dtype == "datetime64[ns]"
+    assert df["volume"].dtype == "float64"
+    assert df["count"].dtype == "Int64"
+    assert df["kind"].iloc[0] == "Nap"
+
+
+def test_validate_frame_fills_missing_nullable_columns():
+    df = validate_frame(pd.DataFrame({"kind": ["Nap"]}), COLUMNS)
+    assert list(df.columns) == [column.name for column in COLUMNS]
+    assert df["volume"].isna().all()
+
+
+def test_validate_frame_rejects_unknown_columns():
+    with pytest.raises(RecordError, match="Unknown column 'colour'"):
+        validate_frame(pd.DataFrame({"kind": ["Nap"], "colour": ["red"]}), COLUMNS)
+
+
+def test_validate_frame_rejects_missing_required_values():
+    with pytest.raises(RecordError, match="Kind is required"):
+        validate_frame(pd.DataFrame({"kind": ["Nap", None]}), COLUMNS)
+
+
+def test_validate_frame_rejects_values_of_the_wrong_type():
+    with pytest.raises(RecordError, match="Volume must be a float"):
+        validate_frame(pd.DataFrame({"kind": ["Nap"], "volume": ["lots"]}), COLUMNS)
+
+
+def test_records_match_the_table_layout():
+    nappy = NAPPY_TABLE.record(
+        nappy_date=date(2025, 6, 1),
+        nappy_time=time(9, 30),
+        nappy_changer="Matt",
+        contains_wee=True,
+        contains_poo=False,
+        poo_colour="#aa7700",
+        notes="",
+    )
+    assert dict(nappy.dtypes.astype(str)) == NAPPY_TABLE.dtypes
+
+    # Every sleep needs a type
+    with pytest.raises(RecordError, match="Sleep Type is required"):
+        SLEEPING_TABLE.record(sleep_start_time=datetime(2025, 6, 1, 19), sleep_id=np.int64(1))
@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+
+from src.clients.tables import PUMPING_TABLE, read_table, table_length, write_table
+from tests.conftest import pumping_rows
+
+
+def test_windows_read_only_their_days(seeded):
+    yesterday = date.today() - timedelta(days=1)
+    assert len(read_table(PUMPING_TABLE, start=yesterday)) == 1
+    assert len(read_table(PUMPING_TABLE, end=yesterday - timedelta(days=1))) == 6
+    assert len(read_table(PUMPING_TABLE, start=yesterday - timedelta(days=2), end=yesterday)) == 3
+
+
+def test_saves_keep_rows_with_no_date(fake_bigquery):
+    rows = pumping_rows()
+    rows.loc[0, "pump_date"] = None
+    write_table(PUMPING_TABLE, rows)
+
+    # Only reads of the whole table take them, as saves rewrite it from those
+    everything = read_table(PUMPING_TABLE, allow_stale=False)
+    assert len(everything) == table_length(PUMPING_TABLE) == 7
+    assert len(read_table(PUMPING_TABLE, start=date(2000, 1, 1))) == 6
+
+    write_table(PUMPING_TABLE, everything.drop(everything["pump_date"].idxmax()))
+    assert table_length(PUMPING_TABLE) == 6
+    assert read_table(PUMPING_TABLE)["pump_date"].isna().sum() == 1
+
+
+def test_new_tables_are_created_with_their_layout(fake_bigquery):
+    write_table(PUMPING_TABLE, pumping_rows())
+    table = fake_bigquery.get_table(PUMPING_TABLE.table_id)
+    assert table.time_partitioning.field == "pump_date"
+    assert table.require_partition_filter